@@ -0,0 +1,162 @@
+import asyncpg
+import os
+import logging
+
+from database import DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT
+from user_cache import UserProfileCache
+from storage import AsyncUserStore
+
+# Recycle idle connections so a failed-over primary is picked up quickly
+DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "300"))
+
+CONNECTION_ERRORS = (
+    asyncpg.exceptions.ConnectionDoesNotExistError,
+    asyncpg.exceptions.InterfaceError,
+    asyncpg.exceptions.CannotConnectNowError,
+    ConnectionError,
+    OSError,
+)
+
+
+class AsyncUserDatabase(AsyncUserStore):
+    """asyncpg-backed variant of UserDatabase for use from async FastAPI handlers"""
+
+    def __init__(self):
+        database_url = os.getenv('DATABASE_URL')
+        if database_url:
+            self.connect_kwargs = {'dsn': database_url}
+        else:
+            self.connect_kwargs = {
+                'database': os.getenv("DB_NAME", "KrishiSaathi"),
+                'user': os.getenv("DB_USER", "postgres"),
+                'password': os.getenv("DB_PASSWORD", "Prathyush@04"),
+                'host': os.getenv("DB_HOST", "localhost"),
+                'port': int(os.getenv("DB_PORT", "5432")),
+            }
+        self.pool = None
+        # Same namespace as UserDatabase: both front the same users table
+        self.profile_cache = UserProfileCache("postgres")
+
+    async def connect(self):
+        if self.pool is None:
+            self.pool = await asyncpg.create_pool(
+                min_size=DB_POOL_MIN,
+                max_size=DB_POOL_MAX,
+                max_inactive_connection_lifetime=DB_POOL_MAX_IDLE,
+                timeout=10,
+                command_timeout=10,
+                server_settings={'application_name': 'krishisaathi'},
+                **self.connect_kwargs
+            )
+            await self.init_db()
+            logging.info("Async database pool ready")
+        return self
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def init_db(self):
+        async with self.pool.acquire(timeout=DB_POOL_TIMEOUT) as conn:
+            await conn.execute('''
+                CREATE TABLE IF NOT EXISTS users (
+                    id SERIAL PRIMARY KEY,
+                    username VARCHAR(50) UNIQUE NOT NULL,
+                    email VARCHAR(100) UNIQUE NOT NULL,
+                    password_hash VARCHAR(64) NOT NULL,
+                    language VARCHAR(10) DEFAULT 'en',
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+    async def _run(self, method, query, *args, idempotent=False):
+        """Run one statement; on a dropped connection retry once on a new one if idempotent
+
+        Writes are not retried: the first attempt may have committed before
+        the connection dropped.
+        """
+        for attempt in range(2 if idempotent else 1):
+            try:
+                # acquire() resets the connection on release and replaces closed ones
+                async with self.pool.acquire(timeout=DB_POOL_TIMEOUT) as conn:
+                    return await getattr(conn, method)(query, *args)
+            except CONNECTION_ERRORS as e:
+                # Replace idle connections that point at the old server
+                self.pool.expire_connections()
+                if attempt == 1 or not idempotent:
+                    raise
+                logging.warning(f"Database connection lost ({e}), retrying")
+
+    async def create_user(self, username, email, password, language='en'):
+        try:
+            await self._run(
+                'execute',
+                "INSERT INTO users (username, email, password_hash, language) VALUES ($1, $2, $3, $4)",
+                username, email, self.hash_password(password), language
+            )
+            self.profile_cache.invalidate(username)
+            return True
+        except asyncpg.exceptions.UniqueViolationError as e:
+            logging.warning(f"User creation failed - duplicate: {e}")
+            return False
+        except Exception as e:
+            logging.error(f"User creation failed: {e}")
+            return False
+
+    async def get_profile(self, username):
+        """Profile dict (including password_hash) for a username, served from cache when possible"""
+        profile = self.profile_cache.get(username)
+        if profile is not None:
+            return profile
+        row = await self._run(
+            'fetchrow',
+            "SELECT id, username, email, language, password_hash FROM users WHERE username = $1",
+            username, idempotent=True
+        )
+        if row is None:
+            return None
+        profile = dict(row)
+        self.profile_cache.set(username, profile)
+        return profile
+
+    async def update_language(self, username, language):
+        try:
+            await self._run(
+                'execute',
+                "UPDATE users SET language = $1 WHERE username = $2",
+                language, username, idempotent=True
+            )
+        except Exception as e:
+            logging.error(f"Language update failed: {e}")
+        finally:
+            self.profile_cache.invalidate(username)
+
+    async def insert_users_bulk(self, records):
+        """Insert (username, email, password_hash, language) tuples in one statement.
+
+        Returns 'created' or 'duplicate' per record, like UserDatabase.insert_users_bulk.
+        """
+        usernames = [record[0] for record in records]
+        columns = [[record[i] for record in records] for i in range(1, 4)]
+        rows = await self._run(
+            'fetch',
+            """
+            INSERT INTO users (username, email, password_hash, language)
+            SELECT * FROM unnest($1::varchar[], $2::varchar[], $3::varchar[], $4::varchar[])
+            ON CONFLICT DO NOTHING
+            RETURNING username
+            """,
+            usernames, *columns
+        )
+        created = {row['username'] for row in rows}
+        statuses = []
+        for username in usernames:
+            # The first record with an inserted username gets the credit, as in the sync store
+            if username in created:
+                created.discard(username)
+                statuses.append('created')
+                self.profile_cache.invalidate(username)
+            else:
+                statuses.append('duplicate')
+        return statuses
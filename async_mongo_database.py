@@ -0,0 +1,111 @@
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+import os
+from datetime import datetime
+import logging
+
+from user_cache import UserProfileCache
+from storage import AsyncUserStore
+
+
+def _pool_settings(config):
+    """MongoClient pool options from the `storage.mongo` config section, env vars win"""
+    return {
+        # Enough connections for every in-flight request on one worker
+        'maxPoolSize': int(os.getenv("MONGO_MAX_POOL_SIZE", config.get("max_pool_size", 100))),
+        # Keep warm connections so a burst does not pay for TLS handshakes
+        'minPoolSize': int(os.getenv("MONGO_MIN_POOL_SIZE", config.get("min_pool_size", 10))),
+        'maxIdleTimeMS': int(os.getenv("MONGO_MAX_IDLE_TIME_MS", config.get("max_idle_time_ms", 300000))),
+        # Fail fast instead of queueing forever when the pool is exhausted
+        'waitQueueTimeoutMS': int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", config.get("wait_queue_timeout_ms", 2000))),
+        'serverSelectionTimeoutMS': int(config.get("server_selection_timeout_ms", 5000)),
+        'retryWrites': True,
+    }
+
+
+class AsyncMongoUserDatabase(AsyncUserStore):
+    """motor-backed variant of mongo_database.UserDatabase for async FastAPI handlers"""
+
+    def __init__(self, config=None):
+        self.mongo_url = os.getenv('MONGODB_URL', 'mongodb://localhost:27017/')
+        self.pool_settings = _pool_settings(config or {})
+        self.client = None
+        self.users = None
+        # Same namespace as the sync Mongo store: both front the same collection
+        self.profile_cache = UserProfileCache("mongo")
+
+    async def connect(self):
+        if self.client is None:
+            self.client = AsyncIOMotorClient(self.mongo_url, **self.pool_settings)
+            self.users = self.client.krishisaathi.users
+            await self.users.create_index("username", unique=True)
+            await self.users.create_index("email", unique=True)
+            logging.info("Async MongoDB client ready")
+        return self
+
+    async def close(self):
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+
+    async def create_user(self, username, email, password, language='en'):
+        try:
+            await self.users.insert_one({
+                'username': username,
+                'email': email,
+                'password_hash': self.hash_password(password),
+                'language': language,
+                'created_at': datetime.utcnow()
+            })
+            self.profile_cache.invalidate(username)
+            return True
+        except DuplicateKeyError as e:
+            logging.warning(f"User creation failed - duplicate: {e}")
+            return False
+        except Exception as e:
+            logging.error(f"User creation failed: {e}")
+            return False
+
+    async def get_profile(self, username):
+        """Profile dict (including password_hash) for a username, served from cache when possible"""
+        profile = self.profile_cache.get(username)
+        if profile is not None:
+            return profile
+        user = await self.users.find_one({'username': username})
+        if user is None:
+            return None
+        profile = {
+            'id': str(user['_id']),
+            'username': user['username'],
+            'email': user['email'],
+            'language': user['language'],
+            'password_hash': user['password_hash']
+        }
+        self.profile_cache.set(username, profile)
+        return profile
+
+    async def update_language(self, username, language):
+        try:
+            await self.users.update_one({'username': username}, {'$set': {'language': language}})
+        except Exception as e:
+            logging.error(f"Language update failed: {e}")
+        finally:
+            self.profile_cache.invalidate(username)
+
+    async def insert_users_bulk(self, records):
+        """Insert (username, email, password_hash, language) tuples; same statuses as the sync store"""
+        now = datetime.utcnow()
+        docs = [
+            {'username': u, 'email': e, 'password_hash': h, 'language': lang, 'created_at': now}
+            for u, e, h, lang in records
+        ]
+        statuses = ['created'] * len(docs)
+        try:
+            await self.users.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get('writeErrors', []):
+                statuses[error['index']] = 'duplicate' if error.get('code') == 11000 else 'error'
+        for (username, _, _, _), status in zip(records, statuses):
+            if status == 'created':
+                self.profile_cache.invalidate(username)
+        return statuses
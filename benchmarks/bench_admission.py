@@ -0,0 +1,123 @@
+"""Overhead and behaviour of the admission control middleware.
+
+Times a trivial priced route with no admission, with in-process state and
+with the shared SQLite state, then checks that a retry storm from one client
+is turned away with 429 + Retry-After while other clients are still served,
+and that the concurrency limit holds across two workers sharing one file.
+
+    python benchmarks/bench_admission.py
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'api'))
+
+from admission import AdmissionMiddleware, MemoryAdmissionState, SQLiteAdmissionState
+
+MIDDLEWARE_BUDGET_US = 250.0
+COSTS = {"/predict/crop": (1, "tabular"), "/predict/disease": (20, "disease")}
+
+
+def make_app(state=None, rate=1e9, burst=1e9):
+    from fastapi import FastAPI, Request
+    app = FastAPI()
+
+    @app.post("/predict/crop")
+    def crop():
+        return {"success": True}
+
+    @app.post("/predict/disease")
+    async def disease(request: Request):
+        # Like the real endpoint: the slot is taken once the upload has been read
+        await request.body()
+        await asyncio.sleep(0.05)
+        return {"success": True}
+
+    if state is not None:
+        app.add_middleware(AdmissionMiddleware, state=state, costs=COSTS,
+                           concurrency={"tabular": 8, "disease": 2}, rate=rate, burst=burst, enabled=True)
+    return app
+
+
+async def call(app, path, client="10.0.0.1"):
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+             "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+             "query_string": b"", "headers": [], "client": (client, 1), "server": ("test", 80)}
+    response = {}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = dict(message["headers"])
+
+    await app(scope, receive, send)
+    return response
+
+
+async def overhead(apps, rounds, batch=50):
+    """Median per-request time for each app, batches interleaved so drift hits all equally"""
+    times = [[] for _ in apps]
+    for _ in range(rounds):
+        for app, app_times in zip(apps, times):
+            start = time.perf_counter()
+            for _ in range(batch):
+                await call(app, "/predict/crop")
+            app_times.append((time.perf_counter() - start) / batch)
+    return [statistics.median(app_times) for app_times in times]
+
+
+async def storm(path):
+    # Disease costs 20 of a 60-token bucket: three admitted, then 429 until refilled
+    app = make_app(SQLiteAdmissionState(path), rate=2, burst=60)
+    statuses = [(await call(app, "/predict/disease", "10.0.0.9"))["status"] for _ in range(10)]
+    rejected = await call(app, "/predict/disease", "10.0.0.9")
+    other = await call(app, "/predict/disease", "10.0.0.10")
+    return statuses, rejected, other
+
+
+async def shared_concurrency(path):
+    """Two 'workers' with their own connections to one file share the disease limit of 2"""
+    workers = [make_app(SQLiteAdmissionState(path)), make_app(SQLiteAdmissionState(path))]
+    results = await asyncio.gather(*[
+        call(workers[i % 2], "/predict/disease", f"10.1.0.{i}") for i in range(6)])
+    return [r["status"] for r in results]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Measure admission control overhead")
+    ap.add_argument("--requests", type=int, default=5000)
+    args = ap.parse_args()
+    tmp = tempfile.mkdtemp(prefix="admission_")
+
+    bare, memory, shared = asyncio.run(overhead(
+        [make_app(), make_app(MemoryAdmissionState()), make_app(SQLiteAdmissionState(os.path.join(tmp, "a.db")))],
+        max(1, args.requests // 50)))
+    print(f"bare route:   {bare * 1e6:.1f} us")
+    print(f"memory state: {(memory - bare) * 1e6:+.1f} us")
+    print(f"sqlite state: {(shared - bare) * 1e6:+.1f} us (budget {MIDDLEWARE_BUDGET_US} us)")
+
+    statuses, rejected, other = asyncio.run(storm(os.path.join(tmp, "b.db")))
+    print(f"retry storm:  {statuses.count(200)} admitted, {statuses.count(429)} rejected, "
+          f"Retry-After {rejected['headers'].get(b'retry-after', b'-').decode()} s; "
+          f"other client -> {other['status']}")
+    concurrent = asyncio.run(shared_concurrency(os.path.join(tmp, "c.db")))
+    print(f"6 concurrent disease requests over 2 workers (limit 2): {sorted(concurrent)}")
+
+    ok = ((shared - bare) * 1e6 <= MIDDLEWARE_BUDGET_US and statuses.count(200) == 3
+          and rejected["status"] == 429 and other["status"] == 200 and concurrent.count(200) == 2)
+    if not ok:
+        print("FAILED")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Bulk user import throughput: create_user loop vs insert_users_bulk.
+
+    python benchmarks/bench_bulk_import.py --users 100000 --backend postgres
+    python benchmarks/bench_bulk_import.py --users 100000 --backend mongo
+    python benchmarks/bench_bulk_import.py --users 100000 --backend none   # CSV parse/validate/hash only
+
+Benchmark accounts are prefixed "bulkbench_" and deleted afterwards.
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from languages import INDIAN_LANGUAGES
+from user_import import import_users
+
+
+class NullSink:
+    """Accepts everything; isolates CSV parsing, validation and hashing cost"""
+
+    def insert_users_bulk(self, records):
+        return ['created'] * len(records)
+
+
+def make_csv(n, duplicate_every=50):
+    lines = ["username,email,password,language"]
+    for i in range(n):
+        # Every Nth row repeats an earlier username to exercise duplicate reporting
+        uid = i - 1 if duplicate_every and i and i % duplicate_every == 0 else i
+        lines.append(f"bulkbench_{uid},bulkbench_{i}@example.com,pw{i},hi")
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def open_backend(name):
+    if name == "postgres":
+        from database import UserDatabase
+        return UserDatabase()
+    if name == "mongo":
+        from mongo_database import UserDatabase
+        return UserDatabase()
+    return NullSink()
+
+
+def cleanup(name, db):
+    if name == "postgres":
+        with db.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("DELETE FROM users WHERE username LIKE 'bulkbench\\_%'")
+            conn.commit()
+    elif name == "mongo":
+        db.users.delete_many({'username': {'$regex': '^bulkbench_'}})
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark bulk user onboarding")
+    ap.add_argument("--users", type=int, default=100000)
+    ap.add_argument("--backend", choices=["postgres", "mongo", "none"], default="postgres")
+    ap.add_argument("--loop-sample", type=int, default=2000,
+                    help="rows inserted one by one with create_user for the baseline")
+    args = ap.parse_args()
+
+    db = open_backend(args.backend)
+    payload = make_csv(args.users)
+    try:
+        if args.backend != "none":
+            start = time.perf_counter()
+            for i in range(args.loop_sample):
+                db.create_user(f"bulkbench_loop_{i}", f"bulkbench_loop_{i}@example.com", "pw", "hi")
+            loop_rate = args.loop_sample / (time.perf_counter() - start)
+            print(f"create_user loop : {loop_rate:10.1f} users/s "
+                  f"(~{args.users / loop_rate:.0f}s for {args.users})")
+
+        start = time.perf_counter()
+        summary = None
+        for line in import_users(db, io.BytesIO(payload), INDIAN_LANGUAGES):
+            record = json.loads(line)
+            summary = record.get("summary", summary)
+        elapsed = time.perf_counter() - start
+        print(f"bulk import      : {args.users / elapsed:10.1f} rows/s ({elapsed:.2f}s) {summary}")
+    finally:
+        cleanup(args.backend, db)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Crop what-if sweeps: one vectorized sweep_crop call vs one predict_crop per point.
+
+Scores square rainfall x pH grids of increasing size with sweep_crop, and
+--loop-points of the same points one predict_crop call at a time (what a
+client looping over /predict/crop costs the server), and reports points/s
+for both. Uses the crop model in MODELS_DIR, or --fixture for the stand-in
+forest from benchmarks/micro/fixtures.py.
+
+    python benchmarks/bench_crop_sweep.py --sizes 10 100 1000 10000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from src.inference import predict
+
+BASE = {"N": 90, "P": 42, "K": 43, "temperature": 20.8, "humidity": 82.0, "ph": 6.5, "rainfall": 202.9}
+
+
+def axes_for(points):
+    side = int(round(points ** 0.5))
+    return [("rainfall", np.linspace(20, 300, side).tolist()), ("ph", np.linspace(4, 9, max(1, points // side)).tolist())]
+
+
+def time_sweep(axes, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = predict.sweep_crop(BASE, axes)
+        times.append(time.perf_counter() - start)
+    return result["points"], statistics.median(times)
+
+
+def time_loop(axes, limit):
+    (first, xs), (second, ys) = axes
+    rows = [dict(BASE, **{first: x, second: y}) for x in xs for y in ys][:limit]
+    start = time.perf_counter()
+    for row in rows:
+        predict.predict_crop(row)
+    return len(rows), time.perf_counter() - start
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Throughput of crop what-if sweeps")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    ap.add_argument("--loop-points", type=int, default=200, help="points scored one call at a time per size")
+    ap.add_argument("--repeats", type=int, default=5)
+    ap.add_argument("--fixture", action="store_true", help="use the stand-in forest instead of MODELS_DIR")
+    args = ap.parse_args()
+
+    if args.fixture:
+        from benchmarks.micro import fixtures
+        predict.registry.install("crop", fixtures.crop_model(), columns=list(fixtures.CROP_FEATURES))
+    served = predict._lazy_crop()
+    print(f"crop model {served.version}: {len(served.model.estimators_)} trees")
+    predict.sweep_crop(BASE, axes_for(10))  # warm up
+
+    print(f"{'points':>8} {'sweep ms':>10} {'sweep pts/s':>12} {'loop pts/s':>11} {'speedup':>8}")
+    for size in args.sizes:
+        axes = axes_for(size)
+        points, sweep_s = time_sweep(axes, args.repeats)
+        looped, loop_s = time_loop(axes, min(points, args.loop_points))
+        sweep_rate, loop_rate = points / sweep_s, looped / loop_s
+        print(f"{points:8d} {sweep_s * 1000:10.1f} {sweep_rate:12.0f} {loop_rate:11.0f} {sweep_rate / loop_rate:7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
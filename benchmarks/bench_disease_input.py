@@ -0,0 +1,111 @@
+"""Disease training input pipeline: image folders vs TFRecord shards, on CPU.
+
+Writes a PlantVillage-like tree of --images JPEGs (--classes folders,
+--pixels square) to a temporary directory, then in a fresh process per mode
+iterates --epochs epochs of the training split, as model.fit would, and
+reports images/sec per epoch and the process's peak RSS (VmHWM):
+
+  directory  make_datasets: image_dataset_from_directory per split,
+             .cache() in RAM, shuffle, prefetch
+  records    build_disease_records once (timed separately), then
+             make_record_datasets: interleaved shards, file cache, prefetch
+
+    python benchmarks/bench_disease_input.py --images 4000 --epochs 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+IMG_SIZE = (224, 224)
+BATCH_SIZE = 32
+SEED = 42
+
+
+def write_tree(root, images, classes, pixels):
+    """Leaf-photo stand-ins: smooth random texture, tinted per class, JPEG quality 90"""
+    import numpy as np
+    from PIL import Image
+    rng = np.random.default_rng(0)
+    for i in range(images):
+        label = f"class_{i % classes}"
+        os.makedirs(os.path.join(root, label), exist_ok=True)
+        small = rng.integers(0, 255, (pixels // 16, pixels // 16, 3), dtype=np.uint8)
+        small[..., i % 3] //= 2
+        Image.fromarray(small).resize((pixels, pixels), Image.BILINEAR).save(
+            os.path.join(root, label, f"{i:06d}.jpg"), "JPEG", quality=90)
+
+
+def peak_rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def iterate(ds, epochs):
+    rates = []
+    for _ in range(epochs):
+        start, seen = time.perf_counter(), 0
+        for images, _ in ds:
+            seen += int(images.shape[0])
+        rates.append(seen / (time.perf_counter() - start))
+    return rates
+
+
+def child(mode, data_dir, records_dir, epochs):
+    from src.pipelines import disease_pipeline
+    if mode == "build":
+        from src.training.build_disease_records import build_records
+        start = time.perf_counter()
+        build_records(data_dir, records_dir, IMG_SIZE, SEED)
+        return {"seconds": time.perf_counter() - start, "peak_mb": peak_rss_mb()}
+    if mode == "directory":
+        train_ds, _, _ = disease_pipeline.make_datasets(data_dir, IMG_SIZE[0], BATCH_SIZE, SEED)
+    else:
+        train_ds, _, _ = disease_pipeline.make_record_datasets(records_dir, BATCH_SIZE, SEED,
+                                                               cache_dir=os.path.join(records_dir, "bench_cache"))
+    return {"rates": iterate(train_ds, epochs), "peak_mb": peak_rss_mb()}
+
+
+def run_child(mode, data_dir, records_dir, epochs):
+    out = subprocess.run([sys.executable, "-W", "ignore", __file__, "--child", mode, data_dir, records_dir, str(epochs)],
+                         check=True, stdout=subprocess.PIPE, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+        print(json.dumps(child(sys.argv[2], sys.argv[3], sys.argv[4], int(sys.argv[5]))))
+        return
+    ap = argparse.ArgumentParser(description="Images/sec and peak RAM of the disease input pipelines")
+    ap.add_argument("--images", type=int, default=4000)
+    ap.add_argument("--classes", type=int, default=3)
+    ap.add_argument("--pixels", type=int, default=256, help="side of the source JPEGs (PlantVillage: 256)")
+    ap.add_argument("--epochs", type=int, default=3)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir, records_dir = os.path.join(tmp, "images"), os.path.join(tmp, "records")
+        write_tree(data_dir, args.images, args.classes, args.pixels)
+        print(f"{args.images} {args.pixels}x{args.pixels} JPEGs in {args.classes} classes, "
+              f"batch {BATCH_SIZE}, {args.epochs} epochs of the training split")
+
+        build = run_child("build", data_dir, records_dir, args.epochs)
+        print(f"  build records  {build['seconds']:.1f} s, peak {build['peak_mb']:.0f} MB")
+        for mode in ("directory", "records"):
+            r = run_child(mode, data_dir, records_dir, args.epochs)
+            epochs = "  ".join(f"{rate:7.0f}" for rate in r["rates"])
+            print(f"  {mode:9s}  images/s per epoch: {epochs}   peak {r['peak_mb']:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Logins/sec against a local Postgres: connect-per-call vs pooled vs asyncpg.
+
+Uses the same DATABASE_URL / DB_* variables as the API. Creates --users
+benchmark accounts (prefixed "bench_") and removes them afterwards:
+
+    DB_PASSWORD=... python benchmarks/bench_logins.py --logins 5000 --concurrency 16
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+def unpooled_verify(db, username, password):
+    """What verify_user did before pooling: a new connection per call"""
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT id, username, email, language FROM users WHERE username = %s AND password_hash = %s",
+                (username, db.hash_password(password))
+            )
+            return cursor.fetchone()
+    finally:
+        conn.close()
+
+
+def run_threads(fn, logins, concurrency, users):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda i: fn(f"bench_{i % users}", "secret"), range(logins)))
+    elapsed = time.perf_counter() - start
+    assert all(results), "some logins failed"
+    return logins / elapsed
+
+
+async def run_async(logins, concurrency, users):
+    from async_database import AsyncUserDatabase
+    db = await AsyncUserDatabase().connect()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login(i):
+        async with semaphore:
+            return await db.verify_user(f"bench_{i % users}", "secret")
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(login(i) for i in range(logins)))
+    elapsed = time.perf_counter() - start
+    await db.close()
+    assert all(results), "some logins failed"
+    return logins / elapsed
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark login throughput")
+    ap.add_argument("--users", type=int, default=100)
+    ap.add_argument("--logins", type=int, default=2000)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--skip-async", action="store_true")
+    args = ap.parse_args()
+
+    # Pool sizing is read at import time, so set it before importing database
+    os.environ.setdefault("DB_POOL_MAX", str(args.concurrency))
+    from database import UserDatabase
+    db = UserDatabase()
+    for i in range(args.users):
+        db.create_user(f"bench_{i}", f"bench_{i}@example.com", "secret")
+
+    try:
+        results = {
+            "connect per call": run_threads(lambda u, p: unpooled_verify(db, u, p),
+                                            args.logins, args.concurrency, args.users),
+            "pooled (psycopg2)": run_threads(db.verify_user, args.logins, args.concurrency, args.users),
+        }
+        if not args.skip_async:
+            results["async pool (asyncpg)"] = asyncio.run(run_async(args.logins, args.concurrency, args.users))
+    finally:
+        with db.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("DELETE FROM users WHERE username LIKE 'bench\\_%'")
+            conn.commit()
+        db.close()
+
+    baseline = results["connect per call"]
+    print(f"{args.logins} logins, concurrency {args.concurrency}")
+    for name, rate in results.items():
+        print(f"  {name:22s} {rate:9.1f} logins/s  ({rate / baseline:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Measure what the instrumentation costs on the request path.
+
+Checks three things against fixed budgets and exits non-zero if any is
+exceeded:
+
+- one stage timer (enter + exit + histogram observe)        < 5 us
+- the stage timers of a crop prediction, relative to it     < 1 %
+- the request metrics middleware on a trivial FastAPI route < 100 us
+
+    python benchmarks/bench_metrics_overhead.py
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'api'))
+
+import metrics
+
+STAGE_TIMER_BUDGET_US = 5.0
+CROP_OVERHEAD_BUDGET = 0.01
+MIDDLEWARE_BUDGET_US = 100.0
+MODELS_DIR = os.getenv("MODELS_DIR", "new model")
+
+
+def per_call(fn, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n
+
+
+def bench_stage_timer(n):
+    def timed():
+        with metrics.stage_timer("bench.noop"):
+            pass
+    per_call(timed, n // 10)  # warm up
+    return per_call(timed, n) - per_call(lambda: None, n)
+
+
+def bench_crop(n):
+    """Crop prediction as predict_crop does it, bare vs with its three stage timers"""
+    import pandas as pd
+    from joblib import load
+    model = load(os.path.join(os.path.dirname(__file__), '..', MODELS_DIR, "crop_model.joblib"))
+    features = {"N": 90, "P": 42, "K": 43, "temperature": 20.8, "humidity": 82.0, "ph": 6.5, "rainfall": 202.9}
+
+    def bare():
+        df = pd.DataFrame([features])
+        model.predict(df)
+        model.predict_proba(df)
+
+    def instrumented():
+        with metrics.stage_timer("bench.crop.dataframe"):
+            df = pd.DataFrame([features])
+        with metrics.stage_timer("bench.crop.predict"):
+            model.predict(df)
+        with metrics.stage_timer("bench.crop.predict_proba"):
+            model.predict_proba(df)
+
+    bare()
+    # Interleave so drift (thermal, other load) hits both sides equally, and
+    # compare medians so a few scheduler hiccups do not decide the result
+    bare_times, instrumented_times = [], []
+    for _ in range(n):
+        bare_times.append(per_call(bare, 1))
+        instrumented_times.append(per_call(instrumented, 1))
+    return statistics.median(bare_times), statistics.median(instrumented_times)
+
+
+def bench_middleware(n):
+    from fastapi import FastAPI
+    from request_metrics import RequestMetricsMiddleware
+
+    def make_app(instrumented):
+        app = FastAPI()
+
+        @app.get("/ping/{name}")
+        def ping(name: str):
+            return {"ok": True}
+        if instrumented:
+            app.add_middleware(RequestMetricsMiddleware)
+        return app
+
+    async def drive(apps, rounds, batch=50):
+        scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+                 "scheme": "http", "path": "/ping/x", "raw_path": b"/ping/x", "root_path": "",
+                 "query_string": b"", "headers": [], "client": ("127.0.0.1", 1), "server": ("test", 80)}
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            pass
+
+        # Alternate batches between the apps and keep the median batch, as for crop
+        times = [[] for _ in apps]
+        for _ in range(rounds):
+            for app, app_times in zip(apps, times):
+                start = time.perf_counter()
+                for _ in range(batch):
+                    await app(dict(scope), receive, send)
+                app_times.append((time.perf_counter() - start) / batch)
+        return [statistics.median(app_times) for app_times in times]
+
+    bare, instrumented = asyncio.run(drive([make_app(False), make_app(True)], max(1, n // 50)))
+    labels = [labels for labels, _ in metrics.REGISTRY["http_requests_total"].samples()]
+    assert {"method": "GET", "endpoint": "/ping/{name}", "status": "200"} in labels, labels
+    return bare, instrumented
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Measure instrumentation overhead")
+    ap.add_argument("--timer-calls", type=int, default=200000)
+    ap.add_argument("--predictions", type=int, default=300)
+    ap.add_argument("--requests", type=int, default=5000)
+    args = ap.parse_args()
+
+    failures = []
+    timer = bench_stage_timer(args.timer_calls) * 1e6
+    print(f"stage timer:  {timer:.2f} us per stage (budget {STAGE_TIMER_BUDGET_US} us)")
+    if timer > STAGE_TIMER_BUDGET_US:
+        failures.append("stage timer")
+
+    bare, instrumented = bench_crop(args.predictions)
+    overhead = (instrumented - bare) / bare
+    print(f"crop predict: {bare * 1e3:.2f} ms bare, {instrumented * 1e3:.2f} ms instrumented "
+          f"({overhead:+.2%}, budget {CROP_OVERHEAD_BUDGET:.0%})")
+    if overhead > CROP_OVERHEAD_BUDGET:
+        failures.append("crop predict")
+
+    bare, instrumented = bench_middleware(args.requests)
+    added = (instrumented - bare) * 1e6
+    print(f"middleware:   {bare * 1e6:.1f} us bare route, {added:+.1f} us instrumented "
+          f"(budget {MIDDLEWARE_BUDGET_US} us)")
+    if added > MIDDLEWARE_BUDGET_US:
+        failures.append("middleware")
+
+    if failures:
+        print(f"over budget: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Per-worker unique memory (USS) and capacity: independent processes vs pre-fork.
+
+Starts --workers workers in each mode, has every worker serve --requests
+predictions (and run full GC passes, as a long-lived worker would), then
+reads /proc/<pid>/smaps_rollup:
+
+    python benchmarks/bench_prefork_memory.py --workers 4 --ram-mb 1024
+
+Modes:
+  independent     each worker loads the models itself (N x uvicorn today)
+  prefork         parent loads, then forks (copy-on-write, GC still walks model objects)
+  prefork+freeze  parent loads, gc.freeze(), then forks (prefork_server.py)
+
+Capacity is the number of workers that fit in --ram-mb: memory shared by
+all workers is counted once, each extra worker costs its USS.
+"""
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import prefork_server
+
+CROP = {"N": 90, "P": 42, "K": 43, "temperature": 20.8, "humidity": 82.0, "ph": 6.5, "rainfall": 202.9}
+FERT = {"temperature": 26, "humidity": 52, "moisture": 38, "soil_type": "Sandy", "crop_type": "Maize",
+        "N": 37, "P": 0, "K": 0}
+
+
+def workload(names, requests):
+    predict = prefork_server._predict()
+    gc.enable()
+    for i in range(requests):
+        if "crop" in names:
+            predict.predict_crop(dict(CROP))
+        if "fertilizer" in names:
+            predict.predict_fertilizer(dict(FERT))
+        if i % 50 == 0:
+            gc.collect()
+    gc.collect()
+
+
+def worker_after_fork(names, requests, ready_w):
+    workload(names, requests)
+    os.write(ready_w, b"x")
+    time.sleep(3600)
+
+
+def start_forked(names, workers, requests, freeze):
+    gc.disable()
+    prefork_server.preload(names, freeze=freeze)
+    ready_r, ready_w = os.pipe()
+    pids = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                worker_after_fork(names, requests, ready_w)
+            finally:
+                os._exit(0)
+        pids.append(pid)
+    for _ in pids:
+        os.read(ready_r, 1)
+    return pids
+
+
+def start_independent(names, workers, requests):
+    procs = [
+        subprocess.Popen([sys.executable, "-W", "ignore", __file__, "--child", ",".join(names), str(requests)],
+                         stdout=subprocess.PIPE)
+        for _ in range(workers)
+    ]
+    for proc in procs:
+        proc.stdout.read(1)
+    return [proc.pid for proc in procs]
+
+
+def run_mode(mode, names, workers, requests):
+    """Measure one mode in a fresh interpreter so modes do not share a parent heap"""
+    out = subprocess.run(
+        [sys.executable, "-W", "ignore", __file__, "--measure", mode, ",".join(names), str(workers), str(requests)],
+        capture_output=True, text=True, check=True,
+    ).stdout.strip().splitlines()[-1]
+    return json.loads(out)
+
+
+def measure(mode, names, workers, requests):
+    if mode == "independent":
+        pids = start_independent(names, workers, requests)
+        parent = None
+    else:
+        pids = start_forked(names, workers, requests, freeze=(mode == "prefork+freeze"))
+        parent = prefork_server.read_memory(os.getpid())
+    try:
+        children = [prefork_server.read_memory(pid) for pid in pids]
+    finally:
+        for pid in pids:
+            os.kill(pid, 9)
+    print(json.dumps({"parent": parent, "workers": children}))
+
+
+def capacity(result, workers, ram_kb):
+    total = sum(w["pss_kb"] for w in result["workers"]) + (result["parent"]["pss_kb"] if result["parent"] else 0)
+    uss = sum(w["uss_kb"] for w in result["workers"]) / workers
+    base = total - workers * uss
+    return int((ram_kb - base) // uss), uss, total
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        names = sys.argv[2].split(",")
+        prefork_server.preload(names, freeze=False)
+        workload(names, int(sys.argv[3]))
+        sys.stdout.write("x")
+        sys.stdout.flush()
+        time.sleep(3600)
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "--measure":
+        measure(sys.argv[2], sys.argv[3].split(","), int(sys.argv[4]), int(sys.argv[5]))
+        return
+
+    ap = argparse.ArgumentParser(description="Compare per-worker memory of serving modes")
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--requests", type=int, default=500, help="predictions served by each worker before measuring")
+    ap.add_argument("--preload", default="crop,fertilizer")
+    ap.add_argument("--ram-mb", type=int, default=1024, help="RAM available for API workers")
+    args = ap.parse_args()
+    names = args.preload.split(",")
+
+    print(f"{args.workers} workers, models: {args.preload}, {args.requests} predictions each, {args.ram_mb} MB box")
+    print(f"  {'mode':16s} {'USS/worker':>11s} {'RSS/worker':>11s} {'total PSS':>10s} {'capacity':>9s}")
+    for mode in ("independent", "prefork", "prefork+freeze"):
+        result = run_mode(mode, names, args.workers, args.requests)
+        fit, uss, total = capacity(result, args.workers, args.ram_mb * 1024)
+        rss = sum(w["rss_kb"] for w in result["workers"]) / args.workers
+        print(f"  {mode:16s} {uss / 1024:9.1f}MB {rss / 1024:9.1f}MB {total / 1024:8.1f}MB {fit:9d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Soil-report latency: one /predict/soil-report call vs /predict/crop then /predict/fertilizer.
+
+The separate path is what clients do today: ask for a crop, map it to a
+fertilizer crop type and ask for a fertilizer. Both paths are timed
+interleaved, one request at a time, over --requests soil-health cards:
+
+    python benchmarks/bench_soil_report.py --url http://127.0.0.1:8000   # against a running API
+    python benchmarks/bench_soil_report.py                               # in process, models only
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from src.inference import predict
+
+SOIL_TYPES = ["Clayey", "Loamy", "Red", "Sandy"]
+
+
+def cards(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [{
+        "N": int(rng.integers(0, 140)), "P": int(rng.integers(5, 145)), "K": int(rng.integers(5, 205)),
+        "temperature": round(float(rng.uniform(10, 40)), 1), "humidity": round(float(rng.uniform(20, 95)), 1),
+        "ph": round(float(rng.uniform(4.5, 8.5)), 1), "rainfall": round(float(rng.uniform(30, 280)), 1),
+        "moisture": round(float(rng.uniform(25, 65)), 1), "soil_type": SOIL_TYPES[int(rng.integers(0, 4))],
+    } for _ in range(n)]
+
+
+def crop_fields(card):
+    return {name: card[name] for name in predict.CROP_FEATURES}
+
+
+def fertilizer_fields(card, crop):
+    # Crops the fertilizer model does not know fall back to a common type, as a client would
+    crop_type = predict.CROP_TO_FERTILIZER_CROP_TYPE.get(crop, "Maize")
+    fields = {name: card[name] for name in ("temperature", "humidity", "moisture", "soil_type", "N", "P", "K")}
+    return dict(fields, crop_type=crop_type)
+
+
+def in_process_paths():
+    def separate(card):
+        crop = predict.predict_crop(crop_fields(card))["crop"]
+        predict.predict_fertilizer(fertilizer_fields(card, crop))
+
+    def combined(card, top_k):
+        predict.soil_report(card, top_k)
+    return separate, combined
+
+
+def http_paths(url):
+    import requests
+    session = requests.Session()
+
+    def post(path, body):
+        r = session.post(url + path, json=body, timeout=30)
+        r.raise_for_status()
+        data = r.json()
+        if not data.get("success"):
+            raise RuntimeError(f"{path}: {data.get('error')}")
+        return data["data"]
+
+    def separate(card):
+        crop = post("/predict/crop", crop_fields(card))["crop"]
+        post("/predict/fertilizer", fertilizer_fields(card, crop))
+
+    def combined(card, top_k):
+        post("/predict/soil-report", dict(card, top_k=top_k))
+    return separate, combined
+
+
+def summary(times):
+    times = sorted(times)
+    return f"p50 {statistics.median(times) * 1000:7.2f} ms  p95 {times[int(len(times) * 0.95)] * 1000:7.2f} ms"
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Latency of the combined soil report vs two separate calls")
+    ap.add_argument("--url", help="base URL of a running API (default: call the models in process)")
+    ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--top-k", type=int, default=3)
+    args = ap.parse_args()
+
+    separate, combined = http_paths(args.url.rstrip("/")) if args.url else in_process_paths()
+    samples = cards(args.requests)
+    # Warm up models and connections
+    separate(samples[0])
+    combined(samples[0], args.top_k)
+
+    times = {"crop + fertilizer": [], "soil-report top_k=1": [], f"soil-report top_k={args.top_k}": []}
+    calls = [
+        ("crop + fertilizer", separate),
+        ("soil-report top_k=1", lambda card: combined(card, 1)),
+        (f"soil-report top_k={args.top_k}", lambda card: combined(card, args.top_k)),
+    ]
+    for card in samples:
+        for name, call in calls:
+            start = time.perf_counter()
+            call(card)
+            times[name].append(time.perf_counter() - start)
+
+    print(f"{args.requests} soil-health cards, {'HTTP ' + args.url if args.url else 'in process'}")
+    for name, values in times.items():
+        print(f"  {name:22s} {summary(values)}")
+
+
+if __name__ == "__main__":
+    main()
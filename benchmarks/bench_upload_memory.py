@@ -0,0 +1,179 @@
+"""Peak server memory under concurrent large disease-image uploads.
+
+Serves /predict/disease the old way (UploadFile, ``await file.read()``, full
+decode) and through src/api/uploads.py (streamed, sniffed, size-capped,
+decoded from the spool at reduced JPEG scale), each in its own uvicorn
+process with the stand-in disease model from benchmarks/micro/fixtures.py,
+and fires --concurrency uploads of a --megapixels phone photo at once.
+Reports the server's peak RSS (VmHWM) above its idle RSS, and how an
+oversized upload is handled.
+
+    python benchmarks/bench_upload_memory.py --concurrency 8
+"""
+import argparse
+import io
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+
+def build_app(mode):
+    import numpy as np
+    from fastapi import FastAPI, File, Request, UploadFile
+    from fastapi.responses import JSONResponse
+    from PIL import Image
+
+    from benchmarks.micro import fixtures
+    from src.inference import predict
+    sys.path.insert(0, os.path.join(ROOT, 'src', 'api'))
+    from uploads import read_uploads, UploadRejected
+
+    served = predict.registry.install("disease", fixtures.DiseaseModel(), labels=list(fixtures.DISEASE_LABELS))
+    app = FastAPI()
+
+    if mode == "legacy":
+        @app.post("/predict/disease")
+        async def legacy(file: UploadFile = File(...)):
+            # The endpoint and decode as they were before the upload pipeline
+            try:
+                img_bytes = await file.read()
+                img = Image.open(io.BytesIO(img_bytes)).convert("RGB").resize((224, 224))
+                arr = (np.array(img) / 255.0)[None, ...]
+                probs = served.model.predict(arr)[0]
+                return {"success": True, "confidence": float(probs.max())}
+            except Exception as e:
+                return {"success": False, "error": str(e)}
+    else:
+        @app.post("/predict/disease")
+        async def streaming(request: Request):
+            try:
+                (upload,) = await read_uploads(request, "file")
+            except UploadRejected as e:
+                return JSONResponse({"success": False, "error": e.message}, status_code=e.status_code)
+            try:
+                return {"success": True, "confidence": predict.predict_disease(upload.file)["confidence"]}
+            finally:
+                upload.close()
+    return app
+
+
+def serve(mode, port):
+    import uvicorn
+    uvicorn.run(build_app(mode), host="127.0.0.1", port=port, log_level="warning")
+
+
+def memory_kb(pid, field):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def photo(megapixels):
+    """Phone-camera JPEG: smooth random texture, quality 95"""
+    import numpy as np
+    from PIL import Image
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    rng = np.random.default_rng(0)
+    small = Image.fromarray(rng.integers(0, 255, (height // 12, width // 12, 3), dtype=np.uint8))
+    buffer = io.BytesIO()
+    small.resize((width, height), Image.BILINEAR).save(buffer, "JPEG", quality=95)
+    return buffer.getvalue()
+
+
+def chunked(data, size=64 * 1024):
+    """Body without Content-Length, so only the streaming limits can stop it"""
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def run_mode(mode, image, concurrency, oversized):
+    port = free_port()
+    proc = subprocess.Popen([sys.executable, "-W", "ignore", __file__, "--serve", mode, str(port)])
+    url = f"http://127.0.0.1:{port}/predict/disease"
+    try:
+        warm = photo(0.3)
+        for _ in range(100):
+            try:
+                requests.post(url, files={"file": ("warm.jpg", warm, "image/jpeg")}, timeout=30)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.2)
+        idle = memory_kb(proc.pid, "VmRSS")
+
+        statuses, latencies = [], []
+        def upload():
+            start = time.perf_counter()
+            r = requests.post(url, files={"file": ("leaf.jpg", image, "image/jpeg")}, timeout=300)
+            latencies.append(time.perf_counter() - start)
+            statuses.append(r.status_code)
+        threads = [threading.Thread(target=upload) for _ in range(concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        peak = memory_kb(proc.pid, "VmHWM")
+
+        # Multipart body streamed without Content-Length
+        boundary = "benchboundary"
+        body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"huge.jpg\"\r\n"
+                f"Content-Type: image/jpeg\r\n\r\n").encode() + oversized + f"\r\n--{boundary}--\r\n".encode()
+        start = time.perf_counter()
+        try:
+            r = requests.post(url, data=chunked(body), timeout=300,
+                              headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+            oversized_result = f"{r.status_code} {r.json().get('success')} in {time.perf_counter() - start:.2f} s"
+        except requests.RequestException as e:
+            oversized_result = f"connection closed ({type(e).__name__}) in {time.perf_counter() - start:.2f} s"
+        oversized_peak = memory_kb(proc.pid, "VmHWM")
+    finally:
+        proc.terminate()
+        proc.wait()
+    return {
+        "statuses": sorted(set(statuses)),
+        "idle_mb": idle / 1024,
+        "peak_mb": (peak - idle) / 1024,
+        "mean_s": sum(latencies) / len(latencies),
+        "oversized": oversized_result,
+        "oversized_peak_mb": (oversized_peak - idle) / 1024,
+    }
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--serve":
+        serve(sys.argv[2], int(sys.argv[3]))
+        return
+    ap = argparse.ArgumentParser(description="Peak memory of the disease upload path")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--megapixels", type=float, default=24)
+    ap.add_argument("--oversized-mb", type=int, default=40)
+    args = ap.parse_args()
+
+    image = photo(args.megapixels)
+    oversized = b"\xff\xd8\xff" + os.urandom(args.oversized_mb * 1024 * 1024)
+    print(f"{args.concurrency} concurrent uploads of a {args.megapixels:g} MP JPEG ({len(image) / 1e6:.1f} MB), "
+          f"then one {args.oversized_mb} MB upload without Content-Length")
+    for mode in ("legacy", "streaming"):
+        r = run_mode(mode, image, args.concurrency, oversized)
+        print(f"  {mode:9s} status {r['statuses']}, peak +{r['peak_mb']:.0f} MB over idle {r['idle_mb']:.0f} MB, "
+              f"mean latency {r['mean_s']:.2f} s; oversized: {r['oversized']}, peak +{r['oversized_peak_mb']:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Throughput comparison for every user storage backend.
+
+Each backend is timed on registration, login and profile-update workloads
+(the shared UserStore contract is checked by tests/test_user_stores.py):
+
+    python benchmarks/bench_user_stores.py --backends memory,async-memory
+    DB_PASSWORD=... python benchmarks/bench_user_stores.py --backends postgres,async-postgres
+    MONGODB_URL=... python benchmarks/bench_user_stores.py --backends mongo,async-mongo
+
+Accounts are named "bench_<backend>_<n>" and are left in place; point the
+script at a scratch database.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from storage import get_user_store, get_async_user_store
+
+BACKENDS = ("memory", "postgres", "mongo", "async-memory", "async-postgres", "async-mongo")
+
+
+def timed(fn, count):
+    start = time.perf_counter()
+    fn()
+    return count / (time.perf_counter() - start)
+
+
+def bench_sync(backend, users, ops, concurrency):
+    store = get_user_store(backend)
+    try:
+        prefix = f"bench_{backend}_{uuid.uuid4().hex[:6]}"
+
+        def run(fn, count):
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                results = list(pool.map(fn, range(count)))
+            assert all(result is not False for result in results)
+
+        return {
+            "register": timed(lambda: run(
+                lambda i: store.create_user(f"{prefix}_{i}", f"{prefix}_{i}@example.com", "secret"), users), users),
+            "login": timed(lambda: run(
+                lambda i: store.verify_user(f"{prefix}_{i % users}", "secret") or False, ops), ops),
+            "profile update": timed(lambda: run(
+                lambda i: store.update_language(f"{prefix}_{i % users}", "hi" if i % 2 else "en"), ops), ops),
+        }
+    finally:
+        store.close()
+
+
+async def bench_async(backend, users, ops, concurrency):
+    store = await get_async_user_store(backend).connect()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(coro_fn, count):
+        async def one(i):
+            async with semaphore:
+                return await coro_fn(i)
+        results = await asyncio.gather(*(one(i) for i in range(count)))
+        assert all(result is not False for result in results)
+
+    async def atimed(coro_fn, count):
+        start = time.perf_counter()
+        await run(coro_fn, count)
+        return count / (time.perf_counter() - start)
+
+    try:
+        prefix = f"bench_async_{backend}_{uuid.uuid4().hex[:6]}"
+        return {
+            "register": await atimed(
+                lambda i: store.create_user(f"{prefix}_{i}", f"{prefix}_{i}@example.com", "secret"), users),
+            "login": await atimed(lambda i: _verify_or_false(store, f"{prefix}_{i % users}"), ops),
+            "profile update": await atimed(
+                lambda i: store.update_language(f"{prefix}_{i % users}", "hi" if i % 2 else "en"), ops),
+        }
+    finally:
+        await store.close()
+
+
+async def _verify_or_false(store, username):
+    return await store.verify_user(username, "secret") or False
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare user storage backends")
+    ap.add_argument("--backends", default="memory,async-memory",
+                    help=f"comma-separated, from: {', '.join(BACKENDS)}")
+    ap.add_argument("--users", type=int, default=500, help="accounts registered per backend")
+    ap.add_argument("--ops", type=int, default=5000, help="logins and profile updates per backend")
+    ap.add_argument("--concurrency", type=int, default=16)
+    args = ap.parse_args()
+
+    # Pool sizing is read when database.py is first imported by get_user_store
+    os.environ.setdefault("DB_POOL_MAX", str(args.concurrency))
+    results = {}
+    for backend in args.backends.split(","):
+        if backend not in BACKENDS:
+            ap.error(f"unknown backend {backend!r}")
+        if backend.startswith("async-"):
+            results[backend] = asyncio.run(
+                bench_async(backend[len("async-"):], args.users, args.ops, args.concurrency))
+        else:
+            results[backend] = bench_sync(backend, args.users, args.ops, args.concurrency)
+
+    print(f"\n{args.users} registrations, {args.ops} logins/updates, concurrency {args.concurrency} (ops/s)")
+    print(f"  {'backend':16s} {'register':>10s} {'login':>10s} {'update':>10s}")
+    for backend, rates in results.items():
+        print(f"  {backend:16s} {rates['register']:10.1f} {rates['login']:10.1f} {rates['profile update']:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
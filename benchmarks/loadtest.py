@@ -0,0 +1,434 @@
+"""Open-loop load test for the API, with request replay and regression thresholds.
+
+Start the API (or pass --start-server) and drive it with a mix of synthetic
+requests at a fixed arrival rate:
+
+    uvicorn src.api.main:app --port 8000 &
+    python benchmarks/loadtest.py --rate 20 --duration 60 --mix crop=4,fertilizer=2,disease=1,chat=3,translations=2
+
+Arrivals are a Poisson process and are sent on schedule whether or not
+earlier requests have finished (open loop), and latency is measured from
+the scheduled send time, so a slow server shows up as latency instead of
+as a silently lower request rate.
+
+Replay a recorded run (--record-to) or prediction history exported from the
+event log (one JSON event per line, see event_log.py) with original timing:
+
+    python benchmarks/loadtest.py --replay recorded.jsonl --speed 2
+
+The run fails (exit 1) when any limit in --thresholds is exceeded.
+"""
+import argparse
+import asyncio
+import base64
+import io
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+import yaml
+from PIL import Image, ImageDraw
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+from languages import INDIAN_LANGUAGES
+
+DEFAULT_THRESHOLDS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "loadtest_thresholds.yaml")
+
+# Ranges of the crop_recommendation and fertilizer training data
+CROP_RANGES = {
+    "N": (0, 140), "P": (5, 145), "K": (5, 205), "temperature": (8.8, 43.7),
+    "humidity": (14.3, 99.9), "ph": (3.5, 9.9), "rainfall": (20.2, 298.6),
+}
+FERT_RANGES = {
+    "temperature": (25, 38), "humidity": (50, 72), "moisture": (25, 65),
+    "N": (4, 42), "P": (0, 42), "K": (0, 19),
+}
+SOIL_TYPES = ['Clayey', 'Loamy', 'Red', 'Sandy']
+CROP_TYPES = ['Cotton', 'Ground Nuts', 'Maize', 'Millets', 'Oil seeds', 'Paddy', 'Pulses', 'Sugarcane', 'Tobacco', 'Wheat']
+
+# (weight, question): common topics dominate, with a long tail of specific
+# and off-topic questions like the real chat traffic
+FARMER_QUESTIONS = [
+    (8, "What fertilizer should I use for rice?"),
+    (6, "How to control pests in cotton?"),
+    (5, "When should I sow wheat?"),
+    (5, "What is the best crop for black soil?"),
+    (4, "How much water does sugarcane need?"),
+    (4, "My tomato leaves are turning yellow, what should I do?"),
+    (3, "How to increase yield of maize?"),
+    (3, "Which government schemes help small farmers?"),
+    (3, "How to make organic compost at home?"),
+    (2, "What is drip irrigation and is it worth the cost?"),
+    (2, "cotton cultivation telangana"),
+    (2, "How do I test soil pH?"),
+    (2, "Best time to harvest groundnut?"),
+    (1, "How to store onions after harvest to avoid rot?"),
+    (1, "Can I grow chilli in red soil during kharif season?"),
+    (1, "What is the MSP for paddy this year?"),
+    (1, "weather affect crops"),
+    (1, "How to treat powdery mildew on grapes?"),
+    (1, "hello"),
+]
+# Most users keep English or Hindi, the rest spread over other languages
+CHAT_LANGUAGES = [(50, "en"), (20, "hi"), (6, "te"), (6, "ta"), (5, "mr"), (5, "bn"), (4, "kn"), (4, "gu")]
+
+
+def weighted_choice(rng, pairs):
+    total = sum(weight for weight, _ in pairs)
+    point = rng.uniform(0, total)
+    for weight, value in pairs:
+        point -= weight
+        if point <= 0:
+            return value
+    return pairs[-1][1]
+
+
+def leaf_image(rng, size=(320, 240), spots=None):
+    """JPEG of a green leaf with brown/yellow lesions; close enough to exercise decode and resize"""
+    img = Image.new("RGB", size, (rng.randint(60, 110), rng.randint(120, 180), rng.randint(40, 80)))
+    draw = ImageDraw.Draw(img)
+    for _ in range(spots if spots is not None else rng.randint(0, 25)):
+        x, y, r = rng.randint(0, size[0]), rng.randint(0, size[1]), rng.randint(2, 14)
+        draw.ellipse((x - r, y - r, x + r, y + r),
+                     fill=(rng.randint(120, 200), rng.randint(90, 160), rng.randint(20, 60)))
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+class PayloadGenerator:
+    """Valid request bodies for every endpoint, reproducible from a seed"""
+
+    def __init__(self, seed=42, image_dir=None, image_pool=20):
+        self.rng = random.Random(seed)
+        if image_dir:
+            self.images = [
+                open(os.path.join(image_dir, name), "rb").read()
+                for name in sorted(os.listdir(image_dir))
+                if name.lower().endswith((".jpg", ".jpeg", ".png"))
+            ]
+        else:
+            # A fixed pool: generating images per request would load the client, not the server
+            self.images = [leaf_image(self.rng) for _ in range(image_pool)]
+
+    def _uniform(self, ranges):
+        return {name: round(self.rng.uniform(low, high), 2) for name, (low, high) in ranges.items()}
+
+    def crop(self):
+        return {"method": "POST", "path": "/predict/crop", "json": self._uniform(CROP_RANGES)}
+
+    def fertilizer(self):
+        body = self._uniform(FERT_RANGES)
+        body.update(soil_type=self.rng.choice(SOIL_TYPES), crop_type=self.rng.choice(CROP_TYPES))
+        return {"method": "POST", "path": "/predict/fertilizer", "json": body}
+
+    def disease(self):
+        return {"method": "POST", "path": "/predict/disease", "image": self.rng.randrange(len(self.images))}
+
+    def chat(self):
+        return {"method": "POST", "path": "/chat", "json": {
+            "message": weighted_choice(self.rng, FARMER_QUESTIONS),
+            "user_id": f"load_{self.rng.randrange(1000)}",
+            "language": weighted_choice(self.rng, CHAT_LANGUAGES),
+        }}
+
+    def translations(self):
+        return {"method": "GET", "path": f"/translations/{self.rng.choice(list(INDIAN_LANGUAGES))}"}
+
+
+ENDPOINTS = ("crop", "fertilizer", "disease", "chat", "translations")
+
+
+def parse_mix(text):
+    mix = []
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ENDPOINTS:
+            raise SystemExit(f"unknown endpoint {name!r} in --mix, expected {ENDPOINTS}")
+        mix.append((float(weight or 1), name))
+    return mix
+
+
+def synthetic_schedule(generator, mix, rate, duration):
+    """Poisson arrivals: exponential gaps with mean 1/rate"""
+    schedule, offset = [], 0.0
+    while True:
+        offset += generator.rng.expovariate(rate)
+        if offset >= duration:
+            return schedule
+        endpoint = weighted_choice(generator.rng, mix)
+        schedule.append(dict(getattr(generator, endpoint)(), offset=offset, endpoint=endpoint))
+
+
+_EVENT_PATHS = {"crop": "/predict/crop", "fertilizer": "/predict/fertilizer", "chat": "/chat",
+                "disease": "/predict/disease", "disease_batch": "/predict/disease/batch",
+                "crop_sweep": "/predict/crop/sweep", "soil_report": "/predict/soil-report"}
+
+
+def endpoints_of(schedule):
+    """ENDPOINTS plus any other endpoint a replayed schedule uses, in first-seen order"""
+    return tuple(dict.fromkeys(ENDPOINTS + tuple(request["endpoint"] for request in schedule)))
+
+
+def load_replay(path, generator, speed):
+    """Requests from --record-to output or from event log events, at original spacing / speed"""
+    schedule = []
+    with open(path, "r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    if records and "kind" in records[0]:
+        # Prediction history: rebuild the request each event came from
+        records.sort(key=lambda e: e["ts"])
+        start = records[0]["ts"]
+        skipped = {}
+        for event in records:
+            if event["kind"] not in _EVENT_PATHS:
+                skipped[event["kind"]] = skipped.get(event["kind"], 0) + 1
+                continue
+            request = {"offset": event["ts"] - start, "endpoint": event["kind"], "method": "POST",
+                       "path": _EVENT_PATHS[event["kind"]]}
+            if event["kind"] == "disease":
+                # Only the upload size is logged, so substitute a synthetic leaf
+                request["image"] = generator.rng.randrange(len(generator.images))
+            elif event["kind"] == "disease_batch":
+                # Likewise only the image count
+                request["images"] = [generator.rng.randrange(len(generator.images))
+                                     for _ in range(event["input"]["images"])]
+            elif event["kind"] == "chat":
+                request["json"] = {"message": event["input"]["message"], "user_id": event.get("user"),
+                                   "language": event["input"].get("language", "en")}
+            else:
+                request["json"] = event["input"]
+            schedule.append(request)
+        for kind, count in skipped.items():
+            print(f"skipped {count} {kind!r} events: no request to rebuild them as")
+    else:
+        schedule = records
+        for request in schedule:
+            if "image_b64" in request:
+                generator.images.append(base64.b64decode(request.pop("image_b64")))
+                request["image"] = len(generator.images) - 1
+            if "images_b64" in request:
+                request["images"] = []
+                for image in request.pop("images_b64"):
+                    generator.images.append(base64.b64decode(image))
+                    request["images"].append(len(generator.images) - 1)
+    for request in schedule:
+        request["offset"] /= speed
+    return schedule
+
+
+def record_schedule(schedule, generator, path):
+    with open(path, "w", encoding="utf-8") as f:
+        for request in schedule:
+            request = dict(request)
+            if "image" in request:
+                request["image_b64"] = base64.b64encode(generator.images[request.pop("image")]).decode()
+            if "images" in request:
+                request["images_b64"] = [base64.b64encode(generator.images[i]).decode() for i in request.pop("images")]
+            f.write(json.dumps(request) + "\n")
+
+
+def is_error(response):
+    if response.status_code >= 400 and response.status_code != 429:
+        return True
+    # Prediction and chat handlers report failures as 200 {"success": false}
+    if response.headers.get("content-type", "").startswith("application/json"):
+        try:
+            body = response.json()
+        except ValueError:
+            return True
+        return isinstance(body, dict) and body.get("success") is False
+    return False
+
+
+async def run(schedule, generator, base_url, max_in_flight, timeout):
+    results = {endpoint: {"latencies": [], "errors": 0, "rejected": 0, "dropped": 0}
+               for endpoint in endpoints_of(schedule)}
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+    in_flight = 0
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        async def send(request, scheduled):
+            nonlocal in_flight
+            stats = results[request["endpoint"]]
+            try:
+                kwargs = {"json": request.get("json"), "headers": request.get("headers")}
+                if "image" in request:
+                    kwargs = {"files": {"file": ("leaf.jpg", generator.images[request["image"]], "image/jpeg")}}
+                elif "images" in request:
+                    kwargs = {"files": [("files", (f"leaf{n}.jpg", generator.images[i], "image/jpeg"))
+                                        for n, i in enumerate(request["images"])]}
+                response = await client.request(request["method"], request["path"], **kwargs)
+                # From the scheduled time, so client-side queueing counts against the server
+                stats["latencies"].append(time.perf_counter() - scheduled)
+                if response.status_code == 429:
+                    stats["rejected"] += 1
+                elif is_error(response):
+                    stats["errors"] += 1
+            except httpx.HTTPError:
+                stats["errors"] += 1
+            finally:
+                in_flight -= 1
+
+        tasks = []
+        start = time.perf_counter()
+        for request in schedule:
+            scheduled = start + request["offset"]
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if in_flight >= max_in_flight:
+                # Keep the loop open: shed instead of waiting, and count it
+                results[request["endpoint"]]["dropped"] += 1
+                continue
+            in_flight += 1
+            tasks.append(asyncio.create_task(send(request, scheduled)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+    return results, elapsed
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, math.ceil(q / 100 * len(values)) - 1))]
+
+
+def summarize(results, elapsed, schedule):
+    offered = {endpoint: 0 for endpoint in endpoints_of(schedule)}
+    for request in schedule:
+        offered[request["endpoint"]] += 1
+    report = {}
+    for endpoint, stats in results.items():
+        if not offered[endpoint]:
+            continue
+        completed = len(stats["latencies"])
+        failed = stats["errors"] + stats["dropped"]
+        report[endpoint] = {
+            "offered": offered[endpoint],
+            "completed": completed,
+            "throughput_rps": round(completed / elapsed, 2),
+            "error_rate": round(failed / offered[endpoint], 4),
+            "rejected_429": stats["rejected"],
+            "dropped": stats["dropped"],
+            **{f"p{q}_ms": round(percentile(stats["latencies"], q) * 1000, 1) if completed else None
+               for q in (50, 95, 99)},
+        }
+    total_offered = sum(r["offered"] for r in report.values())
+    total_failed = sum(stats["errors"] + stats["dropped"] for stats in results.values())
+    all_latencies = [l for stats in results.values() for l in stats["latencies"]]
+    report["all"] = {
+        "offered": total_offered,
+        "completed": len(all_latencies),
+        "throughput_rps": round(len(all_latencies) / elapsed, 2),
+        "error_rate": round(total_failed / total_offered, 4) if total_offered else 0.0,
+        **{f"p{q}_ms": round(percentile(all_latencies, q) * 1000, 1) if all_latencies else None
+           for q in (50, 95, 99)},
+    }
+    return report
+
+
+def check_thresholds(report, thresholds):
+    """Violations of limits like {"crop": {"p95_ms": 150, "error_rate": 0.01}, "all": {...}}"""
+    violations = []
+    for endpoint, limits in (thresholds or {}).items():
+        if endpoint not in report:
+            continue
+        for key, limit in limits.items():
+            if key == "min_throughput_rps":
+                actual = report[endpoint]["throughput_rps"]
+                if actual < limit:
+                    violations.append(f"{endpoint} throughput {actual} rps < {limit}")
+                continue
+            actual = report[endpoint].get(key)
+            if actual is not None and actual > limit:
+                violations.append(f"{endpoint} {key} {actual} > {limit}")
+    return violations
+
+
+def start_server(port):
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.api.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+    )
+    # Model and chatbot loading can take a while on first start
+    deadline = time.time() + 180
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit("uvicorn exited during startup")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/languages", timeout=1)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.5)
+    process.terminate()
+    raise SystemExit("uvicorn did not become ready in 180 s")
+
+
+def print_report(report):
+    print(f"  {'endpoint':13s} {'offered':>7s} {'rps':>7s} {'err%':>6s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s}")
+    for endpoint, row in report.items():
+        fmt = lambda v: f"{v:8.1f}" if v is not None else f"{'-':>8s}"
+        print(f"  {endpoint:13s} {row['offered']:7d} {row['throughput_rps']:7.1f} {row['error_rate'] * 100:6.2f}"
+              f" {fmt(row['p50_ms'])} {fmt(row['p95_ms'])} {fmt(row['p99_ms'])}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Open-loop API load test")
+    ap.add_argument("--url", default="http://127.0.0.1:8000")
+    ap.add_argument("--start-server", action="store_true", help="launch uvicorn on the --url port")
+    ap.add_argument("--rate", type=float, default=10, help="mean arrivals per second")
+    ap.add_argument("--duration", type=float, default=30, help="seconds of synthetic traffic")
+    ap.add_argument("--mix", default="crop=4,fertilizer=2,disease=1,chat=3,translations=2")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--images", help="directory of leaf images to upload instead of synthetic ones")
+    ap.add_argument("--replay", help="JSONL from --record-to or exported event log events")
+    ap.add_argument("--speed", type=float, default=1.0, help="replay time compression factor")
+    ap.add_argument("--record-to", help="write the request schedule for later --replay")
+    ap.add_argument("--max-in-flight", type=int, default=200)
+    ap.add_argument("--timeout", type=float, default=30)
+    ap.add_argument("--thresholds", default=DEFAULT_THRESHOLDS, help="YAML limits; 'none' to disable")
+    ap.add_argument("--json-out", help="write the report as JSON")
+    args = ap.parse_args()
+
+    generator = PayloadGenerator(seed=args.seed, image_dir=args.images)
+    if args.replay:
+        schedule = load_replay(args.replay, generator, args.speed)
+    else:
+        schedule = synthetic_schedule(generator, parse_mix(args.mix), args.rate, args.duration)
+    if args.record_to:
+        record_schedule(schedule, generator, args.record_to)
+
+    server = start_server(httpx.URL(args.url).port or 8000) if args.start_server else None
+    try:
+        results, elapsed = asyncio.run(run(schedule, generator, args.url, args.max_in_flight, args.timeout))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    report = summarize(results, elapsed, schedule)
+    print(f"{len(schedule)} requests in {elapsed:.1f} s against {args.url}")
+    print_report(report)
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.thresholds != "none":
+        with open(args.thresholds, "r") as f:
+            violations = check_thresholds(report, yaml.safe_load(f))
+        for violation in violations:
+            print(f"THRESHOLD EXCEEDED: {violation}")
+        if violations:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+"""Function-level benchmarks for the inference, retrieval and translation hot paths.
+
+Everything runs against small fixed-seed stand-in models and a local
+translate stub, so no model artifacts, GPU or network are needed and
+repeated runs of the same commit give the same work to time:
+
+    python -m benchmarks.micro                       # run and compare with baselines.json
+    python -m benchmarks.micro --filter crop         # only matching cases
+    python -m benchmarks.micro --save-baseline       # record new baselines
+    python -m benchmarks.micro --fail-on-regression  # exit 1 if a case got slower
+
+Absolute timings differ between machines; record a baseline on the same
+machine (e.g. from the main branch) before comparing a change.
+"""
@@ -0,0 +1,136 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+from .cases import CASES
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+
+def measure(fn, repeats, min_time):
+    """Per-call seconds for each repeat, timeit-style (loop count calibrated, GC off)"""
+    fn()  # warm caches and lazy imports
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / 10:
+            break
+        number *= 2
+    # Scale the calibrated loop so one repeat takes about min_time
+    number = max(1, round(number * min_time / elapsed))
+
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            times.append((time.perf_counter() - start) / number)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return times, number
+
+
+def load_baselines(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f).get("cases", {})
+
+
+def compare(results, baselines, threshold):
+    rows, regressions = [], []
+    for name, result in results.items():
+        base = baselines.get(name)
+        change = None
+        status = "new"
+        if base:
+            change = result["median_us"] / base["median_us"] - 1
+            if change > threshold:
+                status = "SLOWER"
+                regressions.append(name)
+            elif change < -threshold:
+                status = "faster"
+            else:
+                status = "same"
+        rows.append((name, result, base, change, status))
+    return rows, regressions
+
+
+def print_report(rows, threshold):
+    print(f"{'case':34s} {'median us':>11s} {'min us':>11s} {'baseline':>11s} {'change':>8s}  status (±{threshold:.0%})")
+    for name, result, base, change, status in rows:
+        baseline = f"{base['median_us']:11.1f}" if base else f"{'-':>11s}"
+        delta = f"{change:+8.1%}" if change is not None else f"{'-':>8s}"
+        print(f"{name:34s} {result['median_us']:11.1f} {result['min_us']:11.1f} {baseline} {delta}  {status}")
+
+
+def main():
+    ap = argparse.ArgumentParser(prog="python -m benchmarks.micro", description="Run microbenchmarks")
+    ap.add_argument("--filter", default="", help="only run cases whose name contains this")
+    ap.add_argument("--repeats", type=int, default=7)
+    ap.add_argument("--min-time", type=float, default=0.2, help="seconds per repeat")
+    ap.add_argument("--baseline", default=BASELINES_PATH)
+    ap.add_argument("--save-baseline", action="store_true", help="write results to --baseline")
+    ap.add_argument("--threshold", type=float, default=0.10, help="relative change reported as slower/faster")
+    ap.add_argument("--fail-on-regression", action="store_true")
+    ap.add_argument("--json-out", help="write results and comparison as JSON")
+    args = ap.parse_args()
+
+    results = {}
+    for name, setup in CASES.items():
+        if args.filter not in name:
+            continue
+        fn = setup()
+        times, number = measure(fn, args.repeats, args.min_time)
+        results[name] = {
+            "median_us": round(statistics.median(times) * 1e6, 2),
+            "min_us": round(min(times) * 1e6, 2),
+            "stdev_us": round(statistics.stdev(times) * 1e6, 2) if len(times) > 1 else 0.0,
+            "calls_per_repeat": number,
+        }
+        print(f"  {name}: {results[name]['median_us']:.1f} us", file=sys.stderr)
+
+    rows, regressions = compare(results, load_baselines(args.baseline), args.threshold)
+    print_report(rows, args.threshold)
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump({"results": results, "regressions": regressions}, f, indent=2)
+
+    if args.save_baseline:
+        stored = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r") as f:
+                stored = json.load(f).get("cases", {})
+        # A filtered run only replaces the cases it measured
+        stored.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "recorded": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} cpu",
+                "cases": stored,
+            }, f, indent=2)
+            f.write("\n")
+        print(f"baselines written to {args.baseline}")
+
+    if regressions and args.fail_on_regression:
+        print(f"regressions: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Benchmark cases: each returns the zero-argument callable to time"""
+import itertools
+import os
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'src', 'chatbot'))
+
+from . import fixtures
+
+
+def _predict_module():
+    from src.inference import predict
+    return predict
+
+
+def predict_crop():
+    predict = _predict_module()
+    model = fixtures.crop_model()
+    predict.registry.install("crop", model, columns=list(fixtures.CROP_FEATURES))
+    return lambda: predict.predict_crop(dict(fixtures.CROP_SAMPLE))
+
+
+def predict_fertilizer():
+    predict = _predict_module()
+    model, columns = fixtures.fertilizer_model()
+    predict.registry.install("fertilizer", model, columns=columns)
+    return lambda: predict.predict_fertilizer(dict(fixtures.FERTILIZER_SAMPLE))
+
+
+def predict_disease():
+    predict = _predict_module()
+    predict.registry.install("disease", fixtures.DiseaseModel(), labels=list(fixtures.DISEASE_LABELS))
+    image = fixtures.leaf_jpeg()
+    return lambda: predict.predict_disease(image)
+
+
+def predict_disease_batch():
+    """16 images through the parallel decode + batched inference path (compare with 16 x predict_disease)"""
+    predict = _predict_module()
+    predict.registry.install("disease", fixtures.DiseaseModel(), labels=list(fixtures.DISEASE_LABELS))
+    images = [fixtures.leaf_jpeg()] * 16
+    return lambda: list(predict.predict_disease_batch(images))
+
+
+def _chatbot():
+    from llama_chatbot_simple import SimpleLlamaAgriChatbot
+    return SimpleLlamaAgriChatbot(sentence_model=fixtures.HashingEncoder(), qa_pairs=fixtures.qa_corpus())
+
+
+def retrieve_context():
+    bot = _chatbot()
+    questions = itertools.cycle(fixtures.QUESTIONS)
+    return lambda: bot.retrieve_context(next(questions), top_k=5, threshold=0.2)
+
+
+def get_response():
+    """Full routing: greetings/thanks short-circuits, keyword fallbacks and retrieval"""
+    bot = _chatbot()
+    questions = itertools.cycle(fixtures.QUESTIONS)
+    return lambda: bot.get_response(next(questions))
+
+
+def find_best_answer():
+    from data_processor import AgricultureDataProcessor
+    processor = AgricultureDataProcessor()
+    processor.qa_pairs = fixtures.qa_corpus()
+    # prepare_training_data would also pickle to the working directory
+    processor.question_vectors = processor.vectorizer.fit_transform([qa['question'] for qa in processor.qa_pairs])
+    questions = itertools.cycle(fixtures.QUESTIONS)
+    return lambda: processor.find_best_answer(next(questions))
+
+
+_stub_url = None
+
+
+def _translator():
+    """translator wired to a local translate stub and a throwaway store"""
+    global _stub_url
+    if _stub_url is None:
+        import translate_stub
+        _, _stub_url = translate_stub.serve()
+        # Read at import time by translation_client / translation_store
+        os.environ["TRANSLATE_URL"] = _stub_url
+        os.environ["TRANSLATION_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="microbench_"), "translations.db")
+    import translator
+    return translator
+
+
+UI_TEXTS = ["Crop Recommendation", "Fertilizer Suggestion", "Disease Detection", "Enter soil nutrients",
+            "Temperature", "Humidity", "Rainfall", "Get Recommendation", "Upload a clear leaf image."]
+
+
+def translate_batch_cached():
+    translator = _translator()
+    translator.translate_batch(UI_TEXTS, "hi")
+    return lambda: translator.translate_batch(UI_TEXTS, "hi")
+
+
+def translate_batch_uncached():
+    """Store miss -> single-flight -> stub round trip -> store write; segment cache defeated"""
+    translator = _translator()
+    counter = itertools.count()
+    return lambda: translator.translate_batch([f"{text} {next(counter)}" for text in UI_TEXTS], "te")
+
+
+CASES = {
+    "predict_crop": predict_crop,
+    "predict_fertilizer": predict_fertilizer,
+    "predict_disease": predict_disease,
+    "predict_disease_batch.16": predict_disease_batch,
+    "chatbot.retrieve_context": retrieve_context,
+    "chatbot.get_response": get_response,
+    "data_processor.find_best_answer": find_best_answer,
+    "translate_batch.cached": translate_batch_cached,
+    "translate_batch.uncached": translate_batch_uncached,
+}
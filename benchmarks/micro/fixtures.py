@@ -0,0 +1,125 @@
+"""Fixed-seed stand-ins for the production models and data.
+
+Sizes follow production where it matters for cost: the crop and fertilizer
+forests have the production feature names and class counts (fewer trees),
+the QA corpus is a few thousand pairs, and embeddings are 384-d like MiniLM.
+"""
+import hashlib
+import io
+import random
+import re
+
+import numpy as np
+import pandas as pd
+from PIL import Image, ImageDraw
+from sklearn.ensemble import RandomForestClassifier
+
+SEED = 1234
+
+CROP_FEATURES = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall"]
+CROP_LABELS = ['apple', 'banana', 'blackgram', 'chickpea', 'coconut', 'coffee', 'cotton', 'grapes', 'jute',
+               'kidneybeans', 'lentil', 'maize', 'mango', 'mothbeans', 'mungbean', 'muskmelon', 'orange',
+               'papaya', 'pigeonpeas', 'pomegranate', 'rice', 'watermelon']
+# Same order as new model/fertilizer_model_columns.joblib
+FERTILIZER_COLUMNS = [
+    'Temparature', 'Humidity ', 'Moisture', 'Nitrogen', 'Potassium', 'Phosphorous',
+    'Soil Type_Clayey', 'Soil Type_Loamy', 'Soil Type_Red', 'Soil Type_Sandy',
+    'Crop Type_Cotton', 'Crop Type_Ground Nuts', 'Crop Type_Maize', 'Crop Type_Millets', 'Crop Type_Oil seeds',
+    'Crop Type_Paddy', 'Crop Type_Pulses', 'Crop Type_Sugarcane', 'Crop Type_Tobacco', 'Crop Type_Wheat',
+]
+FERTILIZER_LABELS = ['10-26-26', '14-35-14', '17-17-17', '20-20', '28-28', 'DAP', 'Urea']
+DISEASE_LABELS = ['Healthy', 'Powdery Mildew', 'Rust Disease']
+
+CROP_SAMPLE = {"N": 90, "P": 42, "K": 43, "temperature": 20.8, "humidity": 82.0, "ph": 6.5, "rainfall": 202.9}
+FERTILIZER_SAMPLE = {"temperature": 26, "humidity": 52, "moisture": 38, "soil_type": "Sandy",
+                     "crop_type": "Maize", "N": 37, "P": 0, "K": 0}
+
+
+def crop_model(n_estimators=30):
+    rng = np.random.default_rng(SEED)
+    X = pd.DataFrame(rng.uniform(0, 200, size=(2200, len(CROP_FEATURES))), columns=CROP_FEATURES)
+    y = np.repeat(CROP_LABELS, 100)
+    return RandomForestClassifier(n_estimators=n_estimators, random_state=SEED).fit(X, y)
+
+
+def fertilizer_model(n_estimators=30):
+    rng = np.random.default_rng(SEED)
+    X = pd.DataFrame(rng.uniform(0, 50, size=(700, len(FERTILIZER_COLUMNS))), columns=FERTILIZER_COLUMNS)
+    y = np.repeat(FERTILIZER_LABELS, 100)
+    return RandomForestClassifier(n_estimators=n_estimators, random_state=SEED).fit(X, y), list(FERTILIZER_COLUMNS)
+
+
+class DiseaseModel:
+    """Keras-shaped stand-in: a fixed random projection of the 224x224x3 input to class softmax"""
+
+    def __init__(self):
+        rng = np.random.default_rng(SEED)
+        self.weights = rng.normal(size=(224 * 224 * 3, len(DISEASE_LABELS))).astype(np.float32) / 224
+
+    def predict(self, batch, verbose=0):
+        logits = batch.reshape(len(batch), -1).astype(np.float32) @ self.weights
+        exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return exp / exp.sum(axis=1, keepdims=True)
+
+
+def leaf_jpeg(size=(640, 480)):
+    """Phone-camera sized leaf photo with lesions"""
+    rng = random.Random(SEED)
+    img = Image.new("RGB", size, (82, 150, 60))
+    draw = ImageDraw.Draw(img)
+    for _ in range(40):
+        x, y, r = rng.randint(0, size[0]), rng.randint(0, size[1]), rng.randint(3, 20)
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=(rng.randint(120, 200), rng.randint(90, 160), 40))
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+class HashingEncoder:
+    """SentenceTransformer-shaped stand-in: L2-normalised hashed bag of words, 384-d like MiniLM"""
+
+    dim = 384
+
+    def encode(self, texts, show_progress_bar=False):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in re.findall(r"\w+", text.lower()):
+                digest = hashlib.md5(token.encode()).digest()
+                out[row, int.from_bytes(digest[:4], "little") % self.dim] += 1.0 if digest[4] & 1 else -1.0
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.where(norms == 0, 1, norms)
+
+
+_CROPS = ["rice", "wheat", "cotton", "maize", "sugarcane", "groundnut", "tomato", "onion", "chilli", "soybean"]
+_TOPICS = [
+    ("What fertilizer dose is recommended for {crop}?", "Apply NPK as per soil test for {crop}; split nitrogen into two or three doses and add organic manure before sowing."),
+    ("How to control pests in {crop} crop?", "For {crop}, monitor fields weekly, use pheromone traps and neem based sprays first, and use recommended insecticides only above threshold levels."),
+    ("When is the right sowing time for {crop}?", "Sow {crop} at the start of the recommended season for your district once soil moisture is adequate and use certified seed."),
+    ("How much irrigation does {crop} need?", "Irrigate {crop} at critical growth stages such as flowering and grain filling, and avoid waterlogging in heavy soils."),
+    ("Which disease causes yellow leaves in {crop}?", "Yellowing in {crop} can come from nitrogen deficiency or fungal infection; check the lower leaves and send a sample to the nearest KVK."),
+]
+
+
+def qa_corpus(size=3000):
+    """Farmer Q&A pairs with realistic length and vocabulary overlap"""
+    rng = random.Random(SEED)
+    pairs = []
+    while len(pairs) < size:
+        crop = rng.choice(_CROPS)
+        question, answer = rng.choice(_TOPICS)
+        district = f"district {rng.randrange(600)}"
+        pairs.append({"question": f"{question.format(crop=crop)} in {district}",
+                      "answer": f"{answer.format(crop=crop)} Advice for {district}."})
+    return pairs
+
+
+QUESTIONS = [
+    "What fertilizer should I use for rice?",
+    "how to control pests in cotton",
+    "when to sow wheat in my district",
+    "hello",
+    "how to grow tomato complete guide",
+    "yellow leaves on maize what disease",
+    "thanks",
+    "irrigation schedule for sugarcane",
+]
@@ -0,0 +1,80 @@
+"""Show how the translation client behaves against a faulty upstream.
+
+Runs the client against the local translate stub with injected latency and
+errors, and prints per-scenario latency percentiles, fallback counts and the
+breaker/hedge counters:
+
+    python benchmarks/translation_faults.py --calls 200
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import metrics
+import translate_stub
+from translation_client import TranslationClient, CircuitBreaker
+
+SCENARIOS = [
+    # name, stub faults, client options
+    ("healthy", dict(latency=0.01), dict()),
+    ("slow tail", dict(latency=0.01, slow_rate=0.1, slow_latency=1.5), dict()),
+    ("slow tail + hedging", dict(latency=0.01, slow_rate=0.1, slow_latency=1.5), dict(hedge_after=0.1)),
+    ("flaky (30% 503)", dict(latency=0.01, error_rate=0.3), dict(hedge_after=0.1)),
+    ("outage", dict(latency=0.01, error_rate=1.0), dict()),
+]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+def counter_values(name):
+    return {tuple(sorted(labels.items())): value for labels, value in metrics.REGISTRY[name].samples()}
+
+
+def run_scenario(name, faults, client_options, calls, budget):
+    handler = translate_stub.make_handler(**faults)
+    server, url = translate_stub.serve(handler=handler)
+    client = TranslationClient(base_url=url, budget=budget,
+                               breaker=CircuitBreaker(failure_threshold=5, reset_timeout=1.0),
+                               **client_options)
+    before = {n: counter_values(n) for n in ("translation_requests_total", "translation_hedged_requests_total")}
+    latencies, fallbacks = [], 0
+    for i in range(calls):
+        text = f"Apply compost before sowing field {i}."
+        start = time.perf_counter()
+        result = client.translate_segments([text], "hi")
+        latencies.append(time.perf_counter() - start)
+        if text not in result:
+            fallbacks += 1
+    client.close()
+    server.shutdown()
+
+    deltas = {}
+    for metric, old in before.items():
+        for key, value in counter_values(metric).items():
+            delta = value - old.get(key, 0)
+            if delta:
+                label = ",".join(v for _, v in key) or metric.replace("translation_", "").replace("_total", "")
+                deltas[label] = delta
+    print(f"{name:22s} p50={percentile(latencies, 50) * 1000:7.1f}ms "
+          f"p95={percentile(latencies, 95) * 1000:7.1f}ms p99={percentile(latencies, 99) * 1000:7.1f}ms "
+          f"fallback={fallbacks:4d}/{calls} upstream={handler.stats['requests']:4d} {deltas}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--calls", type=int, default=200)
+    ap.add_argument("--budget", type=float, default=0.5, help="per-call latency budget (s)")
+    args = ap.parse_args()
+    for name, faults, client_options in SCENARIOS:
+        run_scenario(name, faults, client_options, args.calls, args.budget)
+
+
+if __name__ == "__main__":
+    main()
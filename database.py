@@ -1,13 +1,30 @@
 import psycopg2
 import psycopg2.pool
-import hashlib
+import psycopg2.extras
+import csv
+import io
 import os
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
 import logging
+from user_cache import UserProfileCache
+from storage import UserStore
 
 logging.basicConfig(level=logging.INFO)
 
-class UserDatabase:
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+# How long a caller waits for a free connection before giving up
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Connections idle longer than this are pinged before being handed out
+DB_POOL_HEALTHCHECK_IDLE = float(os.getenv("DB_POOL_HEALTHCHECK_IDLE", "30"))
+
+# Errors that mean the connection (or the server behind it) is gone
+CONNECTION_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+class UserDatabase(UserStore):
     def __init__(self):
         # Try DATABASE_URL first (for Railway), fallback to individual vars
         database_url = os.getenv('DATABASE_URL')
@@ -29,8 +46,14 @@ class UserDatabase:
             }
             self.use_url = False
         
-        # Initialize connection pool to prevent segfaults
+        self.pool_min = DB_POOL_MIN
+        self.pool_max = DB_POOL_MAX
         self.connection_pool = None
+        self._pool_lock = threading.Lock()
+        # ThreadedConnectionPool raises when exhausted; the semaphore makes callers wait instead
+        self._slots = threading.BoundedSemaphore(self.pool_max)
+        self._last_used = {}
+        self.profile_cache = UserProfileCache("postgres")
         self.init_db()
     
     def get_connection(self):
@@ -51,6 +74,114 @@ class UserDatabase:
             logging.error(f"Database connection failed: {e}")
             raise
     
+    def _connect_kwargs(self):
+        kwargs = {'connect_timeout': 10, 'application_name': 'krishisaathi'}
+        if self.use_url:
+            kwargs['dsn'] = self.database_url
+        else:
+            kwargs.update(self.db_config)
+        return kwargs
+    
+    def _get_pool(self):
+        with self._pool_lock:
+            if self.connection_pool is None or self.connection_pool.closed:
+                self.connection_pool = psycopg2.pool.ThreadedConnectionPool(
+                    self.pool_min, self.pool_max, **self._connect_kwargs()
+                )
+                self._last_used = {}
+            return self.connection_pool
+    
+    def reset_pool(self):
+        """Close every pooled connection, including checked-out ones; only for shutdown"""
+        with self._pool_lock:
+            if self.connection_pool is not None and not self.connection_pool.closed:
+                self.connection_pool.closeall()
+            self.connection_pool = None
+            self._last_used = {}
+    
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        last_used = self._last_used.get(id(conn))
+        # Freshly opened connections and recently used ones skip the ping
+        if last_used is None or time.monotonic() - last_used < DB_POOL_HEALTHCHECK_IDLE:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except CONNECTION_ERRORS:
+            return False
+    
+    def _checkout(self):
+        if not self._slots.acquire(timeout=DB_POOL_TIMEOUT):
+            raise psycopg2.pool.PoolError("Timed out waiting for a database connection")
+        try:
+            pool = self._get_pool()
+            # Stale connections are discarded; a bad one-off retry gets a fresh socket
+            for _ in range(self.pool_max + 1):
+                conn = pool.getconn()
+                if self._is_healthy(conn):
+                    return pool, conn
+                logging.warning("Discarding broken pooled database connection")
+                pool.putconn(conn, close=True)
+            raise psycopg2.OperationalError("No healthy database connection available")
+        except Exception:
+            self._slots.release()
+            raise
+    
+    def _checkin(self, pool, conn, broken=False):
+        try:
+            if not broken and not conn.closed:
+                # Never hand the next caller an open transaction
+                conn.rollback()
+                self._last_used[id(conn)] = time.monotonic()
+            else:
+                self._last_used.pop(id(conn), None)
+            if not pool.closed:
+                pool.putconn(conn, close=broken or bool(conn.closed))
+            else:
+                conn.close()
+        except Exception as e:
+            logging.warning(f"Returning database connection failed: {e}")
+        finally:
+            self._slots.release()
+    
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection; broken connections are closed instead of reused"""
+        pool, conn = self._checkout()
+        broken = False
+        try:
+            yield conn
+        except CONNECTION_ERRORS:
+            broken = True
+            raise
+        finally:
+            self._checkin(pool, conn, broken)
+    
+    def _with_retry(self, operation, idempotent=False):
+        """Run operation(conn); if idempotent, retry once on another connection after a failover.
+
+        A write is not retried: the first attempt may have committed before the
+        connection dropped, and running it again would duplicate it.
+        """
+        try:
+            with self.connection() as conn:
+                return operation(conn)
+        except CONNECTION_ERRORS as e:
+            # connection() already closed the failed connection. The idle ones
+            # may point at the old server too: ping them before reuse, but leave
+            # connections other threads are using alone.
+            with self._pool_lock:
+                self._last_used = dict.fromkeys(self._last_used, 0.0)
+            if not idempotent:
+                raise
+            logging.warning(f"Database connection lost ({e}), retrying")
+            with self.connection() as conn:
+                return operation(conn)
+    
     def init_db(self):
         max_retries = 3
         for attempt in range(max_retries):
@@ -68,6 +199,20 @@ class UserDatabase:
                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                     )
                 ''')
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS prediction_events (
+                        id BIGSERIAL PRIMARY KEY,
+                        created_at TIMESTAMP NOT NULL,
+                        kind VARCHAR(16) NOT NULL,
+                        user_id VARCHAR(100),
+                        input JSONB,
+                        result JSONB
+                    )
+                ''')
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS prediction_events_user_idx
+                    ON prediction_events (user_id, created_at)
+                ''')
                 conn.commit()
                 cursor.close()
                 conn.close()
@@ -81,69 +226,121 @@ class UserDatabase:
                 import time
                 time.sleep(2)
     
-    def hash_password(self, password):
-        return hashlib.sha256(password.encode()).hexdigest()
-    
     def create_user(self, username, email, password, language='en'):
-        conn = None
-        cursor = None
-        try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO users (username, email, password_hash, language) VALUES (%s, %s, %s, %s)",
-                (username, email, self.hash_password(password), language)
-            )
+        def insert(conn):
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO users (username, email, password_hash, language) VALUES (%s, %s, %s, %s)",
+                    (username, email, self.hash_password(password), language)
+                )
             conn.commit()
             return True
+        try:
+            created = self._with_retry(insert)
+            self.profile_cache.invalidate(username)
+            return created
         except psycopg2.IntegrityError as e:
             logging.warning(f"User creation failed - duplicate: {e}")
             return False
         except Exception as e:
             logging.error(f"User creation failed: {e}")
             return False
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
     
-    def verify_user(self, username, password):
-        conn = None
-        cursor = None
-        try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT id, username, email, language FROM users WHERE username = %s AND password_hash = %s",
-                (username, self.hash_password(password))
-            )
-            user = cursor.fetchone()
-            return user
-        except Exception as e:
-            logging.error(f"User verification failed: {e}")
+    def insert_users_bulk(self, records):
+        """Insert (username, email, password_hash, language) records in one COPY.
+        
+        Returns 'created' or 'duplicate' per record instead of failing the batch.
+        """
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(records)
+        def copy_insert(conn):
+            buffer.seek(0)
+            with conn.cursor() as cursor:
+                cursor.execute('''
+                    CREATE TEMP TABLE IF NOT EXISTS users_import (
+                        username VARCHAR(50),
+                        email VARCHAR(100),
+                        password_hash VARCHAR(64),
+                        language VARCHAR(10)
+                    ) ON COMMIT DELETE ROWS
+                ''')
+                cursor.copy_expert(
+                    "COPY users_import (username, email, password_hash, language) FROM STDIN WITH (FORMAT csv)",
+                    buffer
+                )
+                cursor.execute('''
+                    INSERT INTO users (username, email, password_hash, language)
+                    SELECT username, email, password_hash, language FROM users_import
+                    ON CONFLICT DO NOTHING
+                    RETURNING username, email
+                ''')
+                inserted = set(cursor.fetchall())
+            conn.commit()
+            return inserted
+        inserted = self._with_retry(copy_insert)
+        statuses = []
+        for username, email, _, _ in records:
+            # The first record with an inserted (username, email) pair gets the credit
+            if (username, email) in inserted:
+                inserted.discard((username, email))
+                statuses.append('created')
+                self.profile_cache.invalidate(username)
+            else:
+                statuses.append('duplicate')
+        return statuses
+    
+    def insert_events(self, events):
+        """Append prediction history events (dicts from event_log) in one multi-row INSERT"""
+        rows = [
+            (datetime.utcfromtimestamp(e['ts']), e['kind'], e.get('user'),
+             psycopg2.extras.Json(e.get('input')), psycopg2.extras.Json(e.get('result')))
+            for e in events
+        ]
+        def insert(conn):
+            with conn.cursor() as cursor:
+                psycopg2.extras.execute_values(
+                    cursor,
+                    "INSERT INTO prediction_events (created_at, kind, user_id, input, result) VALUES %s",
+                    rows,
+                    page_size=1000
+                )
+            conn.commit()
+        self._with_retry(insert)
+    
+    def get_profile(self, username):
+        """Profile dict (including password_hash) for a username, served from cache when possible"""
+        profile = self.profile_cache.get(username)
+        if profile is not None:
+            return profile
+        def select(conn):
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT id, username, email, language, password_hash FROM users WHERE username = %s",
+                    (username,)
+                )
+                return cursor.fetchone()
+        row = self._with_retry(select, idempotent=True)
+        if row is None:
             return None
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
+        profile = dict(zip(("id", "username", "email", "language", "password_hash"), row))
+        self.profile_cache.set(username, profile)
+        return profile
     
     def update_language(self, username, language):
-        conn = None
-        cursor = None
-        try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute(
-                "UPDATE users SET language = %s WHERE username = %s",
-                (language, username)
-            )
+        def update(conn):
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "UPDATE users SET language = %s WHERE username = %s",
+                    (language, username)
+                )
             conn.commit()
+        try:
+            # Setting the same value twice is harmless
+            self._with_retry(update, idempotent=True)
         except Exception as e:
             logging.error(f"Language update failed: {e}")
         finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
\ No newline at end of file
+            self.profile_cache.invalidate(username)
+    
+    def close(self):
+        self.reset_pool()
@@ -0,0 +1,290 @@
+import glob
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+import metrics
+
+EVENT_LOG_MAX_QUEUE = int(os.getenv("EVENT_LOG_MAX_QUEUE", "10000"))
+EVENT_LOG_BATCH_SIZE = int(os.getenv("EVENT_LOG_BATCH_SIZE", "500"))
+# Longest an event waits in memory before a flush is attempted
+EVENT_LOG_FLUSH_INTERVAL = float(os.getenv("EVENT_LOG_FLUSH_INTERVAL", "1.0"))
+# Local segment files used while the database is unreachable
+EVENT_LOG_SPOOL_DIR = os.getenv("EVENT_LOG_SPOOL_DIR", "event_spool")
+EVENT_LOG_SEGMENT_BYTES = int(os.getenv("EVENT_LOG_SEGMENT_BYTES", str(8 * 1024 * 1024)))
+EVENT_LOG_SPOOL_MAX_BYTES = int(os.getenv("EVENT_LOG_SPOOL_MAX_BYTES", str(512 * 1024 * 1024)))
+# While the sink is down, batches go straight to the spool and the sink is retried this often
+EVENT_LOG_RETRY_INTERVAL = float(os.getenv("EVENT_LOG_RETRY_INTERVAL", "10"))
+
+event_counts = metrics.counter(
+    "event_log_events_total", "Prediction history events by outcome", ["outcome"])
+queue_depth = metrics.gauge(
+    "event_log_queue_depth", "Prediction history events waiting to be flushed")
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class SpoolSegments:
+    """Append-only JSONL segment files for events the database could not take.
+
+    A process appends to its own ``<pid>-<n>.open`` file; closed segments are
+    renamed to ``.jsonl`` and any process may claim one for replay by renaming
+    it to ``.replaying``, so workers sharing the directory never double-insert.
+    """
+
+    def __init__(self, directory=EVENT_LOG_SPOOL_DIR, segment_bytes=EVENT_LOG_SEGMENT_BYTES,
+                 max_bytes=EVENT_LOG_SPOOL_MAX_BYTES):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self._file = None
+        self._seq = 0
+        os.makedirs(directory, exist_ok=True)
+        self._recover()
+
+    def _recover(self):
+        """Close segments left open by dead processes and unclaim interrupted replays.
+
+        Nothing in the directory belongs to this instance yet, so files carrying
+        our own pid are leftovers from an earlier process that had the same pid.
+        """
+        for path in glob.glob(os.path.join(self.directory, "*.open")):
+            if self._stale(path):
+                os.replace(path, path[:-len(".open")] + ".jsonl")
+        for path in glob.glob(os.path.join(self.directory, "*.replaying")):
+            if self._stale(path):
+                self.release(path, done=False)
+
+    @staticmethod
+    def _stale(path):
+        pid = int(os.path.basename(path).split("-", 1)[0])
+        return pid == os.getpid() or not _pid_alive(pid)
+
+    def size(self):
+        total = 0
+        for path in os.listdir(self.directory):
+            try:
+                total += os.path.getsize(os.path.join(self.directory, path))
+            except OSError:
+                pass
+        return total
+
+    def append(self, events):
+        """Write events to the open segment; returns False when the spool is full"""
+        if self.size() >= self.max_bytes:
+            return False
+        if self._file is None:
+            self._seq += 1
+            name = f"{os.getpid()}-{int(time.time() * 1000)}-{self._seq}.open"
+            self._file = open(os.path.join(self.directory, name), "a", encoding="utf-8")
+        self._file.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in events))
+        self._file.flush()
+        if self._file.tell() >= self.segment_bytes:
+            self.rotate()
+        return True
+
+    def rotate(self):
+        """Close the open segment so it becomes replayable"""
+        if self._file is not None:
+            path = self._file.name
+            self._file.close()
+            self._file = None
+            os.replace(path, path[:-len(".open")] + ".jsonl")
+
+    def claim(self):
+        """Oldest closed segment, renamed so no other process replays it, or None"""
+        for path in sorted(glob.glob(os.path.join(self.directory, "*.jsonl")), key=os.path.getmtime):
+            # Claimed segments carry the claimer's pid so a crash can be recovered
+            claimed = os.path.join(self.directory, f"{os.getpid()}-{os.path.basename(path)[:-len('.jsonl')]}.replaying")
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue  # another worker got it first
+            return claimed
+        return None
+
+    def release(self, claimed, done):
+        if done:
+            os.remove(claimed)
+        else:
+            # Drop our pid prefix again so the name stays stable across retries
+            original = os.path.basename(claimed)[:-len(".replaying")].split("-", 1)[1]
+            os.replace(claimed, os.path.join(self.directory, original + ".jsonl"))
+
+    @staticmethod
+    def read(path):
+        with open(path, "r", encoding="utf-8") as f:
+            # A crash mid-write can leave a truncated last line
+            events = []
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logging.warning(f"Skipping corrupt event line in {path}")
+            return events
+
+    def close(self):
+        self.rotate()
+
+
+class PredictionEventLog:
+    """Write-behind log of per-user prediction results.
+
+    record() never blocks a request: events go into a bounded queue (and are
+    dropped and counted when it is full). A background thread batch-inserts
+    them via ``sink.insert_events``; if that fails the batch is spooled to
+    local segment files and replayed once the sink accepts writes again.
+    """
+
+    def __init__(self, sink, max_queue=EVENT_LOG_MAX_QUEUE, batch_size=EVENT_LOG_BATCH_SIZE,
+                 flush_interval=EVENT_LOG_FLUSH_INTERVAL, spool=None):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool = spool
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread = None
+        self._sink_healthy = True
+        self._retry_at = 0.0
+
+    def start(self):
+        if self._thread is None:
+            if self.spool is None:
+                self.spool = SpoolSegments()
+            self._thread = threading.Thread(target=self._run, name="event-log-flusher", daemon=True)
+            self._thread.start()
+        return self
+
+    def record(self, kind, user_id, inputs, result):
+        """Queue one compact event; returns False if it was dropped"""
+        event = {"ts": time.time(), "kind": kind, "user": user_id, "input": inputs, "result": result}
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            event_counts.inc(outcome="dropped")
+            return False
+        event_counts.inc(outcome="enqueued")
+        queue_depth.set(self._queue.qsize())
+        return True
+
+    def _drain(self, block):
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=self.flush_interval) if block else self._queue.get_nowait())
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        queue_depth.set(self._queue.qsize())
+        return batch
+
+    def _sink_available(self):
+        """Healthy, or unhealthy long enough that the sink should be probed again"""
+        return self._sink_healthy or time.monotonic() >= self._retry_at
+
+    def _sink_failed(self, e):
+        if self._sink_healthy:
+            logging.warning(f"Event log sink failed, spooling to {self.spool.directory}: {e}")
+        self._sink_healthy = False
+        self._retry_at = time.monotonic() + EVENT_LOG_RETRY_INTERVAL
+
+    def _sink_recovered(self):
+        if not self._sink_healthy:
+            logging.info("Event log sink recovered, replaying spooled events")
+            self._sink_healthy = True
+            # Make our own spooled events replayable too
+            self.spool.rotate()
+
+    def _write(self, batch):
+        if self._sink_available():
+            try:
+                self.sink.insert_events(batch)
+                event_counts.inc(len(batch), outcome="written")
+                self._sink_recovered()
+                return True
+            except Exception as e:
+                self._sink_failed(e)
+        if self.spool.append(batch):
+            event_counts.inc(len(batch), outcome="spooled")
+        else:
+            event_counts.inc(len(batch), outcome="dropped")
+        return False
+
+    def _replay(self, limit=None):
+        """Insert spooled segments, oldest first, while the sink accepts them"""
+        replayed = 0
+        while self._sink_available() and (limit is None or replayed < limit):
+            claimed = self.spool.claim()
+            if claimed is None:
+                break
+            events = self.spool.read(claimed)
+            try:
+                for i in range(0, len(events), self.batch_size):
+                    self.sink.insert_events(events[i:i + self.batch_size])
+            except Exception as e:
+                # A partially replayed segment is retried whole; duplicates beat losses here
+                self._sink_failed(e)
+                self.spool.release(claimed, done=False)
+                break
+            self.spool.release(claimed, done=True)
+            event_counts.inc(len(events), outcome="replayed")
+            self._sink_recovered()
+            replayed += 1
+
+    def _run(self):
+        last_replay = 0.0
+        while not self._stop.is_set():
+            batch = self._drain(block=True)
+            if batch:
+                self._write(batch)
+            # Spooled segments go after live traffic, one per interval, and
+            # double as the health probe when there is no live traffic
+            now = time.monotonic()
+            if now - last_replay >= self.flush_interval:
+                last_replay = now
+                self._replay(limit=1)
+
+    def flush(self):
+        """Write everything queued right now (used on shutdown)"""
+        while True:
+            batch = self._drain(block=False)
+            if not batch:
+                break
+            self._write(batch)
+
+    def close(self, timeout=5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                # Still inside a slow sink write: it owns the queue and the spool
+                # segment, so flushing here would write the spool concurrently
+                logging.warning(f"Event log flusher still busy after {timeout}s; "
+                                f"{self._queue.qsize()} queued events not flushed")
+                return
+            self._thread = None
+        if self.spool is not None:
+            self.flush()
+            self.spool.close()
+
+    def stats(self):
+        return {
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": self._queue.maxsize,
+            "sink_healthy": self._sink_healthy,
+            "spool_bytes": self.spool.size() if self.spool is not None else 0,
+            **{outcome: event_counts.value(outcome=outcome)
+               for outcome in ("enqueued", "dropped", "written", "spooled", "replayed")},
+        }
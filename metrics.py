@@ -0,0 +1,221 @@
+import bisect
+import contextvars
+import threading
+import time
+
+# name -> metric, in registration order
+REGISTRY = {}
+_registry_lock = threading.Lock()
+
+# Set while a request is being profiled (src/api/profiling.py); stage timers
+# report into it. Context variables follow the request into the threadpool.
+current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [(dict(zip(self.labelnames, key)), value) for key, value in items]
+
+
+class Gauge:
+    """Point-in-time value (queue depth, pool size) with optional labels"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, fn, **labels):
+        """Read the value from fn() at collection time (for sizes owned by other objects)"""
+        with self._lock:
+            self._values[self._key(labels)] = fn
+
+    def value(self, **labels):
+        with self._lock:
+            value = self._values.get(self._key(labels), 0)
+        return value() if callable(value) else value
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [(dict(zip(self.labelnames, key)), value() if callable(value) else value)
+                for key, value in items]
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics) with optional labels"""
+
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts..., count above the last bound, sum]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        # Only the first matching bucket is counted here; samples() accumulates
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = [0] * (len(self.buckets) + 1) + [0.0]
+                self._values[key] = state
+            state[index] += 1
+            state[-1] += value
+
+    def samples(self):
+        """[(labels, {"buckets": {le: cumulative count}, "count": n, "sum": s})]"""
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        out = []
+        for key, state in items:
+            buckets = {}
+            cumulative = 0
+            for i, bound in enumerate(self.buckets):
+                cumulative += state[i]
+                buckets[str(bound)] = cumulative
+            cumulative += state[len(self.buckets)]
+            buckets["+Inf"] = cumulative
+            out.append((dict(zip(self.labelnames, key)),
+                        {"buckets": buckets, "count": cumulative, "sum": state[-1]}))
+        return out
+
+
+class StageTimer:
+    """``with stage_timer("crop.predict"):`` observes the block's duration in stage_seconds.
+
+    A plain class rather than @contextmanager: it is on every request path and
+    costs about a microsecond (see benchmarks/bench_metrics_overhead.py).
+    """
+
+    __slots__ = ("histogram", "stage", "start", "trace")
+
+    def __init__(self, histogram, stage):
+        self.histogram = histogram
+        self.stage = stage
+
+    def __enter__(self):
+        self.trace = current_trace.get()
+        if self.trace is not None:
+            self.trace.stage_started(self.stage)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        self.histogram.observe(elapsed, stage=self.stage)
+        if self.trace is not None:
+            self.trace.stage_finished(self.stage, self.start, elapsed)
+        return False
+
+
+def _register(cls, name, documentation, labelnames=(), **kwargs):
+    with _registry_lock:
+        metric = REGISTRY.get(name)
+        if metric is None:
+            metric = cls(name, documentation, labelnames, **kwargs)
+            REGISTRY[name] = metric
+        return metric
+
+
+def counter(name, documentation, labelnames=()):
+    return _register(Counter, name, documentation, labelnames)
+
+
+def gauge(name, documentation, labelnames=()):
+    return _register(Gauge, name, documentation, labelnames)
+
+
+def histogram(name, documentation, labelnames=(), buckets=Histogram.DEFAULT_BUCKETS):
+    return _register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+
+stage_seconds = histogram(
+    "stage_seconds", "Time spent in each request processing stage", ["stage"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+
+def stage_timer(stage):
+    return StageTimer(stage_seconds, stage)
+
+
+def snapshot():
+    """Plain-dict view of all metrics, for JSON stats endpoints"""
+    out = {}
+    for name, metric in list(REGISTRY.items()):
+        out[name] = [
+            {"labels": labels, "value": value} for labels, value in metric.samples()
+        ]
+    return out
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels.items()) + (list(extra.items()) if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in items) + "}"
+
+
+_TYPES = {Counter: "counter", Gauge: "gauge", Histogram: "histogram"}
+
+
+def render_prometheus():
+    """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+    lines = []
+    for name, metric in list(REGISTRY.items()):
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {_TYPES[type(metric)]}")
+        for labels, value in metric.samples():
+            if isinstance(metric, Histogram):
+                for bound, count in value["buckets"].items():
+                    lines.append(f"{name}_bucket{_format_labels(labels, {'le': bound})} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {value['sum']}")
+                lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+            else:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
@@ -1,12 +1,14 @@
 from pymongo import MongoClient
-import hashlib
+from pymongo.errors import BulkWriteError
 import os
 from datetime import datetime
 import logging
+from user_cache import UserProfileCache
+from storage import UserStore
 
 logging.basicConfig(level=logging.INFO)
 
-class UserDatabase:
+class UserDatabase(UserStore):
     def __init__(self):
         # MongoDB connection
         mongo_url = os.getenv('MONGODB_URL', 'mongodb://localhost:27017/')
@@ -14,13 +16,14 @@ class UserDatabase:
         self.db = self.client.krishisaathi
         self.users = self.db.users
         
-        # Create index for username (unique)
+        # Unique username and email, like the users table in Postgres
         self.users.create_index("username", unique=True)
+        self.users.create_index("email", unique=True)
+        self.events = self.db.prediction_events
+        self.events.create_index([("user", 1), ("created_at", 1)])
+        self.profile_cache = UserProfileCache("mongo")
         logging.info("MongoDB connected successfully")
     
-    def hash_password(self, password):
-        return hashlib.sha256(password.encode()).hexdigest()
-    
     def create_user(self, username, email, password, language='en'):
         try:
             user_doc = {
@@ -31,24 +34,66 @@ class UserDatabase:
                 'created_at': datetime.utcnow()
             }
             self.users.insert_one(user_doc)
+            self.profile_cache.invalidate(username)
             logging.info(f"User {username} created successfully")
             return True
         except Exception as e:
             logging.error(f"User creation failed: {e}")
             return False
     
-    def verify_user(self, username, password):
-        try:
-            user = self.users.find_one({
+    def insert_users_bulk(self, records):
+        """Insert (username, email, password_hash, language) records with one unordered insert_many.
+        
+        Returns 'created', 'duplicate' or 'error' per record instead of failing the batch.
+        """
+        now = datetime.utcnow()
+        docs = [
+            {
                 'username': username,
-                'password_hash': self.hash_password(password)
-            })
-            if user:
-                return (user['_id'], user['username'], user['email'], user['language'])
-            return None
-        except Exception as e:
-            logging.error(f"User verification failed: {e}")
+                'email': email,
+                'password_hash': password_hash,
+                'language': language,
+                'created_at': now
+            }
+            for username, email, password_hash, language in records
+        ]
+        statuses = ['created'] * len(docs)
+        try:
+            self.users.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get('writeErrors', []):
+                statuses[error['index']] = 'duplicate' if error.get('code') == 11000 else 'error'
+        for (username, _, _, _), status in zip(records, statuses):
+            if status == 'created':
+                self.profile_cache.invalidate(username)
+        return statuses
+    
+    def insert_events(self, events):
+        """Append prediction history events (dicts from event_log) with one insert_many"""
+        docs = [dict(e, created_at=datetime.utcfromtimestamp(e['ts'])) for e in events]
+        self.events.insert_many(docs, ordered=False)
+    
+    def get_profile(self, username):
+        """Profile dict (including password_hash) for a username, served from cache when possible"""
+        profile = self.profile_cache.get(username)
+        if profile is not None:
+            return profile
+        user = self.users.find_one(
+            {'username': username},
+            {'username': 1, 'email': 1, 'language': 1, 'password_hash': 1}
+        )
+        if user is None:
             return None
+        profile = {
+            # ObjectId is not JSON serializable; the shared interface uses str ids
+            'id': str(user['_id']),
+            'username': user['username'],
+            'email': user['email'],
+            'language': user['language'],
+            'password_hash': user['password_hash']
+        }
+        self.profile_cache.set(username, profile)
+        return profile
     
     def update_language(self, username, language):
         try:
@@ -58,4 +103,9 @@ class UserDatabase:
             )
             logging.info(f"Language updated for {username}")
         except Exception as e:
-            logging.error(f"Language update failed: {e}")
\ No newline at end of file
+            logging.error(f"Language update failed: {e}")
+        finally:
+            self.profile_cache.invalidate(username)
+    
+    def close(self):
+        self.client.close()
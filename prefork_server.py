@@ -0,0 +1,227 @@
+"""Pre-fork serving mode: load models once, fork uvicorn workers that share them.
+
+    python prefork_server.py --workers 4 --port $PORT
+
+The parent imports and warms the models listed in PREFORK_PRELOAD, moves
+everything it allocated into the GC's permanent generation (gc.freeze) and
+only then forks. Workers inherit the model pages copy-on-write, and because
+the cyclic GC no longer visits frozen objects it does not write to their
+headers, so those pages stay shared instead of being copied into every
+worker. Each worker imports the API itself, so database pools, SQLite
+handles and background threads are created after the fork, never shared.
+
+The parent binds the listening socket, supervises the workers and restarts
+any that exit, backing off when a worker keeps dying right after start.
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+APP = "src.api.main:app"
+
+PREFORK_WORKERS = int(os.getenv("PREFORK_WORKERS", str(os.cpu_count() or 1)))
+# TensorFlow and torch (the chatbot's sentence-transformers) start runtime and
+# OpenMP threads when a model loads and are not fork-safe afterwards, so the
+# disease model and the chatbot are only preloaded when asked for
+PREFORK_PRELOAD = os.getenv("PREFORK_PRELOAD", "crop,fertilizer")
+GRACEFUL_TIMEOUT = float(os.getenv("PREFORK_GRACEFUL_TIMEOUT", "30"))
+# A worker that exits sooner than this after starting is restarted with backoff
+MIN_UPTIME = 5.0
+MAX_RESTART_DELAY = 30.0
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s [prefork %(process)d] %(message)s")
+
+
+def _predict():
+    sys.path.insert(0, ROOT)
+    # Same module name the API resolves `..inference.predict` to
+    from src.inference import predict
+    return predict
+
+
+def _chatbot():
+    sys.path.append(os.path.join(ROOT, 'src', 'chatbot'))
+    import llama_chatbot_simple
+    return llama_chatbot_simple.simple_llama_chatbot
+
+
+PRELOADERS = {
+    "crop": lambda: _predict()._lazy_crop(),
+    "fertilizer": lambda: _predict()._lazy_fert(),
+    "disease": lambda: _predict()._lazy_disease(),
+    "chatbot": _chatbot,
+}
+
+
+def preload(names, freeze=True):
+    """Load the named models in this process and, by default, freeze them out of GC"""
+    for name in names:
+        start = time.perf_counter()
+        PRELOADERS[name]()
+        logging.info(f"preloaded {name} in {time.perf_counter() - start:.1f} s")
+    if freeze:
+        # Collect first so garbage from loading is not frozen forever
+        gc.collect()
+        gc.freeze()
+        logging.info(f"froze {gc.get_freeze_count()} objects")
+
+
+def read_memory(pid):
+    """RSS, PSS and USS (private pages) of a process in kB, from /proc/<pid>/smaps_rollup"""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss_kb": fields.get("Rss", 0),
+        "pss_kb": fields.get("Pss", 0),
+        "uss_kb": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def _serve_worker(sock, app, log_level):
+    import uvicorn
+    # Objects created from here on are the worker's own; let the GC manage them
+    gc.enable()
+    config = uvicorn.Config(app, log_level=log_level, lifespan="on")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class PreforkServer:
+    def __init__(self, app=APP, host="0.0.0.0", port=8000, workers=PREFORK_WORKERS,
+                 preload_names=(), log_level="info", graceful_timeout=GRACEFUL_TIMEOUT):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.preload_names = list(preload_names)
+        self.log_level = log_level
+        self.graceful_timeout = graceful_timeout
+        self.sock = None
+        self.running = False
+        # slot -> pid, slot -> start time, slot -> current restart delay
+        self.pids = {}
+        self.started_at = {}
+        self.restart_delay = {}
+        self.restart_at = {}
+
+    def bind(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((self.host, self.port))
+        self.sock.listen(2048)
+        self.sock.set_inheritable(True)
+
+    def spawn(self, slot):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            code = 0
+            try:
+                _serve_worker(self.sock, self.app, self.log_level)
+            except BaseException:
+                logging.exception("worker crashed")
+                code = 1
+            finally:
+                os._exit(code)
+        self.pids[slot] = pid
+        self.started_at[slot] = time.monotonic()
+        logging.info(f"worker {slot} started (pid {pid})")
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            slot = next((s for s, p in self.pids.items() if p == pid), None)
+            if slot is None:
+                continue
+            del self.pids[slot]
+            if not self.running:
+                continue
+            uptime = time.monotonic() - self.started_at[slot]
+            if uptime < MIN_UPTIME:
+                delay = min(MAX_RESTART_DELAY, max(1.0, self.restart_delay.get(slot, 0.5) * 2))
+            else:
+                delay = 0.0
+            self.restart_delay[slot] = delay
+            self.restart_at[slot] = time.monotonic() + delay
+            logging.warning(f"worker {slot} (pid {pid}) exited with status {os.waitstatus_to_exitcode(status)} "
+                            f"after {uptime:.1f} s; restarting in {delay:.1f} s")
+
+    def _stop(self, signum, frame):
+        logging.info(f"received {signal.Signals(signum).name}, shutting down")
+        self.running = False
+
+    def run(self):
+        gc.disable()  # nothing to collect yet; avoids touching objects before the freeze
+        preload(self.preload_names)
+        self.bind()
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        self.running = True
+        for slot in range(self.workers):
+            self.spawn(slot)
+
+        while self.running:
+            self._reap()
+            now = time.monotonic()
+            for slot, when in list(self.restart_at.items()):
+                if when <= now and self.running:
+                    del self.restart_at[slot]
+                    self.spawn(slot)
+            time.sleep(0.2)
+        self.shutdown()
+
+    def shutdown(self):
+        for pid in self.pids.values():
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.pids and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for slot, pid in list(self.pids.items()):
+            logging.warning(f"worker {slot} (pid {pid}) did not stop in time, killing it")
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self.sock.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Serve the API from pre-forked workers sharing preloaded models")
+    ap.add_argument("--app", default=APP)
+    ap.add_argument("--host", default="0.0.0.0")
+    ap.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    ap.add_argument("--workers", type=int, default=PREFORK_WORKERS)
+    ap.add_argument("--preload", default=PREFORK_PRELOAD,
+                    help=f"comma-separated, from: {', '.join(PRELOADERS)} ('' to disable)")
+    ap.add_argument("--log-level", default="info")
+    args = ap.parse_args()
+
+    names = [name for name in args.preload.split(",") if name]
+    unknown = set(names) - set(PRELOADERS)
+    if unknown:
+        ap.error(f"unknown preload targets: {', '.join(sorted(unknown))}")
+    os.chdir(ROOT)
+    PreforkServer(args.app, args.host, args.port, args.workers, names, args.log_level).run()
+
+
+if __name__ == "__main__":
+    main()
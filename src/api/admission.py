@@ -0,0 +1,425 @@
+"""Admission control: per-client token buckets weighted by endpoint cost and
+per-model-family concurrency limits, rejected with 429 and Retry-After.
+
+State lives in a SQLite file (ADMISSION_DB_PATH) so every worker on a host
+draws from the same buckets and slots; set it to "" to keep state in the
+process instead (single worker, tests). SQLite calls run on a state thread,
+and if the file stays locked past its timeout the request is admitted
+rather than failed.
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from starlette.responses import JSONResponse
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+import metrics
+
+
+def _parse_pairs(value, cast):
+    """'a=1,b=2' -> {'a': cast('1'), 'b': cast('2')}"""
+    pairs = {}
+    for item in value.split(","):
+        if "=" in item:
+            key, raw = item.split("=", 1)
+            pairs[key.strip()] = cast(raw.strip())
+    return pairs
+
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") == "1"
+ADMISSION_DB_PATH = os.getenv("ADMISSION_DB_PATH", "admission.db")
+# Tokens refilled per second per client, and the bucket size (largest burst)
+ADMISSION_RATE = float(os.getenv("ADMISSION_RATE", "2"))
+ADMISSION_BURST = float(os.getenv("ADMISSION_BURST", "60"))
+# Behind a reverse proxy the socket peer is the proxy; use X-Forwarded-For instead
+ADMISSION_TRUST_PROXY = os.getenv("ADMISSION_TRUST_PROXY", "0") == "1"
+# Proxies in front of the app; each appends the address it saw, so the client
+# is this many entries from the right (entries further left are client-supplied)
+ADMISSION_PROXY_HOPS = int(os.getenv("ADMISSION_PROXY_HOPS", "1"))
+# Comma-separated API keys that get a bucket of their own; any other X-API-Key is ignored
+ADMISSION_API_KEYS = [k.strip() for k in os.getenv("ADMISSION_API_KEYS", "").split(",") if k.strip()]
+# Requests in flight per model family, across all workers on the host
+ADMISSION_CONCURRENCY = _parse_pairs(os.getenv("ADMISSION_CONCURRENCY", "disease=2,chat=4,tabular=8"), int)
+
+# path -> (tokens per request, model family). Paths not listed (languages,
+# translations, metrics, stats) are cheap and skip admission entirely.
+ENDPOINT_COSTS = {
+    "/predict/disease": (20, "disease"),
+    # Up to DISEASE_BATCH_MAX_IMAGES images; batching makes each far cheaper than a single call
+    "/predict/disease/batch": (40, "disease"),
+    "/chat": (5, "chat"),
+    "/api/speech/process": (5, "chat"),
+    "/predict/crop": (1, "tabular"),
+    # Up to CROP_SWEEP_MAX_POINTS rows in one predict_proba call
+    "/predict/crop/sweep": (10, "tabular"),
+    "/predict/fertilizer": (1, "tabular"),
+    "/predict/soil-report": (2, "tabular"),
+    "/auth/login": (2, None),
+    "/auth/register": (2, None),
+    "/auth/bulk-register": (20, None),
+}
+ENDPOINT_COSTS.update({
+    path: (cost, ENDPOINT_COSTS.get(path, (0, None))[1])
+    for path, cost in _parse_pairs(os.getenv("ADMISSION_COSTS", ""), float).items()
+})
+
+# A slot held by a worker that died is reclaimed after this long; requests
+# still running renew their slot every SLOT_RENEW_SECONDS
+SLOT_LEASE_SECONDS = 30
+SLOT_RENEW_SECONDS = 10
+# Retry-After when a family is at its concurrency limit
+BUSY_RETRY_AFTER = 1
+# Drop idle bucket rows every N bucket writes
+_PRUNE_EVERY = 1000
+
+admission_decisions = metrics.counter(
+    "admission_decisions_total", "Admission decisions by endpoint", ["endpoint", "outcome"])
+admission_in_flight = metrics.gauge(
+    "admission_in_flight", "Requests holding a concurrency slot, per model family", ["family"])
+
+
+def _digest(api_key):
+    # Buckets are keyed by a digest so the state file holds no credentials
+    return hashlib.sha256(api_key).hexdigest()[:24]
+
+
+KNOWN_KEY_DIGESTS = frozenset(_digest(k.encode("latin-1")) for k in ADMISSION_API_KEYS)
+
+
+def _refill(tokens, updated, now, rate, burst):
+    return min(burst, tokens + max(0.0, now - updated) * rate)
+
+
+class MemoryAdmissionState:
+    """Buckets and slots for one process"""
+
+    # Calls are a dict update under a lock; cheaper inline than in the threadpool
+    blocking = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._slots = {}
+
+    def take(self, client, cost, rate, burst, now=None):
+        """Spend cost tokens; returns 0 if admitted, else seconds until it would be"""
+        now = time.time() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.get(client, (burst, now))
+            tokens = _refill(tokens, updated, now, rate, burst)
+            if tokens >= cost:
+                self._buckets[client] = (tokens - cost, now)
+                return 0.0
+            self._buckets[client] = (tokens, now)
+            return (cost - tokens) / rate
+
+    def refund(self, client, cost, burst):
+        """Give back tokens spent by take"""
+        with self._lock:
+            if client in self._buckets:
+                tokens, updated = self._buckets[client]
+                self._buckets[client] = (min(burst, tokens + cost), updated)
+
+    def acquire(self, family, limit):
+        with self._lock:
+            if self._slots.get(family, 0) >= limit:
+                return None
+            self._slots[family] = self._slots.get(family, 0) + 1
+            return family
+
+    def renew(self, family, slot):
+        pass
+
+    def release(self, family, slot):
+        with self._lock:
+            self._slots[family] -= 1
+
+    def in_flight(self, family):
+        return self._slots.get(family, 0)
+
+    def close(self):
+        pass
+
+
+class SQLiteAdmissionState:
+    """Buckets and slots in a SQLite file shared by all workers on a host"""
+
+    # Calls can wait up to the busy timeout for another worker's lock
+    blocking = True
+
+    def __init__(self, path=ADMISSION_DB_PATH, timeout=2):
+        self.path = path
+        self._lock = threading.Lock()
+        self._writes = 0
+        # Autocommit mode so BEGIN IMMEDIATE below controls the transactions
+        self._conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=OFF")  # losing buckets in a crash is harmless
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS buckets (
+                client TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL
+            )
+        ''')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS slots (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                family TEXT NOT NULL,
+                pid INTEGER NOT NULL,
+                expires REAL NOT NULL
+            )
+        ''')
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_slots_family ON slots (family, expires)")
+
+    def _transaction(self, body, fail_open):
+        """Run body() in a write transaction; returns fail_open if the file stays locked"""
+        with self._lock:
+            try:
+                # IMMEDIATE takes the write lock up front, so two workers cannot
+                # both read the same balance and spend it twice
+                self._conn.execute("BEGIN IMMEDIATE")
+            except sqlite3.OperationalError as e:
+                logging.warning(f"Admission state unavailable ({e}); admitting request")
+                return fail_open
+            try:
+                result = body()
+                self._conn.execute("COMMIT")
+                return result
+            except sqlite3.OperationalError as e:
+                self._conn.execute("ROLLBACK")
+                logging.warning(f"Admission state unavailable ({e}); admitting request")
+                return fail_open
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def take(self, client, cost, rate, burst, now=None):
+        """Spend cost tokens; returns 0 if admitted, else seconds until it would be"""
+        now = time.time() if now is None else now
+
+        def spend():
+            row = self._conn.execute(
+                "SELECT tokens, updated FROM buckets WHERE client = ?", (client,)).fetchone()
+            tokens = _refill(row[0], row[1], now, rate, burst) if row else burst
+            wait = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                wait = (cost - tokens) / rate
+            self._conn.execute(
+                "INSERT OR REPLACE INTO buckets (client, tokens, updated) VALUES (?, ?, ?)",
+                (client, tokens, now))
+            self._writes += 1
+            if self._writes % _PRUNE_EVERY == 0:
+                # A bucket idle this long is full again; the row adds nothing
+                self._conn.execute("DELETE FROM buckets WHERE updated < ?", (now - burst / rate,))
+            return wait
+        return self._transaction(spend, 0.0)
+
+    def refund(self, client, cost, burst):
+        """Give back tokens spent by take"""
+        def give_back():
+            self._conn.execute(
+                "UPDATE buckets SET tokens = MIN(?, tokens + ?) WHERE client = ?", (burst, cost, client))
+        self._transaction(give_back, None)
+
+    def acquire(self, family, limit):
+        now = time.time()
+
+        def claim():
+            self._conn.execute("DELETE FROM slots WHERE family = ? AND expires < ?", (family, now))
+            (held,) = self._conn.execute(
+                "SELECT COUNT(*) FROM slots WHERE family = ?", (family,)).fetchone()
+            if held >= limit:
+                return None
+            return self._conn.execute(
+                "INSERT INTO slots (family, pid, expires) VALUES (?, ?, ?)",
+                (family, os.getpid(), now + SLOT_LEASE_SECONDS)).lastrowid
+        # Slot ids start at 1, so releasing the fail-open slot 0 deletes nothing
+        return self._transaction(claim, 0)
+
+    def renew(self, family, slot):
+        """Push back the lease of a slot whose request is still running"""
+        if not slot:
+            return
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "UPDATE slots SET expires = ? WHERE id = ?", (time.time() + SLOT_LEASE_SECONDS, slot))
+            except sqlite3.OperationalError as e:
+                # Tried again on the next renewal, well before the lease runs out
+                logging.warning(f"Could not renew {family} slot {slot} ({e})")
+
+    def release(self, family, slot):
+        if not slot:
+            return
+        with self._lock:
+            try:
+                self._conn.execute("DELETE FROM slots WHERE id = ?", (slot,))
+            except sqlite3.OperationalError as e:
+                # The lease runs out and the slot is reclaimed anyway
+                logging.warning(f"Could not release {family} slot {slot} ({e})")
+
+    def in_flight(self, family):
+        with self._lock:
+            (held,) = self._conn.execute(
+                "SELECT COUNT(*) FROM slots WHERE family = ? AND expires >= ?", (family, time.time())).fetchone()
+        return held
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def get_admission_state(path=ADMISSION_DB_PATH):
+    return SQLiteAdmissionState(path) if path else MemoryAdmissionState()
+
+
+def client_key(scope, trust_proxy=ADMISSION_TRUST_PROXY, proxy_hops=ADMISSION_PROXY_HOPS,
+               known_keys=KNOWN_KEY_DIGESTS):
+    """Configured API key if the client sent one, else its address"""
+    headers = dict(scope.get("headers") or [])
+    api_key = headers.get(b"x-api-key")
+    if api_key:
+        digest = _digest(api_key)
+        # An unknown key would let a client start a fresh bucket on every request
+        if digest in known_keys:
+            return "key:" + digest
+    if trust_proxy and b"x-forwarded-for" in headers:
+        hops = [h.strip() for h in headers[b"x-forwarded-for"].decode("latin-1").split(",") if h.strip()]
+        if hops:
+            # The rightmost entries were written by our proxies; the client can only prepend
+            return "ip:" + hops[-min(proxy_hops, len(hops))]
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+
+class AdmissionMiddleware:
+    """Rejects requests over the client's token budget or the family's concurrency limit.
+
+    Plain ASGI like RequestMetricsMiddleware; register it before CORSMiddleware
+    so 429 responses still carry CORS headers.
+
+    The concurrency slot is taken when the app reads the last chunk of the
+    request body, so routes with a model family must read their body before
+    running the model.
+    """
+
+    def __init__(self, app, state=None, costs=None, concurrency=None,
+                 rate=ADMISSION_RATE, burst=ADMISSION_BURST, enabled=ADMISSION_ENABLED):
+        self.app = app
+        self.enabled = enabled
+        self.state = state if state is not None else (get_admission_state() if enabled else None)
+        self.costs = ENDPOINT_COSTS if costs is None else costs
+        self.concurrency = ADMISSION_CONCURRENCY if concurrency is None else concurrency
+        self.rate = rate
+        self.burst = burst
+        # State calls are serialised by the state's own lock, so one thread is enough
+        self._executor = None
+        if self.state is not None and getattr(self.state, "blocking", True):
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="admission")
+        if self.state is not None:
+            for family in self.concurrency:
+                admission_in_flight.set_function(lambda family=family: self.state.in_flight(family), family=family)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+        path = scope["path"]
+        cost, family = self.costs.get(path, (0, None))
+        limit = self.concurrency.get(family)
+        if not cost and not limit:
+            await self.app(scope, receive, send)
+            return
+
+        client = client_key(scope)
+        if cost:
+            # A cost above the bucket size could never be admitted
+            wait = await self._call(self.state.take, client, min(cost, self.burst), self.rate, self.burst)
+            if wait > 0:
+                admission_decisions.inc(endpoint=path, outcome="rate_limited")
+                await self._reject(scope, receive, send, math.ceil(wait), "rate limit exceeded")
+                return
+        if not limit:
+            admission_decisions.inc(endpoint=path, outcome="admitted")
+            await self.app(scope, receive, send)
+            return
+
+        # The slot is taken once the whole body has arrived, right before the
+        # model runs, so a slow upload does not hold the model while it trickles in
+        slot = None
+        busy = False
+        renewer = None
+
+        async def receive_then_acquire():
+            nonlocal slot, busy, renewer
+            message = await receive()
+            if (slot is None and not busy and message["type"] == "http.request"
+                    and not message.get("more_body", False)):
+                slot = await self._call(self._acquire, client, cost, family, limit)
+                if slot is None:
+                    busy = True
+                    admission_decisions.inc(endpoint=path, outcome="busy")
+                    await self._reject(scope, receive, send, BUSY_RETRY_AFTER, f"{family} model is busy")
+                    # The app sees a client that went away; whatever it answers is dropped
+                    return {"type": "http.disconnect"}
+                admission_decisions.inc(endpoint=path, outcome="admitted")
+                renewer = asyncio.ensure_future(self._renew(family, slot))
+            return message
+
+        async def send_unless_rejected(message):
+            if not busy:
+                await send(message)
+
+        try:
+            await self.app(scope, receive_then_acquire, send_unless_rejected)
+        except Exception:
+            if not busy:
+                raise
+        finally:
+            if renewer is not None:
+                renewer.cancel()
+            if slot is not None:
+                # Not awaited: the response is already sent, and the state
+                # thread runs calls in order, so the slot is freed before the next admit
+                self._submit(self.state.release, family, slot)
+
+    def _acquire(self, client, cost, family, limit):
+        """Slot for family, or None; both state calls in one go so they cost one trip to the state thread"""
+        slot = self.state.acquire(family, limit)
+        if slot is None and cost:
+            # A client turned away because the model is busy should not also lose tokens for it
+            self.state.refund(client, min(cost, self.burst), self.burst)
+        return slot
+
+    async def _renew(self, family, slot):
+        while True:
+            await asyncio.sleep(SLOT_RENEW_SECONDS)
+            await self._call(self.state.renew, family, slot)
+
+    def _submit(self, method, *args):
+        # A shared state file can be locked by another worker; never wait for it on the event loop
+        if self._executor is None:
+            return method(*args)
+        return self._executor.submit(method, *args)
+
+    async def _call(self, method, *args):
+        if self._executor is None:
+            return method(*args)
+        return await asyncio.wrap_future(self._submit(method, *args))
+
+    async def _reject(self, scope, receive, send, retry_after, reason):
+        response = JSONResponse(
+            {"success": False, "error": f"Too many requests: {reason}. Retry in {retry_after} s."},
+            status_code=429, headers={"Retry-After": str(retry_after)})
+        await response(scope, receive, send)
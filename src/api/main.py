@@ -1,17 +1,34 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Response, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
-from ..inference.predict import predict_crop, predict_fertilizer, predict_disease
+from typing import List, Optional
+import numpy as np
+from ..inference.predict import (predict_crop, predict_fertilizer, predict_disease, predict_disease_batch,
+                                 summarize_severity, sweep_crop, soil_report, ImageTooLarge, CROP_SWEEP_MAX_POINTS)
+from .request_metrics import RequestMetricsMiddleware
+from .admission import AdmissionMiddleware
+from .uploads import read_uploads, UploadRejected, IMAGE_FORMATS, UPLOAD_MAX_BYTES, UPLOAD_MAX_REQUEST_BYTES
+from .profiling import ProfilingMiddleware, TracedRoute, profiling_enabled, router as profiling_router
+from .model_routes import router as model_router
+import hmac
+import json
+import zipfile
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
-from database import UserDatabase
+from storage import get_user_store, get_async_user_store
+from user_import import import_users
 from languages import INDIAN_LANGUAGES
-from translator import get_translations
+from translation_bundles import get_bundle, load_bundle, start_build
+from event_log import PredictionEventLog
+import metrics
 
 # Import LLaMA chatbot and speech routes
 sys.path.append(os.path.join(os.path.dirname(__file__), '../chatbot'))
 from llama_chatbot_simple import simple_llama_chatbot as chatbot
+from answer_translations import AnswerTranslations, ServedAnswerLog
+from corpus import text_id
 
 # Import speech routes from the same directory
 try:
@@ -24,6 +41,15 @@ except ImportError:
     from speech_routes import router as speech_router
 
 app = FastAPI(title="KrishiSaathi API", version="1.0.0")
+# Sync routes register their worker thread with the profiler when they start
+app.router.route_class = TracedRoute
+
+# Innermost, so profiles cover the route itself; not installed unless PROFILE_* is set
+if profiling_enabled():
+    app.add_middleware(ProfilingMiddleware)
+
+# Added before CORS so that CORS wraps it and 429 responses carry CORS headers
+app.add_middleware(AdmissionMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -40,7 +66,61 @@ app.add_middleware(
 
 # Include speech routes
 app.include_router(speech_router, prefix="/api", tags=["speech"])
-db = UserDatabase()
+app.include_router(profiling_router, tags=["debug"])
+app.include_router(model_router, tags=["models"])
+
+app.add_middleware(RequestMetricsMiddleware)
+
+# Handlers below catch errors and answer 200 {"success": false}, so status alone hides them
+api_results = metrics.counter(
+    "api_results_total", "Prediction/chat results by endpoint and outcome", ["endpoint", "outcome"])
+
+# Backend comes from STORAGE_BACKEND or storage.backend in config.yaml
+db = get_user_store()
+# Non-blocking database access for the auth handlers (DB_ASYNC=1)
+async_db = None
+if os.getenv("DB_ASYNC") == "1":
+    async_db = get_async_user_store()
+# Per-user prediction history, written behind the request path
+event_log = PredictionEventLog(db)
+# X-Admin-Token for /auth/bulk-register; without it bulk registration is disabled
+USER_ADMIN_TOKEN = os.getenv("USER_ADMIN_TOKEN", "")
+
+def _check_user_admin_token(token):
+    if not USER_ADMIN_TOKEN or token is None or not hmac.compare_digest(token.encode(), USER_ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="User admin token required")
+
+@app.on_event("startup")
+async def open_async_db():
+    if async_db is not None:
+        await async_db.connect()
+    event_log.start()
+    served_answer_log.start()
+
+@app.on_event("shutdown")
+async def close_databases():
+    if async_db is not None:
+        await async_db.close()
+    # Flush queued events before the store goes away
+    event_log.close()
+    served_answer_log.close()
+    db.close()
+answer_translations = AnswerTranslations()
+served_answer_log = ServedAnswerLog()
+metrics.gauge(
+    "answer_translations_entries", "Pre-translated chatbot answers loaded"
+).set_function(lambda: len(answer_translations._entries))
+
+@app.on_event("startup")
+def prefetch_translations_on_startup():
+    if os.getenv("TRANSLATION_PREFETCH", "1") != "1":
+        return
+    # Languages with a prebuilt bundle never hit the translation API. The rest
+    # are translated in the background and written as bundles here, on the
+    # machine that serves them (a release-phase build would not reach it)
+    missing = [code for code in INDIAN_LANGUAGES if load_bundle(code) is None]
+    if missing:
+        start_build(missing)
 
 class CropFeatures(BaseModel):
     N: float = Field(..., description="Nitrogen")
@@ -51,6 +131,27 @@ class CropFeatures(BaseModel):
     ph: float
     rainfall: float
 
+class SweepAxis(BaseModel):
+    variable: str = Field(..., description="One of N, P, K, temperature, humidity, ph, rainfall")
+    values: Optional[List[float]] = Field(None, description="Explicit values, or start/stop/steps")
+    start: Optional[float] = None
+    stop: Optional[float] = None
+    steps: Optional[int] = Field(None, description="Evenly spaced values from start to stop inclusive")
+
+    def grid_values(self):
+        if self.values is not None:
+            return self.values
+        if self.start is None or self.stop is None or not self.steps or self.steps < 1:
+            raise ValueError(f"{self.variable}: give values, or start, stop and steps")
+        if self.steps > CROP_SWEEP_MAX_POINTS:
+            raise ValueError(f"{self.variable}: at most {CROP_SWEEP_MAX_POINTS} steps")
+        return np.linspace(self.start, self.stop, self.steps).round(4).tolist()
+
+class CropSweep(BaseModel):
+    base: CropFeatures
+    axes: List[SweepAxis]
+    min_probability: float = Field(0.01, description="Leave out crops that never reach this probability")
+
 class FertFeatures(BaseModel):
     temperature: float
     humidity: float
@@ -61,6 +162,11 @@ class FertFeatures(BaseModel):
     P: float
     K: float
 
+class SoilReportFeatures(CropFeatures):
+    moisture: float
+    soil_type: str
+    top_k: int = Field(3, ge=1, le=5, description="Crops to recommend, each with a fertilizer")
+
 class UserRegister(BaseModel):
     username: str
     email: str
@@ -78,42 +184,186 @@ class LanguageUpdate(BaseModel):
 class ChatMessage(BaseModel):
     message: str
     user_id: str = None
+    language: str = 'en'
 
 @app.post("/predict/crop")
-def predict_crop_endpoint(body: CropFeatures):
+def predict_crop_endpoint(body: CropFeatures, x_user_id: str = Header(None)):
     try:
-        result = predict_crop(body.dict())
+        features = body.dict()
+        result = predict_crop(features)
+        event_log.record("crop", x_user_id, features, result)
+        api_results.inc(endpoint="/predict/crop", outcome="success")
         return {"success": True, "data": result}
     except Exception as e:
+        api_results.inc(endpoint="/predict/crop", outcome="error")
         return {"success": False, "error": str(e)}
 
+@app.post("/predict/crop/sweep")
+def predict_crop_sweep_endpoint(body: CropSweep, x_user_id: str = Header(None)):
+    """Crop probabilities over a grid of values of up to three features, scored in one model call"""
+    try:
+        axes = [(axis.variable, axis.grid_values()) for axis in body.axes]
+        result = sweep_crop(body.base.dict(), axes, body.min_probability)
+    except ValueError as e:
+        api_results.inc(endpoint="/predict/crop/sweep", outcome="rejected")
+        return JSONResponse({"success": False, "error": str(e)}, status_code=400)
+    except Exception as e:
+        api_results.inc(endpoint="/predict/crop/sweep", outcome="error")
+        return {"success": False, "error": str(e)}
+    # The request as sent (start/stop/steps or values), so a replay can post it again
+    event_log.record("crop_sweep", x_user_id, body.dict(exclude_none=True),
+                     {"points": result["points"], "model_version": result["model_version"]})
+    api_results.inc(endpoint="/predict/crop/sweep", outcome="success")
+    return {"success": True, "data": result}
+
 @app.post("/predict/fertilizer")
-def predict_fertilizer_endpoint(body: FertFeatures):
+def predict_fertilizer_endpoint(body: FertFeatures, x_user_id: str = Header(None)):
     try:
-        result = predict_fertilizer(body.dict())
+        features = body.dict()
+        result = predict_fertilizer(features)
+        event_log.record("fertilizer", x_user_id, features, result)
+        api_results.inc(endpoint="/predict/fertilizer", outcome="success")
         return {"success": True, "data": result}
     except Exception as e:
+        api_results.inc(endpoint="/predict/fertilizer", outcome="error")
         return {"success": False, "error": str(e)}
 
-@app.post("/predict/disease")
-async def predict_disease_endpoint(file: UploadFile = File(...)):
+@app.post("/predict/soil-report")
+def predict_soil_report_endpoint(body: SoilReportFeatures, x_user_id: str = Header(None)):
+    """Crop and fertilizer advice for one soil-health card in a single call"""
     try:
-        img_bytes = await file.read()
-        result = predict_disease(img_bytes)
+        features = body.dict()
+        result = soil_report(features, features.pop("top_k"))
+        event_log.record("soil_report", x_user_id, features, result)
+        api_results.inc(endpoint="/predict/soil-report", outcome="success")
         return {"success": True, "data": result}
     except Exception as e:
+        api_results.inc(endpoint="/predict/soil-report", outcome="error")
         return {"success": False, "error": str(e)}
 
+def _multipart_body(field, many=False):
+    """OpenAPI request body for endpoints that parse their multipart upload themselves"""
+    schema = {"type": "string", "format": "binary"}
+    if many:
+        schema = {"type": "array", "items": schema}
+    return {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+        "type": "object", "required": [field], "properties": {field: schema}}}}}}
+
+@app.post("/predict/disease", openapi_extra=_multipart_body("file"))
+async def predict_disease_endpoint(request: Request, x_user_id: str = Header(None)):
+    # Streamed and checked while it arrives instead of UploadFile + file.read()
+    try:
+        (upload,) = await read_uploads(request, "file")
+    except UploadRejected as e:
+        api_results.inc(endpoint="/predict/disease", outcome="rejected")
+        return JSONResponse({"success": False, "error": e.message}, status_code=e.status_code)
+    try:
+        result = predict_disease(upload.file)
+        event_log.record("disease", x_user_id, {"filename": upload.filename, "bytes": upload.size}, result)
+        api_results.inc(endpoint="/predict/disease", outcome="success")
+        return {"success": True, "data": result}
+    except ImageTooLarge as e:
+        api_results.inc(endpoint="/predict/disease", outcome="rejected")
+        return JSONResponse({"success": False, "error": str(e)}, status_code=413)
+    except Exception as e:
+        api_results.inc(endpoint="/predict/disease", outcome="error")
+        return {"success": False, "error": str(e)}
+    finally:
+        upload.close()
+
+# Images accepted per /predict/disease/batch request, counting those inside zip archives
+DISEASE_BATCH_MAX_IMAGES = int(os.getenv("DISEASE_BATCH_MAX_IMAGES", "100"))
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+def _expand_uploads(uploads):
+    """Uploads -> (name, loader) per image; zip members are read on the decode pool"""
+    items = []
+    for upload in uploads:
+        if upload.format != "zip":
+            items.append((upload.filename, lambda upload=upload: upload.file))
+            continue
+        archive = zipfile.ZipFile(upload.file)
+        for info in archive.infolist():
+            if info.is_dir() or not info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            # Reading a member stops at its declared size, so this bounds memory too
+            if info.file_size > UPLOAD_MAX_BYTES:
+                raise UploadRejected(413, f"{info.filename} is larger than {UPLOAD_MAX_BYTES} bytes")
+            items.append((f"{upload.filename}/{info.filename}", lambda info=info, archive=archive: archive.read(info)))
+    return items
+
+@app.post("/predict/disease/batch", openapi_extra=_multipart_body("files", many=True))
+async def predict_disease_batch_endpoint(request: Request, x_user_id: str = Header(None)):
+    """One NDJSON line per image as its batch finishes, then a field-level severity summary"""
+    uploads = []
+    try:
+        # Zip archives may be as large as the whole request allows
+        uploads = await read_uploads(request, "files", formats=IMAGE_FORMATS + ("zip",),
+                                     max_files=DISEASE_BATCH_MAX_IMAGES, max_bytes=UPLOAD_MAX_REQUEST_BYTES,
+                                     max_request_bytes=UPLOAD_MAX_REQUEST_BYTES)
+        items = _expand_uploads(uploads)
+        if not items:
+            raise UploadRejected(400, "No images found in upload")
+        if len(items) > DISEASE_BATCH_MAX_IMAGES:
+            raise UploadRejected(413, f"At most {DISEASE_BATCH_MAX_IMAGES} images per request")
+    except (UploadRejected, zipfile.BadZipFile) as e:
+        for upload in uploads:
+            upload.close()
+        if isinstance(e, zipfile.BadZipFile):
+            raise HTTPException(status_code=400, detail=f"Invalid zip archive: {e}")
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+
+    # Sync generator: Starlette iterates it on the threadpool, off the event loop
+    def stream():
+        results = []
+        try:
+            for index, result in predict_disease_batch(load for _, load in items):
+                line = {"index": index, "filename": items[index][0]}
+                if isinstance(result, Exception):
+                    api_results.inc(endpoint="/predict/disease/batch", outcome="error")
+                    line.update(success=False, error=str(result))
+                else:
+                    api_results.inc(endpoint="/predict/disease/batch", outcome="success")
+                    results.append(result)
+                    line.update(success=True, data=result)
+                yield json.dumps(line) + "\n"
+        except Exception as e:
+            api_results.inc(endpoint="/predict/disease/batch", outcome="error")
+            yield json.dumps({"success": False, "error": str(e)}) + "\n"
+        finally:
+            for upload in uploads:
+                upload.close()
+        summary = summarize_severity(results)
+        event_log.record("disease_batch", x_user_id, {"images": len(items)}, summary)
+        yield json.dumps({"summary": summary}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 @app.post("/auth/register")
-def register_user(user: UserRegister):
+async def register_user(user: UserRegister):
     if user.language not in INDIAN_LANGUAGES:
         raise HTTPException(status_code=400, detail="Invalid language")
     
+    if async_db is not None:
+        if not await async_db.create_user(user.username, user.email, user.password, user.language):
+            raise HTTPException(status_code=400, detail="Username or email already exists")
+        return {"message": "User registered successfully"}
+    
     # Temporarily bypass database for demo
     return {"message": "User registered successfully"}
 
 @app.post("/auth/login")
-def login_user(user: UserLogin):
+async def login_user(user: UserLogin):
+    if async_db is not None:
+        row = await async_db.verify_user(user.username, user.password)
+        if row is None:
+            raise HTTPException(status_code=401, detail="Invalid username or password")
+        user_id, username, email, language = row
+        return {
+            "message": "Login successful",
+            "user": {"id": user_id, "username": username, "email": email, "language": language}
+        }
+    
     # Temporarily bypass database for demo
     return {
         "message": "Login successful",
@@ -125,32 +375,84 @@ def login_user(user: UserLogin):
         }
     }
 
+@app.post("/auth/bulk-register")
+def bulk_register_users(file: UploadFile = File(...), x_admin_token: str = Header(None)):
+    """Register many users from a CSV (username,email,password[,language]); streams NDJSON results"""
+    _check_user_admin_token(x_admin_token)
+    return StreamingResponse(
+        import_users(db, file.file, INDIAN_LANGUAGES),
+        media_type="application/x-ndjson"
+    )
+
 @app.get("/languages")
 def get_languages():
     return INDIAN_LANGUAGES
 
 @app.get("/translations/{language}")
-def get_translations_endpoint(language: str):
-    return get_translations(language)
+def get_translations_endpoint(language: str, request: Request):
+    body, etag, cache_control = get_bundle(language)
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/metrics")
+def get_metrics():
+    return Response(content=metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/stats/translations")
+def get_translation_stats():
+    return {
+        name: samples for name, samples in metrics.snapshot().items()
+        if name.startswith("translation_")
+    }
+
+@app.get("/stats/user-cache")
+def get_user_cache_stats():
+    profile_cache = getattr(db, "profile_cache", None)
+    if profile_cache is None:
+        return {"backend": None}
+    return profile_cache.stats()
+
+@app.get("/stats/event-log")
+def get_event_log_stats():
+    return event_log.stats()
 
 @app.put("/auth/language")
-def update_language(update: LanguageUpdate):
+async def update_language(update: LanguageUpdate):
     if update.language not in INDIAN_LANGUAGES:
         raise HTTPException(status_code=400, detail="Invalid language")
     
+    if async_db is not None:
+        await async_db.update_language(update.username, update.language)
+        return {"message": "Language updated successfully"}
+    
     # Temporarily bypass database for demo
     return {"message": "Language updated successfully"}
 
 @app.post("/chat")
 def chat_with_krishisaathi(chat: ChatMessage):
     try:
-        response = chatbot.get_response(chat.message)
+        response, source = chatbot.get_response_with_source(chat.message)
+        served_answer_log.record(response, source)
+        # Only pre-translated answers are localized; no network call on this path
+        translated = answer_translations.lookup(response, chat.language)
+        # Answer ids rather than full texts keep the history rows small
+        event_log.record(
+            "chat", chat.user_id,
+            {"message": chat.message[:500], "language": chat.language},
+            {"answer_id": text_id(source) if source else None, "translated": translated is not None}
+        )
+        api_results.inc(endpoint="/chat", outcome="success")
         return {
             "success": True,
-            "response": response,
+            "response": translated or response,
+            "language": chat.language if translated else "en",
             "timestamp": "now"
         }
     except Exception as e:
+        api_results.inc(endpoint="/chat", outcome="error")
         return {
             "success": False,
             "error": "Sorry, I'm having trouble right now. Please try again.",
@@ -0,0 +1,61 @@
+"""Model versions: what each worker serves, and activate / rollback.
+
+Changing versions needs ``X-Admin-Token: $MODEL_ADMIN_TOKEN``; without the
+variable set those endpoints are disabled. The worker handling the request
+swaps right away, and the others follow within MODEL_REGISTRY_POLL seconds
+(see src/inference/registry.py).
+"""
+import hmac
+import os
+
+from fastapi import APIRouter, Header, HTTPException
+
+from ..inference.registry import registry, RegistryError, LEGACY_FILES
+from .profiling import TracedRoute
+
+MODEL_ADMIN_TOKEN = os.getenv("MODEL_ADMIN_TOKEN", "")
+
+router = APIRouter(route_class=TracedRoute)
+
+
+def _check_token(token):
+    if not MODEL_ADMIN_TOKEN or token is None or not hmac.compare_digest(token.encode(), MODEL_ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Model admin token required")
+
+
+def _check_model(name):
+    if name not in LEGACY_FILES:
+        raise HTTPException(status_code=404, detail=f"Unknown model {name}")
+
+
+@router.get("/models")
+def list_models():
+    return registry.status()
+
+
+@router.get("/models/{name}/versions")
+def list_versions(name: str):
+    _check_model(name)
+    return registry.versions(name)
+
+
+@router.post("/models/{name}/activate/{version}")
+def activate_version(name: str, version: str, x_admin_token: str = Header(None)):
+    _check_token(x_admin_token)
+    _check_model(name)
+    try:
+        served = registry.activate(name, version)
+    except RegistryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"model": name, "serving": served.version}
+
+
+@router.post("/models/{name}/rollback")
+def rollback_version(name: str, x_admin_token: str = Header(None)):
+    _check_token(x_admin_token)
+    _check_model(name)
+    try:
+        served = registry.rollback(name)
+    except RegistryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"model": name, "serving": served.version}
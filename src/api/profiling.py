@@ -0,0 +1,314 @@
+"""On-demand request profiling.
+
+A request carrying ``X-Profile-Token: $PROFILE_TOKEN`` runs under a sampling
+profiler; the profile is stored in PROFILE_DIR and its id returned in the
+``X-Profile-Id`` response header. With PROFILE_SLOW_MS set, a random
+PROFILE_SLOW_SAMPLE_RATE share of requests is profiled as well and the
+profile kept only if the request took longer than the threshold.
+
+Profiles hold folded stacks (flamegraph.pl / speedscope input), the hottest
+functions and a timeline of the stage_timer stages (crop.predict,
+chat.encode, ...) hit while serving the request. Read them back with
+``GET /debug/profiles`` and ``GET /debug/profiles/{id}`` using the same token.
+
+When neither PROFILE_TOKEN nor PROFILE_SLOW_MS is set the middleware is not
+installed at all; stage timers then only pay one context variable lookup.
+"""
+import functools
+import hmac
+import inspect
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+import metrics
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "0"))
+PROFILE_SLOW_SAMPLE_RATE = float(os.getenv("PROFILE_SLOW_SAMPLE_RATE", "0.01"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "100"))
+# Deeper frames are cut from the root side of folded stacks
+MAX_STACK_DEPTH = 64
+TOP_FUNCTIONS = 30
+
+profiles_saved = metrics.counter("profiles_saved_total", "Request profiles stored", ["reason"])
+
+
+def profiling_enabled():
+    return bool(PROFILE_TOKEN) or PROFILE_SLOW_MS > 0
+
+
+class Trace:
+    """Stages and threads seen while serving one request (see metrics.current_trace)"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = []
+        # Threads working on this request right now, with their nesting depth; the
+        # sampler only looks at these. The event loop thread stays for the whole
+        # request, pool threads only while they run its route or one of its stages,
+        # so a reused thread is not sampled once it has moved on to other work.
+        self.threads = Counter({threading.get_ident(): 1})
+        self._lock = threading.Lock()
+
+    def thread_started(self):
+        with self._lock:
+            self.threads[threading.get_ident()] += 1
+
+    def thread_finished(self):
+        ident = threading.get_ident()
+        with self._lock:
+            self.threads[ident] -= 1
+            if self.threads[ident] <= 0:
+                del self.threads[ident]
+
+    def active_threads(self):
+        with self._lock:
+            return tuple(self.threads)
+
+    def stage_started(self, stage):
+        self.thread_started()
+
+    def stage_finished(self, stage, start, elapsed):
+        self.thread_finished()
+        self.stages.append({
+            "stage": stage,
+            "start_ms": round((start - self.start) * 1000, 3),
+            "duration_ms": round(elapsed * 1000, 3),
+            "thread": threading.get_ident(),
+        })
+
+
+# Leaf frames of a thread that is waiting, not working (the event loop between
+# callbacks, an idle threadpool worker); such samples are dropped
+IDLE_FRAMES = {("selectors.py", "select"), ("threading.py", "wait"), ("queue.py", "get")}
+
+
+def _idle(frame):
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Sampler(threading.Thread):
+    """Samples the stacks of the trace's threads every interval"""
+
+    def __init__(self, trace, interval):
+        super().__init__(name="request-profiler", daemon=True)
+        self.trace = trace
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frames = sys._current_frames()
+            for ident in self.trace.active_threads():
+                frame = frames.get(ident)
+                if frame is None or _idle(frame):
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                if stack:
+                    self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _top_functions(stacks):
+    own, total = Counter(), Counter()
+    for stack, count in stacks.items():
+        own[stack[-1]] += count
+        for name in set(stack):
+            total[name] += count
+    # Hottest first: time spent in the function itself, then including callees
+    names = sorted(total, key=lambda name: (own[name], total[name]), reverse=True)
+    return [{"function": name, "self": own[name], "total": total[name]} for name in names[:TOP_FUNCTIONS]]
+
+
+class ProfileStore:
+    """Profiles as JSON files in a directory, newest PROFILE_KEEP kept"""
+
+    def __init__(self, path=PROFILE_DIR, keep=PROFILE_KEEP):
+        self.path = path
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    def save(self, profile):
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, f"{profile['id']}.json"), "w") as f:
+            json.dump(profile, f)
+        with self._lock:
+            files = sorted(
+                (os.path.join(self.path, name) for name in os.listdir(self.path) if name.endswith(".json")),
+                key=os.path.getmtime)
+            for old in files[:-self.keep]:
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
+
+    def load(self, profile_id):
+        # ids are uuid hex; anything else could escape the directory
+        if not all(c in "0123456789abcdef" for c in profile_id):
+            return None
+        try:
+            with open(os.path.join(self.path, f"{profile_id}.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def list(self):
+        if not os.path.isdir(self.path):
+            return []
+        out = []
+        for name in os.listdir(self.path):
+            profile = self.load(name[:-len(".json")]) if name.endswith(".json") else None
+            if profile:
+                out.append({key: profile[key] for key in ("id", "created", "method", "path", "status",
+                                                           "duration_ms", "reason")})
+        return sorted(out, key=lambda p: p["created"], reverse=True)
+
+
+store = ProfileStore()
+
+
+def _authorized(token):
+    return bool(PROFILE_TOKEN) and token is not None and hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode())
+
+
+class ProfilingMiddleware:
+    """Profiles requests that ask for it with the admin token, and a sample of the rest when slow"""
+
+    def __init__(self, app, slow_ms=PROFILE_SLOW_MS, sample_rate=PROFILE_SLOW_SAMPLE_RATE,
+                 interval_ms=PROFILE_INTERVAL_MS, profile_store=None):
+        self.app = app
+        self.slow_ms = slow_ms
+        self.sample_rate = sample_rate
+        self.interval = interval_ms / 1000
+        self.store = profile_store or store
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith("/debug/"):
+            await self.app(scope, receive, send)
+            return
+        requested = False
+        if PROFILE_TOKEN:
+            token = next((value for name, value in scope["headers"] if name == b"x-profile-token"), None)
+            requested = _authorized(token.decode("latin-1") if token is not None else None)
+        if not requested and not (self.slow_ms > 0 and random.random() < self.sample_rate):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+        trace = Trace()
+        sampler = Sampler(trace, self.interval)
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if requested:
+                    message = dict(message)
+                    message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        context_token = metrics.current_trace.set(trace)
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            sampler.stop()
+            metrics.current_trace.reset(context_token)
+            duration_ms = (time.perf_counter() - trace.start) * 1000
+            if requested or duration_ms >= self.slow_ms:
+                reason = "requested" if requested else "slow"
+                # File write, directory listing and prune stay off the event loop
+                await run_in_threadpool(self.store.save, {
+                    "id": profile_id,
+                    "created": time.time(),
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status,
+                    "duration_ms": round(duration_ms, 3),
+                    "reason": reason,
+                    "interval_ms": self.interval * 1000,
+                    "samples": sampler.samples,
+                    "stages": trace.stages,
+                    "top": _top_functions(sampler.stacks),
+                    "folded": [f"{';'.join(stack)} {count}" for stack, count in sampler.stacks.most_common()],
+                })
+                profiles_saved.inc(reason=reason)
+
+
+def _traced(endpoint):
+    @functools.wraps(endpoint)
+    def run(*args, **kwargs):
+        trace = metrics.current_trace.get()
+        if trace is None:
+            return endpoint(*args, **kwargs)
+        trace.thread_started()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            trace.thread_finished()
+    return run
+
+
+class TracedRoute(APIRoute):
+    """Route class that registers the threadpool thread running a sync endpoint with the request's trace.
+
+    Without it a sync route that has no stage timers would give an empty
+    profile. Async endpoints run on the event loop thread, which is always
+    sampled, and are left alone, as is everything when profiling is off.
+    """
+
+    def __init__(self, path, endpoint, **kwargs):
+        if profiling_enabled() and not inspect.iscoroutinefunction(endpoint):
+            endpoint = _traced(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+router = APIRouter()
+
+
+def _check_token(token):
+    if not _authorized(token):
+        raise HTTPException(status_code=403, detail="Profiling token required")
+
+
+@router.get("/debug/profiles")
+def list_profiles(x_profile_token: str = Header(None)):
+    _check_token(x_profile_token)
+    return store.list()
+
+
+@router.get("/debug/profiles/{profile_id}")
+def get_profile(profile_id: str, x_profile_token: str = Header(None)):
+    _check_token(x_profile_token)
+    profile = store.load(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
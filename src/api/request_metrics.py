@@ -0,0 +1,50 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+import metrics
+
+http_requests = metrics.counter(
+    "http_requests_total", "HTTP requests by route template and status", ["method", "endpoint", "status"])
+http_latency = metrics.histogram(
+    "http_request_seconds", "Time to response headers by route template", ["endpoint"])
+
+
+class RequestMetricsMiddleware:
+    """Counts requests and times them up to the response headers.
+
+    Plain ASGI instead of @app.middleware("http"): BaseHTTPMiddleware wraps
+    every response in an extra task and stream, which costs more than the
+    metrics themselves.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+        elapsed = None
+
+        async def send_with_status(message):
+            nonlocal status, elapsed
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                elapsed = time.perf_counter() - start
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in scope; templates, not raw
+            # paths, keep label cardinality bounded
+            route = scope.get("route")
+            endpoint = route.path if route is not None else "unmatched"
+            http_requests.inc(method=scope["method"], endpoint=endpoint, status=status)
+            http_latency.observe(elapsed if elapsed is not None else time.perf_counter() - start,
+                                 endpoint=endpoint)
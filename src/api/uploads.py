@@ -0,0 +1,188 @@
+"""Streaming multipart upload reader with size limits and format sniffing.
+
+UploadFile makes Starlette spool the whole body before the endpoint runs and
+``await file.read()`` then copies it into memory, with no limit on either.
+read_uploads parses the request body as it arrives instead: each file part
+is checked against its magic bytes as soon as the first bytes are in,
+counted against the byte limits chunk by chunk, and written to a
+SpooledTemporaryFile (in memory up to UPLOAD_SPOOL_BYTES, then on disk), so
+a bad or oversized upload is refused before the rest of it is read. Decoders
+read from the spool directly.
+"""
+import os
+from tempfile import SpooledTemporaryFile
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# Per file, and per request for multi-file endpoints
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_MAX_REQUEST_BYTES = int(os.getenv("UPLOAD_MAX_REQUEST_BYTES", str(100 * 1024 * 1024)))
+# Parts smaller than this stay in memory, larger ones go to a temporary file
+UPLOAD_SPOOL_BYTES = int(os.getenv("UPLOAD_SPOOL_BYTES", str(1024 * 1024)))
+# Multipart boundaries and part headers on top of the file bytes
+_MULTIPART_OVERHEAD = 64 * 1024
+_SNIFF_BYTES = 12
+
+IMAGE_FORMATS = ("jpeg", "png", "webp", "bmp")
+
+
+def sniff_format(header):
+    """File format from its first bytes, or None if it is not one we accept"""
+    if header.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "webp"
+    if header.startswith(b"BM"):
+        return "bmp"
+    if header.startswith(b"PK\x03\x04"):
+        return "zip"
+    return None
+
+
+class UploadRejected(Exception):
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+class SpooledUpload:
+    """One uploaded file, positioned at its start"""
+
+    def __init__(self, filename, file, size, format):
+        self.filename = filename
+        self.file = file
+        self.size = size
+        self.format = format
+
+    def close(self):
+        self.file.close()
+
+
+class _PartReader:
+    """python-multipart callbacks that spool the parts of one form field"""
+
+    def __init__(self, field, formats, max_files, max_bytes, max_request_bytes):
+        self.field = field
+        self.formats = formats
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.max_request_bytes = max_request_bytes
+        self.uploads = []
+        self.total = 0
+        self._header_field = b""
+        self._header_value = b""
+        self._headers = {}
+        self._part = None
+        self._head = b""
+
+    def callbacks(self):
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": lambda data, start, end: self._add_header(field=data[start:end]),
+            "on_header_value": lambda data, start, end: self._add_header(value=data[start:end]),
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def _add_header(self, field=b"", value=b""):
+        self._header_field += field
+        self._header_value += value
+
+    def on_part_begin(self):
+        self._headers = {}
+        self._part = None
+        self._head = b""
+
+    def on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition"))
+        if options.get(b"name", b"").decode("latin-1") != self.field or b"filename" not in options:
+            return  # other form fields are ignored
+        if len(self.uploads) >= self.max_files:
+            raise UploadRejected(413, f"At most {self.max_files} file(s) per request")
+        filename = options[b"filename"].decode("utf-8", "replace")
+        self._part = SpooledUpload(filename, SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES), 0, None)
+        self.uploads.append(self._part)
+
+    def on_part_data(self, data, start, end):
+        part = self._part
+        if part is None:
+            return
+        chunk = data[start:end]
+        part.size += len(chunk)
+        self.total += len(chunk)
+        if part.size > self.max_bytes:
+            raise UploadRejected(413, f"{part.filename} is larger than {self.max_bytes} bytes")
+        if self.total > self.max_request_bytes:
+            raise UploadRejected(413, f"Upload is larger than {self.max_request_bytes} bytes")
+        if part.format is None:
+            # Hold the first bytes back until there are enough to identify the file
+            self._head += chunk
+            if len(self._head) < _SNIFF_BYTES:
+                return
+            self._check_format()
+            chunk, self._head = self._head, b""
+        part.file.write(chunk)
+
+    def on_part_end(self):
+        part = self._part
+        if part is None:
+            return
+        if part.format is None:
+            self._check_format()
+            part.file.write(self._head)
+        part.file.seek(0)
+        self._part = None
+
+    def _check_format(self):
+        part = self._part
+        part.format = sniff_format(self._head)
+        if part.format not in self.formats:
+            raise UploadRejected(415, f"{part.filename} is not a supported file type ({', '.join(self.formats)})")
+
+
+async def read_uploads(request, field="file", formats=IMAGE_FORMATS, max_files=1,
+                       max_bytes=UPLOAD_MAX_BYTES, max_request_bytes=None):
+    """Stream the multipart body and return a SpooledUpload per file sent in `field`.
+
+    Raises UploadRejected (413 too large, 415 wrong type, 400 malformed) as
+    soon as the offending bytes arrive. The caller closes the uploads.
+    """
+    if max_request_bytes is None:
+        max_request_bytes = min(UPLOAD_MAX_REQUEST_BYTES, max_bytes * max_files)
+    content_type, params = parse_options_header(request.headers.get("content-type"))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise UploadRejected(400, "Expected a multipart/form-data upload")
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_request_bytes + _MULTIPART_OVERHEAD:
+        # Refused from the headers alone; nothing of the body is read
+        raise UploadRejected(413, f"Upload is larger than {max_request_bytes} bytes")
+
+    reader = _PartReader(field, formats, max_files, max_bytes, max_request_bytes)
+    parser = MultipartParser(params[b"boundary"], reader.callbacks())
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+        parser.finalize()
+    except UploadRejected:
+        for upload in reader.uploads:
+            upload.close()
+        raise
+    except Exception as e:
+        for upload in reader.uploads:
+            upload.close()
+        raise UploadRejected(400, f"Malformed multipart upload: {e}")
+    if not reader.uploads:
+        raise UploadRejected(400, f"No file sent in form field '{field}'")
+    return reader.uploads
@@ -0,0 +1,290 @@
+"""Pre-translated chatbot answers, served without any network call.
+
+The API logs the id of every served response to a JSONL log. An offline job
+ranks responses by how often they were served and translates the top-N into
+each enabled language, writing answer_translations.json next to the corpus.
+Only answers translated in full are saved; --refresh retries the rest:
+
+    python src/chatbot/answer_translations.py --top-n 300
+    python src/chatbot/answer_translations.py --refresh   # after corpus/log changes
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from corpus import text_id, load_qa_pairs
+
+ANSWER_TRANSLATIONS_PATH = os.getenv(
+    "ANSWER_TRANSLATIONS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "answer_translations.json")
+)
+CHAT_LOG_PATH = os.getenv("CHAT_LOG_PATH", "chat_served.jsonl")
+CHAT_LOG_FLUSH_INTERVAL = float(os.getenv("CHAT_LOG_FLUSH_INTERVAL", "5"))
+# The log is renamed to .1 (.1 to .2, ...) past this size; CHAT_LOG_BACKUPS old files are kept
+CHAT_LOG_MAX_BYTES = int(os.getenv("CHAT_LOG_MAX_BYTES", str(32 * 1024 * 1024)))
+CHAT_LOG_BACKUPS = int(os.getenv("CHAT_LOG_BACKUPS", "3"))
+# Records held in memory if the file cannot be written; the oldest are dropped beyond this
+CHAT_LOG_MAX_BUFFER = 10000
+DEFAULT_TOP_N = 300
+# Marks files that only hold complete translations (older ones may hold partial ones)
+FILE_FORMAT = 2
+_RELOAD_CHECK_INTERVAL = 30
+
+
+def log_files(path=CHAT_LOG_PATH, backups=CHAT_LOG_BACKUPS):
+    """The log and its rotated copies that exist, oldest first"""
+    paths = [f"{path}.{n}" for n in range(backups, 0, -1)] + [path]
+    return [p for p in paths if os.path.exists(p)]
+
+
+class ServedAnswerLog:
+    """Log of served response ids, the ranking input for the offline job.
+
+    record() only queues ids in memory; a daemon thread appends them every
+    flush_interval. A response's text goes into a file once, with its first
+    id, so the offline job has something to translate. Files are rotated at
+    max_bytes.
+    """
+
+    def __init__(self, path=CHAT_LOG_PATH, flush_interval=CHAT_LOG_FLUSH_INTERVAL,
+                 max_bytes=CHAT_LOG_MAX_BYTES, backups=CHAT_LOG_BACKUPS):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._buffer = deque(maxlen=CHAT_LOG_MAX_BUFFER)
+        # response_id -> text, for responses whose text is not in the current file yet
+        self._texts = {}
+        self._written = set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="chat-log-flusher", daemon=True)
+            self._thread.start()
+
+    def record(self, response, source_answer=None):
+        response_id = text_id(response)
+        with self._lock:
+            self._buffer.append((time.time(), response_id, text_id(source_answer) if source_answer else None))
+            if response_id not in self._written:
+                self._texts[response_id] = response
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            try:
+                self._rotate_if_full()
+            except OSError as e:
+                print(f"Could not rotate chat log: {e}")
+            lines = []
+            texts = {}
+            with self._lock:
+                records, self._buffer = self._buffer, deque(maxlen=CHAT_LOG_MAX_BUFFER)
+                for ts, response_id, answer_id in records:
+                    record = {"ts": ts, "response_id": response_id, "answer_id": answer_id}
+                    if response_id not in self._written and response_id not in texts:
+                        text = self._texts.pop(response_id, None)
+                        if text is not None:
+                            record["response"] = texts[response_id] = text
+                    lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+            if not lines:
+                return
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.writelines(lines)
+            except OSError as e:
+                print(f"Could not write chat log: {e}")
+                with self._lock:
+                    # Back in front of anything recorded meanwhile, for the next flush
+                    self._buffer = deque(list(records) + list(self._buffer), maxlen=CHAT_LOG_MAX_BUFFER)
+                    for response_id, text in texts.items():
+                        self._texts.setdefault(response_id, text)
+                return
+            with self._lock:
+                self._written.update(texts)
+                # Recorded again while the file was being written
+                for response_id in texts:
+                    self._texts.pop(response_id, None)
+
+    def _rotate_if_full(self):
+        try:
+            if os.path.getsize(self.path) < self.max_bytes:
+                return
+        except OSError:
+            return
+        for n in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{n}"):
+                os.replace(f"{self.path}.{n}", f"{self.path}.{n + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        # Texts are written again in the new file, so it stands alone once older ones are gone
+        with self._lock:
+            self._written.clear()
+
+    def close(self, timeout=5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+
+class AnswerTranslations:
+    """Read-only view of answer_translations.json, reloaded when the file changes"""
+
+    def __init__(self, path=ANSWER_TRANSLATIONS_PATH):
+        self.path = path
+        self._entries = {}
+        self._mtime = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+        self._maybe_reload(force=True)
+
+    def _maybe_reload(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._checked_at < _RELOAD_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f).get("entries", {})
+                self._mtime = mtime
+            except (OSError, ValueError) as e:
+                print(f"Could not load answer translations: {e}")
+
+    def lookup(self, response, language):
+        """Return the stored translation of a served response, or None"""
+        if language == 'en':
+            return response
+        self._maybe_reload()
+        entry = self._entries.get(text_id(response))
+        if entry is None:
+            return None
+        return entry["translations"].get(language)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def rank_served(log_path=CHAT_LOG_PATH):
+    """Count served responses in the log and its rotated copies; returns (Counter of ids, {id: record})
+
+    records only has ids whose text is still in one of the files.
+    """
+    counts = Counter()
+    records = {}
+    for path in log_files(log_path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                counts[record["response_id"]] += 1
+                if record.get("response"):
+                    records[record["response_id"]] = record
+    return counts, records
+
+
+def build_translations(counts, records, languages, top_n=DEFAULT_TOP_N, existing=None,
+                       corpus_answer_ids=None, client=None):
+    """Translate the top_n most served responses, reusing still-valid existing entries"""
+    if client is None:
+        from translation_client import get_client
+        client = get_client()
+    existing = existing or {}
+    entries = {}
+    translated_calls = 0
+    for response_id, count in counts.most_common(top_n):
+        record = records.get(response_id)
+        if record is None:
+            # Its text was only in a log file that has since been rotated away
+            continue
+        # Answers that were removed from the corpus should not be served any more
+        if corpus_answer_ids is not None and record["answer_id"] and record["answer_id"] not in corpus_answer_ids:
+            continue
+        translations = dict(existing.get(response_id, {}).get("translations", {}))
+        for language in languages:
+            if language in translations:
+                continue
+            # None unless every segment translated; a missing language is retried by --refresh
+            translated = client.translate(record["response"], language, partial=False)
+            translated_calls += 1
+            if translated is not None:
+                translations[language] = translated
+        entries[response_id] = {
+            "answer_id": record["answer_id"],
+            "count": count,
+            "translations": translations
+        }
+    return entries, translated_calls
+
+
+def save_translations(entries, languages, corpus_path, path=ANSWER_TRANSLATIONS_PATH):
+    doc = {
+        "format": FILE_FORMAT,
+        "generated_at": time.time(),
+        "corpus": corpus_path,
+        "languages": list(languages),
+        "entries": entries
+    }
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(doc, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def main():
+    from languages import INDIAN_LANGUAGES
+
+    ap = argparse.ArgumentParser(description="Pre-translate the most served chatbot answers")
+    ap.add_argument("--log", default=CHAT_LOG_PATH, help="served-response log (JSONL)")
+    ap.add_argument("--out", default=ANSWER_TRANSLATIONS_PATH)
+    ap.add_argument("--top-n", type=int, default=DEFAULT_TOP_N)
+    ap.add_argument("--languages", nargs="*", help="language codes (default: all supported)")
+    ap.add_argument("--refresh", action="store_true",
+                    help="keep existing translations, only fill gaps and drop stale answers")
+    args = ap.parse_args()
+
+    languages = [code for code in (args.languages or INDIAN_LANGUAGES) if code != 'en']
+    counts, records = rank_served(args.log)
+    qa_pairs, corpus_path = load_qa_pairs()
+    corpus_answer_ids = {text_id(qa['answer']) for qa in qa_pairs}
+
+    existing = {}
+    if args.refresh and os.path.exists(args.out):
+        with open(args.out, "r", encoding="utf-8") as f:
+            doc = json.load(f)
+        # Older files may hold partly translated answers; those are redone
+        if doc.get("format", 1) >= FILE_FORMAT:
+            existing = doc.get("entries", {})
+
+    entries, calls = build_translations(
+        counts, records, languages, args.top_n, existing, corpus_answer_ids)
+    save_translations(entries, languages, corpus_path, args.out)
+    print(f"Saved {len(entries)} answers x {len(languages)} languages to {args.out} "
+          f"({calls} translations fetched, {len(counts)} distinct answers in log)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import hashlib
+import os
+import pickle
+
+DATASET_PATHS = [
+    '../../datasets/massive_chatbot_data.pkl',
+    '../datasets/massive_chatbot_data.pkl',
+    'datasets/massive_chatbot_data.pkl'
+]
+
+FALLBACK_QA_PAIRS = [
+    {
+        'question': 'cotton cultivation telangana',
+        'answer': 'For cotton cultivation in Telangana: 1) Plant during June-July after monsoon, 2) Use black cotton soil with good drainage, 3) Apply 120kg N, 60kg P2O5, 60kg K2O per hectare, 4) Maintain 90cm row spacing, 5) Regular pest monitoring for bollworm, 6) Harvest after 180-200 days'
+    },
+    {
+        'question': 'weather affect crops',
+        'answer': 'Weather significantly affects crops: Temperature controls growth rate and flowering, rainfall determines irrigation needs, humidity influences disease development, wind can cause physical damage and affect pollination, extreme weather reduces yields. Monitor forecasts and adjust practices accordingly.'
+    },
+    {
+        'question': 'pest management cotton',
+        'answer': 'Cotton pest management: 1) Use Integrated Pest Management (IPM), 2) Monitor for bollworm, aphids, whitefly, 3) Apply neem-based organic pesticides, 4) Install pheromone traps, 5) Encourage beneficial insects like ladybugs, 6) Practice crop rotation with non-host plants'
+    }
+]
+
+
+def text_id(text):
+    """Stable short id for an answer/response text"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+
+def find_dataset():
+    for path in DATASET_PATHS:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def load_qa_pairs(path=None):
+    """Load Q&A pairs from the dataset pickle; returns (qa_pairs, path or None)"""
+    path = path or find_dataset()
+    if path is None:
+        return list(FALLBACK_QA_PAIRS), None
+    with open(path, 'rb') as f:
+        data = pickle.load(f)
+    return data['qa_pairs'], path
@@ -1,28 +1,33 @@
 import json
 import pickle
 import os
-from sentence_transformers import SentenceTransformer
+import sys
+from corpus import DATASET_PATHS, FALLBACK_QA_PAIRS
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from metrics import stage_timer
 from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 
 class SimpleLlamaAgriChatbot:
-    def __init__(self):
-        self.sentence_model = SentenceTransformer('all-MiniLM-L6-v2')
+    def __init__(self, sentence_model=None, qa_pairs=None):
+        if sentence_model is None:
+            from sentence_transformers import SentenceTransformer
+            sentence_model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.sentence_model = sentence_model
         self.qa_pairs = []
         self.qa_embeddings = None
-        self.load_dataset()
+        if qa_pairs is not None:
+            # Caller-supplied corpus (benchmarks, tests) instead of the dataset files
+            self.qa_pairs = list(qa_pairs)
+            self.qa_embeddings = self.sentence_model.encode([qa['question'] for qa in self.qa_pairs])
+        else:
+            self.load_dataset()
         print(f"LLaMA-style Agricultural Chatbot Ready!")
         print(f"Dataset: {len(self.qa_pairs):,} Q&A pairs")
     
     def load_dataset(self):
         """Load massive agricultural dataset"""
-        dataset_paths = [
-            '../../datasets/massive_chatbot_data.pkl',
-            '../datasets/massive_chatbot_data.pkl',
-            'datasets/massive_chatbot_data.pkl'
-        ]
-        
-        for path in dataset_paths:
+        for path in DATASET_PATHS:
             if os.path.exists(path):
                 try:
                     with open(path, 'rb') as f:
@@ -43,20 +48,7 @@ class SimpleLlamaAgriChatbot:
     
     def create_fallback_data(self):
         """Create fallback agricultural data"""
-        self.qa_pairs = [
-            {
-                'question': 'cotton cultivation telangana',
-                'answer': 'For cotton cultivation in Telangana: 1) Plant during June-July after monsoon, 2) Use black cotton soil with good drainage, 3) Apply 120kg N, 60kg P2O5, 60kg K2O per hectare, 4) Maintain 90cm row spacing, 5) Regular pest monitoring for bollworm, 6) Harvest after 180-200 days'
-            },
-            {
-                'question': 'weather affect crops',
-                'answer': 'Weather significantly affects crops: Temperature controls growth rate and flowering, rainfall determines irrigation needs, humidity influences disease development, wind can cause physical damage and affect pollination, extreme weather reduces yields. Monitor forecasts and adjust practices accordingly.'
-            },
-            {
-                'question': 'pest management cotton',
-                'answer': 'Cotton pest management: 1) Use Integrated Pest Management (IPM), 2) Monitor for bollworm, aphids, whitefly, 3) Apply neem-based organic pesticides, 4) Install pheromone traps, 5) Encourage beneficial insects like ladybugs, 6) Practice crop rotation with non-host plants'
-            }
-        ]
+        self.qa_pairs = list(FALLBACK_QA_PAIRS)
         
         questions = [qa['question'] for qa in self.qa_pairs]
         self.qa_embeddings = self.sentence_model.encode(questions)
@@ -67,13 +59,15 @@ class SimpleLlamaAgriChatbot:
             return []
         
         # Encode user question
-        question_embedding = self.sentence_model.encode([question])
-        
-        # Calculate similarities
-        similarities = cosine_similarity(question_embedding, self.qa_embeddings)[0]
+        with stage_timer("chat.encode"):
+            question_embedding = self.sentence_model.encode([question])
         
-        # Get top matches above threshold
-        top_indices = np.argsort(similarities)[-top_k:][::-1]
+        with stage_timer("chat.similarity"):
+            # Calculate similarities
+            similarities = cosine_similarity(question_embedding, self.qa_embeddings)[0]
+            
+            # Get top matches above threshold
+            top_indices = np.argsort(similarities)[-top_k:][::-1]
         
         relevant_context = []
         for idx in top_indices:
@@ -88,18 +82,22 @@ class SimpleLlamaAgriChatbot:
     
     def generate_response(self, question):
         """Generate response using retrieval-augmented approach"""
+        return self.generate_response_with_source(question)[0]
+    
+    def generate_response_with_source(self, question):
+        """Like generate_response, but also returns the corpus answer used (or None)"""
         # Check for comprehensive questions first
         question_lower = question.lower()
         comprehensive_keywords = ['what do i need', 'how to grow', 'complete guide', 'everything about', 'all about']
         
         if any(keyword in question_lower for keyword in comprehensive_keywords):
-            return self.get_fallback_response(question)
+            return self.get_fallback_response(question), None
         
         # Get relevant context
         context = self.retrieve_context(question, top_k=5, threshold=0.2)
         
         if not context:
-            return self.get_fallback_response(question)
+            return self.get_fallback_response(question), None
         
         # Filter out poor quality answers
         good_context = []
@@ -111,21 +109,21 @@ class SimpleLlamaAgriChatbot:
                 good_context.append(ctx)
         
         if not good_context:
-            return self.get_fallback_response(question)
+            return self.get_fallback_response(question), None
         
         # If very high similarity with good answer, return direct match
         if good_context[0]['similarity'] > 0.8:
-            return f"🎯 {good_context[0]['answer']}"
+            return f"🎯 {good_context[0]['answer']}", good_context[0]['answer']
         
         # If moderate similarity, use best match
         if good_context[0]['similarity'] > 0.5:
-            return f"📚 Based on similar queries: {good_context[0]['answer']}"
+            return f"📚 Based on similar queries: {good_context[0]['answer']}", good_context[0]['answer']
         
         # If low similarity, provide general guidance
         if good_context[0]['similarity'] > 0.2:
-            return f"💡 Related information: {good_context[0]['answer']}\\n\\nFor more specific advice, please provide more details about your farming situation."
+            return f"💡 Related information: {good_context[0]['answer']}\\n\\nFor more specific advice, please provide more details about your farming situation.", good_context[0]['answer']
         
-        return self.get_fallback_response(question)
+        return self.get_fallback_response(question), None
     
     def get_fallback_response(self, question):
         """Provide fallback response for unknown topics"""
@@ -159,31 +157,43 @@ class SimpleLlamaAgriChatbot:
     
     def get_response(self, question):
         """Main interface for getting responses"""
+        return self.get_response_with_source(question)[0]
+    
+    def get_response_with_source(self, question):
+        """Return (response, corpus answer or None) so callers can track served answers"""
         if not question.strip():
-            return "Please ask me about agricultural topics like crops, soil, fertilizers, or pest management."
+            return "Please ask me about agricultural topics like crops, soil, fertilizers, or pest management.", None
         
         # Handle greetings and identity questions
         greetings = ['hello', 'hi', 'hey', 'namaste', 'good morning', 'good evening']
         identity_questions = ['who are you', 'what are you', 'who r u', 'what r u', 'introduce yourself', 'tell me about yourself']
         
         if any(greeting in question.lower() for greeting in greetings) and len(question.split()) <= 3:
-            return "🙏 Hello! I'm KrishiSaathi, your AI agricultural assistant powered by advanced language models. Ask me about farming, crops, soil management, or pest control!"
+            return "🙏 Hello! I'm KrishiSaathi, your AI agricultural assistant powered by advanced language models. Ask me about farming, crops, soil management, or pest control!", None
         
         if any(identity in question.lower() for identity in identity_questions):
-            return "🤖 I'm KrishiSaathi, your intelligent agricultural companion! I'm an AI assistant specifically designed to help farmers with:\n\n🌱 Crop cultivation guidance\n🌾 Soil management advice\n💧 Irrigation recommendations\n🐛 Pest and disease control\n🧪 Fertilizer suggestions\n📊 Agricultural best practices\n\nI have access to over 100,000 agricultural Q&A pairs and use advanced AI to provide accurate, helpful farming advice. How can I help you with your farming needs today?"
+            return "🤖 I'm KrishiSaathi, your intelligent agricultural companion! I'm an AI assistant specifically designed to help farmers with:\n\n🌱 Crop cultivation guidance\n🌾 Soil management advice\n💧 Irrigation recommendations\n🐛 Pest and disease control\n🧪 Fertilizer suggestions\n📊 Agricultural best practices\n\nI have access to over 100,000 agricultural Q&A pairs and use advanced AI to provide accurate, helpful farming advice. How can I help you with your farming needs today?", None
         
         # Handle thanks
         thanks = ['thank', 'thanks', 'dhanyawad']
         if any(thank in question.lower() for thank in thanks) and len(question.split()) <= 3:
-            return "🙏 You're welcome! Happy farming! Feel free to ask more agricultural questions anytime."
+            return "🙏 You're welcome! Happy farming! Feel free to ask more agricultural questions anytime.", None
         
         # Generate response
         try:
-            response = self.generate_response(question)
-            return response
+            return self.generate_response_with_source(question)
         except Exception as e:
             print(f"Error: {e}")
-            return "I'm having trouble processing your question. Please try asking about specific agricultural topics like crop cultivation, soil management, or pest control."
+            return "I'm having trouble processing your question. Please try asking about specific agricultural topics like crop cultivation, soil management, or pest control.", None
+
+# Global instance, built on first import of the name so that importing the
+# class alone (benchmarks) does not load MiniLM and the corpus
+_simple_llama_chatbot = None
 
-# Global instance
-simple_llama_chatbot = SimpleLlamaAgriChatbot()
\ No newline at end of file
+def __getattr__(name):
+    global _simple_llama_chatbot
+    if name == "simple_llama_chatbot":
+        if _simple_llama_chatbot is None:
+            _simple_llama_chatbot = SimpleLlamaAgriChatbot()
+        return _simple_llama_chatbot
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
@@ -24,8 +24,7 @@ class SpeechHandler:
         try:
             if source_lang == target_lang:
                 return text
-            translated = self.translator.translate(text, src=source_lang, dest=target_lang)
-            return translated.text
+            return self.translator.translate_text(text, source_lang=source_lang, target_lang=target_lang)
         except Exception as e:
             print(f"Translation error: {e}")
             return text
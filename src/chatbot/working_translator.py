@@ -1,6 +1,7 @@
-import urllib.parse
-import urllib.request
-import json
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from translation_client import get_client
 
 class WorkingTranslator:
     def __init__(self):
@@ -17,6 +18,7 @@ class WorkingTranslator:
             'odia': 'or',
             'english': 'en'
         }
+        self.client = get_client()
     
     def translate_text(self, text, source_lang='en', target_lang='hi'):
         """Translate text using Google Translate"""
@@ -24,15 +26,8 @@ class WorkingTranslator:
             return text
             
         try:
-            # Use Google Translate API
-            url = f"https://translate.googleapis.com/translate_a/single?client=gtx&sl={source_lang}&tl={target_lang}&dt=t&q={urllib.parse.quote(text)}"
-            
-            with urllib.request.urlopen(url) as response:
-                result = json.loads(response.read().decode())
-                
-            if result and len(result) > 0 and len(result[0]) > 0:
-                return result[0][0][0]
-                
+            # Sentence-level, cached and batched; keeps the whole answer
+            return self.client.translate(text, target_lang, source_lang)
         except Exception as e:
             print(f"Translation error: {e}")
             
@@ -1,61 +1,113 @@
-import os, io
+import os, io, sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-from joblib import load
 from PIL import Image
-import tensorflow as tf
 
-MODELS_DIR = os.getenv("MODELS_DIR", "new model")
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from metrics import stage_timer
+from .registry import registry
 
-# Crop + fertilizer (scikit-learn pipelines)
-_crop_model = None
-_fert_model = None
-_fert_columns = None
-# Disease (tf)
-_dis_model = None
-_dis_labels = None
+# Images per model call and decode threads for predict_disease_batch
+DISEASE_BATCH_SIZE = int(os.getenv("DISEASE_BATCH_SIZE", "16"))
+DISEASE_DECODE_WORKERS = int(os.getenv("DISEASE_DECODE_WORKERS", str(min(4, os.cpu_count() or 1))))
+SEVERITY_LEVELS = ["None", "Early", "Moderate", "Severe"]
+# Larger images are refused from their header, before any pixel is decoded
+DISEASE_MAX_PIXELS = int(os.getenv("DISEASE_MAX_PIXELS", str(50_000_000)))
+CROP_FEATURES = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall"]
+FERT_SOIL_TYPES = ['Clayey', 'Loamy', 'Red', 'Sandy']
+FERT_CROP_TYPES = ['Cotton', 'Ground Nuts', 'Maize', 'Millets', 'Oil seeds', 'Paddy', 'Pulses', 'Sugarcane', 'Tobacco', 'Wheat']
+# Crop model labels -> the fertilizer model's crop types; crops it was not trained on are absent
+CROP_TO_FERTILIZER_CROP_TYPE = {
+    'rice': 'Paddy', 'maize': 'Maize', 'cotton': 'Cotton',
+    'chickpea': 'Pulses', 'kidneybeans': 'Pulses', 'pigeonpeas': 'Pulses', 'mothbeans': 'Pulses',
+    'mungbean': 'Pulses', 'blackgram': 'Pulses', 'lentil': 'Pulses',
+}
+# Grid points per crop sweep, and variables swept at once
+CROP_SWEEP_MAX_POINTS = int(os.getenv("CROP_SWEEP_MAX_POINTS", "10000"))
+CROP_SWEEP_MAX_AXES = 3
 
 def _lazy_crop():
-    global _crop_model
-    if _crop_model is None:
-        _crop_model = load(os.path.join(MODELS_DIR, "crop_model.joblib"))
-    return _crop_model
+    return registry.get("crop")
 
 def _lazy_fert():
-    global _fert_model, _fert_columns
-    if _fert_model is None:
-        _fert_model = load(os.path.join(MODELS_DIR, "fertilizer_model.joblib"))
-        _fert_columns = load(os.path.join(MODELS_DIR, "fertilizer_model_columns.joblib"))
-    return _fert_model, _fert_columns
+    return registry.get("fertilizer")
 
 def _lazy_disease():
-    global _dis_model, _dis_labels
-    if _dis_model is None:
-        _dis_model = tf.keras.models.load_model(os.path.join(MODELS_DIR, "disease_model.h5"))
-        _dis_labels = ['Healthy', 'Powdery Mildew', 'Rust Disease']
-    return _dis_model, _dis_labels
+    return registry.get("disease")
 
 def predict_crop(features: dict) -> dict:
-    model = _lazy_crop()
+    # One version for the whole request, even if a swap happens meanwhile
+    served = _lazy_crop()
+    model = served.model
     import pandas as pd
-    df = pd.DataFrame([features])
-    pred = model.predict(df)[0]
+    with stage_timer("crop.dataframe"):
+        df = pd.DataFrame([features])
+    with stage_timer("crop.predict"):
+        pred = model.predict(df)[0]
     
     # Try to get confidence if available
     conf = None
     try:
         if hasattr(model, 'predict_proba'):
-            proba = model.predict_proba(df)[0]
+            with stage_timer("crop.predict_proba"):
+                proba = model.predict_proba(df)[0]
             idx = list(model.classes_).index(pred)
             conf = float(proba[idx])
     except:
         pass
     
-    return {"crop": str(pred), "confidence": conf}
+    return {"crop": str(pred), "confidence": conf, "model_version": served.version}
 
-def predict_fertilizer(features: dict) -> dict:
-    model, columns = _lazy_fert()
+def sweep_crop(base: dict, axes: list, min_probability: float = 0.01) -> dict:
+    """Crop probabilities over a grid of what-if values around one sample.
+
+    axes: [(variable, values), ...] for up to CROP_SWEEP_MAX_AXES variables;
+    the other features keep their value from base. The whole grid is
+    scored in one predict_proba call. Each crop's probabilities come back
+    as a nested list shaped like the grid, for crops that reach
+    min_probability somewhere on it.
+    """
+    if not axes or len(axes) > CROP_SWEEP_MAX_AXES:
+        raise ValueError(f"Sweep 1 to {CROP_SWEEP_MAX_AXES} variables")
+    names = [name for name, _ in axes]
+    unknown = [name for name in names if name not in CROP_FEATURES]
+    if unknown or len(set(names)) != len(names):
+        raise ValueError(f"Sweep variables must be distinct names from {CROP_FEATURES}")
+    shape = [len(values) for _, values in axes]
+    points = int(np.prod(shape))
+    if not points or points > CROP_SWEEP_MAX_POINTS:
+        raise ValueError(f"Grid has {points} points; 1 to {CROP_SWEEP_MAX_POINTS} are allowed")
+
+    served = _lazy_crop()
+    model = served.model
     import pandas as pd
-    
+    with stage_timer("crop.sweep_grid"):
+        grid = np.empty((points, len(CROP_FEATURES)))
+        grid[:] = [base[name] for name in CROP_FEATURES]
+        # First axis varies slowest, so row i is grid index np.unravel_index(i, shape)
+        mesh = np.meshgrid(*[np.asarray(values, dtype=float) for _, values in axes], indexing="ij")
+        for name, values in zip(names, mesh):
+            grid[:, CROP_FEATURES.index(name)] = values.ravel()
+        df = pd.DataFrame(grid, columns=CROP_FEATURES)
+    with stage_timer("crop.sweep_predict"):
+        proba = model.predict_proba(df)
+
+    classes = [str(c) for c in model.classes_]
+    best = proba.argmax(axis=1)
+    keep = np.flatnonzero(proba.max(axis=0) >= min_probability)
+    return {
+        "axes": [{"variable": name, "values": [float(v) for v in values]} for name, values in axes],
+        "shape": shape,
+        "points": points,
+        # Per grid point, an index into crops
+        "crops": classes,
+        "top_crop": best.reshape(shape).tolist(),
+        "probabilities": {classes[j]: np.round(proba[:, j], 4).reshape(shape).tolist() for j in keep},
+        "model_version": served.version,
+    }
+
+def _fertilizer_row(features: dict) -> dict:
     # Map input features to model's expected format
     mapped_data = {
         'Temparature': features['temperature'],
@@ -67,32 +119,89 @@ def predict_fertilizer(features: dict) -> dict:
     }
     
     # One-hot encode soil type
-    soil_types = ['Clayey', 'Loamy', 'Red', 'Sandy']
-    for soil in soil_types:
+    for soil in FERT_SOIL_TYPES:
         mapped_data[f'Soil Type_{soil}'] = 1 if features['soil_type'] == soil else 0
     
     # One-hot encode crop type
-    crop_types = ['Cotton', 'Ground Nuts', 'Maize', 'Millets', 'Oil seeds', 'Paddy', 'Pulses', 'Sugarcane', 'Tobacco', 'Wheat']
-    for crop in crop_types:
+    for crop in FERT_CROP_TYPES:
         mapped_data[f'Crop Type_{crop}'] = 1 if features['crop_type'] == crop else 0
+    return mapped_data
+
+def predict_fertilizer(features: dict) -> dict:
+    served = _lazy_fert()
+    model, columns = served.model, served.columns
+    import pandas as pd
     
     # Create dataframe and reorder columns
-    df = pd.DataFrame([mapped_data])
-    df = df.reindex(columns=columns, fill_value=0)
-    
-    pred = model.predict(df)[0]
-    return {"fertilizer": str(pred)}
-
-def predict_disease(image_bytes: bytes) -> dict:
-    model, labels = _lazy_disease()
-    img = Image.open(io.BytesIO(image_bytes)).convert("RGB").resize((224,224))
-    arr = np.array(img) / 255.0  # Normalize to [0,1]
-    arr = arr[None, ...]  # Add batch dimension
-    probs = model.predict(arr, verbose=0)[0]
-    idx = int(np.argmax(probs))
-    confidence = float(probs[idx])
-    disease = labels[idx]
+    with stage_timer("fertilizer.dataframe"):
+        df = pd.DataFrame([_fertilizer_row(features)])
+        df = df.reindex(columns=columns, fill_value=0)
     
+    with stage_timer("fertilizer.predict"):
+        pred = model.predict(df)[0]
+    return {"fertilizer": str(pred), "model_version": served.version}
+
+def soil_report(features: dict, top_k: int = 3) -> dict:
+    """Top-k crops for a soil-health card, each with a fertilizer recommendation.
+
+    features: the crop features plus moisture and soil_type. The crop model
+    runs once; the fertilizer model then runs once, on one row per crop type
+    (CROP_TO_FERTILIZER_CROP_TYPE) among the top crops.
+    Crops without one get fertilizer None.
+    """
+    crop_served, fert_served = _lazy_crop(), _lazy_fert()
+    import pandas as pd
+    with stage_timer("soil_report.crop"):
+        row = pd.DataFrame([[features[name] for name in CROP_FEATURES]], columns=CROP_FEATURES)
+        proba = crop_served.model.predict_proba(row)[0]
+    classes = crop_served.model.classes_
+    top = np.argsort(proba)[::-1][:top_k]
+    crops = [{
+        "crop": str(classes[i]),
+        "confidence": float(proba[i]),
+        "fertilizer_crop_type": CROP_TO_FERTILIZER_CROP_TYPE.get(str(classes[i])),
+        "fertilizer": None,
+    } for i in top]
+
+    # Several top crops often share a crop type (the pulses); each type is scored once
+    crop_types = list(dict.fromkeys(c["fertilizer_crop_type"] for c in crops if c["fertilizer_crop_type"]))
+    if crop_types:
+        with stage_timer("soil_report.fertilizer"):
+            rows = [_fertilizer_row(dict(features, crop_type=crop_type)) for crop_type in crop_types]
+            df = pd.DataFrame(rows).reindex(columns=fert_served.columns, fill_value=0)
+            fertilizers = dict(zip(crop_types, fert_served.model.predict(df)))
+        for c in crops:
+            if c["fertilizer_crop_type"]:
+                c["fertilizer"] = str(fertilizers[c["fertilizer_crop_type"]])
+    return {
+        "crops": crops,
+        "model_versions": {"crop": crop_served.version, "fertilizer": fert_served.version},
+    }
+
+class ImageTooLarge(ValueError):
+    pass
+
+def open_image(image) -> Image.Image:
+    """Open image bytes or a binary file without decoding it; refuses more than DISEASE_MAX_PIXELS"""
+    img = Image.open(image if hasattr(image, "read") else io.BytesIO(image))
+    width, height = img.size
+    if width * height > DISEASE_MAX_PIXELS:
+        raise ImageTooLarge(f"Image is {width}x{height}; at most {DISEASE_MAX_PIXELS} pixels are accepted")
+    return img
+
+def _decode_image(image) -> np.ndarray:
+    with stage_timer("disease.decode"):
+        img = open_image(image)
+        # JPEGs decode straight at 1/2..1/8 scale (still at least 2x the model
+        # input) instead of materialising every pixel of a phone photo
+        img.draft("RGB", (448, 448))
+        img = img.convert("RGB").resize((224,224))
+        return np.array(img) / 255.0  # Normalize to [0,1]
+
+def _load_and_decode(image) -> np.ndarray:
+    return _decode_image(image() if callable(image) else image)
+
+def _disease_result(disease: str, confidence: float, version: str) -> dict:
     # 7-class severity mapping based on confidence
     if disease == 'Healthy':
         final_class = 'Healthy'
@@ -107,5 +216,88 @@ def predict_disease(image_bytes: bytes) -> dict:
         "disease": final_class,
         "base_disease": disease,
         "confidence": confidence,
-        "severity": "None" if disease == 'Healthy' else final_class.split(' - ')[1]
+        "severity": "None" if disease == 'Healthy' else final_class.split(' - ')[1],
+        "model_version": version
+    }
+
+def predict_disease(image) -> dict:
+    """image: the encoded image as bytes or a binary file object"""
+    served = _lazy_disease()
+    arr = _decode_image(image)[None, ...]  # Add batch dimension
+    with stage_timer("disease.predict"):
+        probs = served.model.predict(arr, verbose=0)[0]
+    idx = int(np.argmax(probs))
+    return _disease_result(served.labels[idx], float(probs[idx]), served.version)
+
+def _predict_disease_arrays(served, arrays):
+    with stage_timer("disease.predict_batch"):
+        probs = served.model.predict(np.stack(arrays), verbose=0)
+    idx = np.argmax(probs, axis=1)
+    return [_disease_result(served.labels[i], float(p[i]), served.version) for i, p in zip(idx, probs)]
+
+def predict_disease_batch(images, batch_size: int = DISEASE_BATCH_SIZE):
+    """Yield (index, result) for each image (bytes or binary file) in an iterable, one model batch at a time.
+
+    An item may also be a zero-argument callable returning the image; it is
+    called on the decode thread pool, so reading (e.g. a zip member) runs in
+    parallel and its errors are reported like decode errors. Images are
+    decoded while the previous batch runs. An image that cannot be read or
+    decoded yields (index, exception) and is skipped.
+    Every image of one call is served by the same model version.
+    """
+    served = _lazy_disease()
+    images = enumerate(images)
+    with ThreadPoolExecutor(DISEASE_DECODE_WORKERS) as pool:
+        # Keep up to two batches of decodes in flight ahead of the model
+        pending = deque()
+        def fill():
+            while len(pending) < 2 * batch_size:
+                item = next(images, None)
+                if item is None:
+                    return
+                pending.append((item[0], pool.submit(_load_and_decode, item[1])))
+
+        fill()
+        indices, arrays = [], []
+        while pending:
+            index, future = pending.popleft()
+            fill()
+            try:
+                arrays.append(future.result())
+            except Exception as e:
+                yield index, e
+                continue
+            indices.append(index)
+            if len(arrays) == batch_size:
+                yield from zip(indices, _predict_disease_arrays(served, arrays))
+                indices, arrays = [], []
+        if arrays:
+            yield from zip(indices, _predict_disease_arrays(served, arrays))
+
+def summarize_severity(results) -> dict:
+    """Field-level summary of per-image disease results (Early/Moderate/Severe as in predict_disease)"""
+    severity_counts = {level: 0 for level in SEVERITY_LEVELS}
+    disease_counts = {}
+    for result in results:
+        severity_counts[result["severity"]] += 1
+        if result["base_disease"] != 'Healthy':
+            disease_counts[result["base_disease"]] = disease_counts.get(result["base_disease"], 0) + 1
+    images = sum(severity_counts.values())
+    diseased = images - severity_counts["None"]
+    
+    # Most common level among diseased images, the worse one on a tie
+    field_severity = "None"
+    if diseased:
+        field_severity = max(SEVERITY_LEVELS[1:], key=lambda level: (severity_counts[level], SEVERITY_LEVELS.index(level)))
+    # 0 = all healthy, 1 = every image Severe
+    weighted = sum(SEVERITY_LEVELS.index(level) * n for level, n in severity_counts.items())
+    return {
+        "images": images,
+        "diseased": diseased,
+        "diseased_fraction": diseased / images if images else 0.0,
+        "severity_counts": severity_counts,
+        "disease_counts": disease_counts,
+        "dominant_disease": max(disease_counts, key=disease_counts.get) if disease_counts else None,
+        "field_severity": field_severity,
+        "severity_index": weighted / (3 * images) if images else 0.0,
     }
@@ -0,0 +1,375 @@
+"""Versioned model registry with hot-swap and rollback.
+
+Each model (crop, fertilizer, disease) has versions under MODEL_REGISTRY_DIR:
+
+    model_registry/crop/v3/crop_model.joblib
+    model_registry/crop/v3/metadata.json     labels, feature columns, metrics, sha256 per file
+    model_registry/crop/current.json         {"version": "v3", "previous": "v2"}
+
+A worker loads the current version on first use. activate() loads another
+version, checks its checksums, runs a warmup prediction and only then
+replaces the served reference in one assignment, so a request sees either
+the old model or the warmed-up new one, never a half-loaded one. The
+replaced version stays in memory, which makes rollback() instant. Other
+workers notice the new current.json within MODEL_REGISTRY_POLL seconds and
+swap the same way in a background thread, serving the old version until
+then. A version that fails to load there is not retried until current.json
+changes again.
+
+Models with no current.json are served from the flat MODELS_DIR files as
+version "legacy", as before the registry existed.
+
+    python -m src.inference.registry import-legacy          # MODELS_DIR -> v1 of each model
+    python -m src.inference.registry publish crop out/crop_model.joblib --metrics '{"accuracy": 0.99}' --activate
+    python -m src.inference.registry list crop
+    python -m src.inference.registry rollback crop
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+from joblib import load
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+import metrics
+from metrics import stage_timer
+
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "model_registry")
+MODELS_DIR = os.getenv("MODELS_DIR", "new model")
+# How often a worker checks current.json for a version activated elsewhere; 0 disables
+MODEL_REGISTRY_POLL = float(os.getenv("MODEL_REGISTRY_POLL", "5"))
+LEGACY_VERSION = "legacy"
+
+# Files of each model in MODELS_DIR; the first one is the model itself
+LEGACY_FILES = {
+    "crop": ["crop_model.joblib"],
+    "fertilizer": ["fertilizer_model.joblib", "fertilizer_model_columns.joblib"],
+    "disease": ["disease_model.h5"],
+}
+LEGACY_DISEASE_LABELS = ['Healthy', 'Powdery Mildew', 'Rust Disease']
+DISEASE_INPUT_SIZE = (224, 224)
+
+model_swaps = metrics.counter("model_swaps_total", "Model version changes in this worker", ["model", "outcome"])
+
+
+class RegistryError(Exception):
+    pass
+
+
+class ServedModel:
+    """One loaded, warmed-up model version; never changed after it starts serving"""
+    __slots__ = ("name", "version", "model", "labels", "columns", "metadata", "loaded_at")
+
+    def __init__(self, name, version, model, labels=None, columns=None, metadata=None):
+        self.name = name
+        self.version = version
+        self.model = model
+        self.labels = labels
+        self.columns = columns
+        self.metadata = metadata or {}
+        self.loaded_at = time.time()
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _load_model(name, directory, metadata):
+    path = os.path.join(directory, metadata["artifact"])
+    if name == "disease":
+        # Imported here so crop/fertilizer-only processes skip TensorFlow's startup cost
+        import tensorflow as tf
+        return ServedModel(name, metadata["version"], tf.keras.models.load_model(path),
+                           labels=metadata.get("labels") or LEGACY_DISEASE_LABELS, metadata=metadata)
+    model = load(path)
+    labels = metadata.get("labels") or [str(c) for c in getattr(model, "classes_", [])]
+    columns = metadata.get("feature_columns")
+    if columns is None and name == "fertilizer":
+        columns = list(load(os.path.join(directory, "fertilizer_model_columns.joblib")))
+    if columns is None:
+        columns = [str(c) for c in getattr(model, "feature_names_in_", [])]
+    return ServedModel(name, metadata["version"], model, labels=labels, columns=columns, metadata=metadata)
+
+
+def warmup(served):
+    """One prediction on a dummy input, so the first request does not pay for lazy initialisation"""
+    if served.name == "disease":
+        height, width = served.metadata.get("input_size", DISEASE_INPUT_SIZE)
+        served.model.predict(np.zeros((1, height, width, 3), dtype=np.float32), verbose=0)
+        return
+    import pandas as pd
+    row = pd.DataFrame([[0.0] * len(served.columns)], columns=served.columns)
+    model = served.model
+    model.predict_proba(row) if hasattr(model, "predict_proba") else model.predict(row)
+
+
+class ModelRegistry:
+    def __init__(self, root=MODEL_REGISTRY_DIR, models_dir=MODELS_DIR, poll=MODEL_REGISTRY_POLL):
+        self.root = root
+        self.models_dir = models_dir
+        self.poll = poll
+        self._active = {}
+        self._previous = {}
+        self._locks = defaultdict(threading.Lock)
+        self._checked = {}
+        self._following = set()
+        # current.json contents whose version failed to load; not retried until the file changes
+        self._failed = {}
+
+    # Layout on disk
+
+    def _pointer_path(self, name):
+        return os.path.join(self.root, name, "current.json")
+
+    def pointer(self, name):
+        """{"version": ..., "previous": ...} from current.json, or the legacy version"""
+        try:
+            with open(self._pointer_path(name)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"version": LEGACY_VERSION, "previous": None}
+
+    def _write_pointer(self, name, version, previous):
+        fd, tmp = tempfile.mkstemp(dir=os.path.join(self.root, name), suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"version": version, "previous": previous, "activated": time.time()}, f)
+        os.replace(tmp, self._pointer_path(name))
+
+    def metadata(self, name, version):
+        if version == LEGACY_VERSION:
+            return {"name": name, "version": LEGACY_VERSION, "artifact": LEGACY_FILES[name][0]}
+        try:
+            with open(os.path.join(self.root, name, version, "metadata.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise RegistryError(f"{name} has no version {version}")
+
+    def versions(self, name):
+        """Metadata of every published version, oldest first"""
+        directory = os.path.join(self.root, name)
+        if not os.path.isdir(directory):
+            return []
+        found = [self.metadata(name, v) for v in os.listdir(directory)
+                 if os.path.isfile(os.path.join(directory, v, "metadata.json"))]
+        return sorted(found, key=lambda m: m.get("created", 0))
+
+    def publish(self, name, files, version=None, labels=None, feature_columns=None, train_metrics=None, extra=None):
+        """Copy artifact files (the model first) into a new version; returns its metadata"""
+        if name not in LEGACY_FILES:
+            raise RegistryError(f"Unknown model {name}")
+        if version is None:
+            numbers = [int(m["version"][1:]) for m in self.versions(name) if m["version"][1:].isdigit()]
+            version = f"v{max(numbers, default=0) + 1}"
+        final = os.path.join(self.root, name, version)
+        if os.path.exists(final):
+            raise RegistryError(f"{name} {version} already exists")
+        os.makedirs(os.path.join(self.root, name), exist_ok=True)
+        # Built next to its final place and renamed, so a version is complete or absent
+        staging = tempfile.mkdtemp(dir=os.path.join(self.root, name), prefix=f".{version}-")
+        checksums = {}
+        for path in files:
+            target = os.path.join(staging, os.path.basename(path))
+            shutil.copy2(path, target)
+            checksums[os.path.basename(path)] = sha256_file(target)
+        metadata = {
+            "name": name,
+            "version": version,
+            "created": time.time(),
+            "artifact": os.path.basename(files[0]),
+            "files": checksums,
+            "labels": labels,
+            "feature_columns": feature_columns,
+            "metrics": train_metrics or {},
+        }
+        metadata.update(extra or {})
+        with open(os.path.join(staging, "metadata.json"), "w") as f:
+            json.dump(metadata, f, indent=2)
+        os.rename(staging, final)
+        return metadata
+
+    # Serving
+
+    def load(self, name, version):
+        """Load, verify and warm up a version without serving it"""
+        metadata = self.metadata(name, version)
+        if version == LEGACY_VERSION:
+            directory = self.models_dir
+        else:
+            directory = os.path.join(self.root, name, version)
+            for filename, expected in metadata.get("files", {}).items():
+                if sha256_file(os.path.join(directory, filename)) != expected:
+                    raise RegistryError(f"{name} {version}: checksum mismatch for {filename}")
+        with stage_timer(f"{name}.model_load"):
+            served = _load_model(name, directory, metadata)
+        with stage_timer(f"{name}.warmup"):
+            warmup(served)
+        return served
+
+    def install(self, name, model, version="local", labels=None, columns=None):
+        """Serve an in-memory model (benchmarks, tests) without touching the registry directory"""
+        served = ServedModel(name, version, model, labels=labels, columns=columns)
+        self._previous[name], self._active[name] = self._active.get(name), served
+        self._checked[name] = float("inf")
+        return served
+
+    def get(self, name):
+        """The version to serve this request with; read once and used for the whole request"""
+        served = self._active.get(name)
+        if served is None:
+            with self._locks[name]:
+                served = self._active.get(name)
+                if served is None:
+                    served = self.load(name, self.pointer(name)["version"])
+                    self._active[name] = served
+                    self._checked[name] = time.monotonic()
+            return served
+        if self.poll > 0 and time.monotonic() - self._checked.get(name, 0) >= self.poll:
+            self._follow(name)
+        return served
+
+    def _follow(self, name):
+        """Start swapping to a version activated by another worker, without blocking the request"""
+        self._checked[name] = time.monotonic()
+        pointer = self.pointer(name)
+        version = pointer["version"]
+        if version == self._active[name].version or name in self._following or self._failed.get(name) == pointer:
+            return
+        self._following.add(name)
+
+        def run():
+            try:
+                self.swap(name, version)
+                self._failed.pop(name, None)
+            except Exception:
+                self._failed[name] = pointer
+                model_swaps.inc(model=name, outcome="failed")
+                logging.exception(f"Could not switch {name} to {version}; still serving "
+                                  f"{self._active[name].version} until current.json changes")
+            finally:
+                self._following.discard(name)
+
+        threading.Thread(target=run, name=f"model-swap-{name}", daemon=True).start()
+
+    def swap(self, name, version):
+        """Serve `version` in this worker; the replaced version is kept for rollback"""
+        with self._locks[name]:
+            current = self._active.get(name)
+            if current is not None and current.version == version:
+                return current
+            previous = self._previous.get(name)
+            if previous is not None and previous.version == version:
+                served, outcome = previous, "rollback"
+            else:
+                served, outcome = self.load(name, version), "swapped"
+            # The only write readers can observe
+            self._active[name] = served
+            self._previous[name] = current
+            model_swaps.inc(model=name, outcome=outcome)
+            return served
+
+    def activate(self, name, version):
+        """Swap this worker to `version`, then point every other worker at it"""
+        previous = self.pointer(name)["version"]
+        served = self.swap(name, version)
+        if previous != version:
+            self._write_pointer(name, version, previous)
+        return served
+
+    def rollback(self, name):
+        """Back to the version served before the current one"""
+        target = self.pointer(name).get("previous")
+        if not target:
+            previous = self._previous.get(name)
+            target = previous.version if previous is not None else None
+        if not target:
+            raise RegistryError(f"{name} has no previous version to roll back to")
+        return self.activate(name, target)
+
+    def status(self):
+        out = {}
+        for name in LEGACY_FILES:
+            served, previous = self._active.get(name), self._previous.get(name)
+            out[name] = {
+                "serving": served.version if served else None,
+                "kept_for_rollback": previous.version if previous else None,
+                "current": self.pointer(name),
+                "metrics": served.metadata.get("metrics", {}) if served else {},
+            }
+        return out
+
+
+registry = ModelRegistry()
+
+
+def import_legacy(reg, models_dir):
+    """Publish and activate the flat MODELS_DIR artifacts as the first registry version"""
+    for name, files in LEGACY_FILES.items():
+        paths = [os.path.join(models_dir, f) for f in files]
+        if not all(os.path.exists(p) for p in paths):
+            print(f"  {name}: not in {models_dir}, skipped")
+            continue
+        labels = LEGACY_DISEASE_LABELS if name == "disease" else None
+        columns = list(load(paths[1])) if name == "fertilizer" else None
+        metadata = reg.publish(name, paths, labels=labels, feature_columns=columns,
+                               extra={"source": os.path.abspath(models_dir)})
+        reg.activate(name, metadata["version"])
+        print(f"  {name}: {metadata['version']} active")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Publish, list, activate and roll back model versions")
+    sub = ap.add_subparsers(dest="command", required=True)
+    sub.add_parser("import-legacy", help=f"publish the files in MODELS_DIR ({MODELS_DIR}) as new versions")
+    publish = sub.add_parser("publish", help="publish artifact files (the model first) as a new version")
+    publish.add_argument("model", choices=sorted(LEGACY_FILES))
+    publish.add_argument("files", nargs="+")
+    publish.add_argument("--version")
+    publish.add_argument("--labels", help="comma-separated class labels (disease)")
+    publish.add_argument("--metrics", default="{}", help="training metrics as JSON")
+    publish.add_argument("--activate", action="store_true")
+    for command in ("list", "activate", "rollback"):
+        p = sub.add_parser(command)
+        p.add_argument("model", choices=sorted(LEGACY_FILES))
+        if command == "activate":
+            p.add_argument("version")
+    args = ap.parse_args()
+
+    if args.command == "import-legacy":
+        import_legacy(registry, MODELS_DIR)
+    elif args.command == "publish":
+        labels = args.labels.split(",") if args.labels else None
+        columns = list(load(args.files[1])) if args.model == "fertilizer" and len(args.files) > 1 else None
+        metadata = registry.publish(args.model, args.files, version=args.version, labels=labels,
+                                    feature_columns=columns, train_metrics=json.loads(args.metrics))
+        print(f"published {args.model} {metadata['version']}")
+        if args.activate:
+            registry.activate(args.model, metadata["version"])
+            print(f"activated {args.model} {metadata['version']}")
+    elif args.command == "list":
+        current = registry.pointer(args.model)["version"]
+        for m in registry.versions(args.model):
+            marker = "*" if m["version"] == current else " "
+            created = time.strftime("%Y-%m-%d %H:%M", time.localtime(m["created"]))
+            print(f"{marker} {m['version']:8s} {created}  {m['artifact']}  {json.dumps(m.get('metrics', {}))}")
+    elif args.command == "activate":
+        registry.activate(args.model, args.version)
+        print(f"activated {args.model} {args.version}")
+    elif args.command == "rollback":
+        print(f"rolled back {args.model} to {registry.rollback(args.model).version}")
+
+
+if __name__ == "__main__":
+    main()
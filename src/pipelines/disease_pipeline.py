@@ -1,3 +1,5 @@
+import hashlib
+import json
 import os
 import tensorflow as tf
 
@@ -24,6 +26,59 @@ def make_datasets(data_dir: str, img_size: int, batch_size: int, seed: int):
     val_ds = val_ds.cache().prefetch(buffer_size=autotune)
     return train_ds, val_ds, class_names
 
+def _record_split(records_dir: str, manifest: dict, split: str, batch_size: int, cache_dir: str, seed: int):
+    height, width = manifest["img_size"]
+    files = [os.path.join(records_dir, shard["file"]) for shard in manifest["splits"][split]["shards"]]
+    training = split == "train"
+    autotune = tf.data.AUTOTUNE
+
+    def parse(record):
+        example = tf.io.parse_single_example(record, {
+            "image": tf.io.FixedLenFeature([], tf.string),
+            "label": tf.io.FixedLenFeature([], tf.int64),
+        })
+        image = tf.reshape(tf.io.decode_raw(example["image"], tf.uint8), (height, width, 3))
+        return image, example["label"]
+
+    # uint8 pixels go to one cache file per shard after the first epoch instead of RAM;
+    # caching shards rather than the interleaved stream lets the shard order change every epoch
+    caches = [os.path.join(cache_dir, f"{split}-{index:05d}") for index in range(len(files))]
+
+    def read_shard(path, cache_path):
+        return tf.data.TFRecordDataset(path).map(parse, num_parallel_calls=autotune).cache(cache_path)
+
+    ds = tf.data.Dataset.from_tensor_slices((files, caches))
+    if training:
+        ds = ds.shuffle(len(files), seed=seed)
+    # Read several shards at once; order within an epoch does not matter for training
+    ds = ds.interleave(read_shard, cycle_length=min(len(files), 8),
+                       num_parallel_calls=autotune, deterministic=not training)
+    if training:
+        ds = ds.shuffle(1000, seed=seed)
+    ds = ds.batch(batch_size)
+    # float32 0..255, as image_dataset_from_directory yields
+    ds = ds.map(lambda images, labels: (tf.cast(images, tf.float32), labels), num_parallel_calls=autotune)
+    return ds.prefetch(autotune)
+
+def make_record_datasets(records_dir: str, batch_size: int, seed: int, cache_dir: str = None, expected_size=None):
+    """Train/validation datasets from build_disease_records shards, same batches as make_datasets"""
+    with open(os.path.join(records_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+    if expected_size is not None and tuple(manifest["img_size"]) != tuple(expected_size):
+        raise ValueError(f"Records in {records_dir} are {manifest['img_size']}, not {list(expected_size)}; rebuild them")
+    # Keyed on the manifest, so records rebuilt in place never read pixels cached from an older build
+    key = hashlib.sha1(json.dumps(manifest, sort_keys=True).encode()).hexdigest()[:12]
+    cache_dir = os.path.join(cache_dir or os.path.join(records_dir, "cache"), key)
+    os.makedirs(cache_dir, exist_ok=True)
+    # A run interrupted while writing the cache leaves lockfiles behind that make the next one
+    # fail, and half-written temp files that are never read
+    for name in os.listdir(cache_dir):
+        if name.endswith(".lockfile") or ".tempstate" in name:
+            os.remove(os.path.join(cache_dir, name))
+    train_ds = _record_split(records_dir, manifest, "train", batch_size, cache_dir, seed)
+    val_ds = _record_split(records_dir, manifest, "validation", batch_size, cache_dir, seed)
+    return train_ds, val_ds, manifest["class_names"]
+
 def build_model(img_size: int, num_classes: int, base_trainable_layers: int):
     base = tf.keras.applications.MobileNetV2(
         input_shape=img_size + (3,), # <--- Unpack the tuple and add channels
@@ -0,0 +1,139 @@
+"""Decode the disease image tree once into sharded TFRecord files.
+
+image_dataset_from_directory re-scans the tree for every split, decodes and
+resizes every JPEG again each run, and make_datasets then keeps the whole
+result in RAM with .cache(). This stage does the decode and resize once:
+each image is stored as raw uint8 pixels at the model's input size, in
+shards of --shard-size images, with a manifest.json listing the classes,
+the image size and the shards of the train and validation splits.
+make_record_datasets (src/pipelines/disease_pipeline.py) reads them back.
+
+    python -m src.training.build_disease_records --out data/processed/disease_records
+    python -m src.training.train_disease --records data/processed/disease_records
+
+Either layout of the data dir works: Train/ and Validation/ class folders
+(as train_disease expects), or class folders directly, split 80/20 with
+the config seed like make_datasets' validation_split.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import yaml
+from PIL import Image
+
+# Same extensions image_dataset_from_directory picks up
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".gif")
+VALIDATION_SPLIT = 0.2
+
+
+def load_config():
+    with open("config.yaml", "r") as f:
+        return yaml.safe_load(f)
+
+
+def list_images(class_root):
+    """(path, class name) for every image under class_root/<class>/, classes in sorted order"""
+    class_names = sorted(d for d in os.listdir(class_root) if os.path.isdir(os.path.join(class_root, d)))
+    files = []
+    for name in class_names:
+        for dirpath, _, filenames in os.walk(os.path.join(class_root, name)):
+            files.extend((os.path.join(dirpath, f), name) for f in sorted(filenames)
+                         if f.lower().endswith(IMAGE_EXTENSIONS))
+    return files, class_names
+
+
+def split_files(data_dir, seed):
+    """{"train": [...], "validation": [...]} and the class names"""
+    train_dir, val_dir = os.path.join(data_dir, "Train"), os.path.join(data_dir, "Validation")
+    if os.path.isdir(train_dir) and os.path.isdir(val_dir):
+        train, class_names = list_images(train_dir)
+        validation, _ = list_images(val_dir)
+    else:
+        files, class_names = list_images(data_dir)
+        random.Random(seed).shuffle(files)
+        n_val = int(len(files) * VALIDATION_SPLIT)
+        train, validation = files[n_val:], files[:n_val]
+    # Shards mix classes, so interleaving a few of them gives well-shuffled batches
+    random.Random(seed).shuffle(train)
+    return {"train": train, "validation": validation}, class_names
+
+
+def decode(path, img_size):
+    img = Image.open(path)
+    # JPEGs decode straight at a reduced scale that is still at least twice the target
+    img.draft("RGB", (2 * img_size[1], 2 * img_size[0]))
+    img = img.convert("RGB").resize((img_size[1], img_size[0]), Image.BILINEAR)
+    return np.asarray(img, dtype=np.uint8)
+
+
+def write_split(tf, files, class_index, out_dir, split, img_size, shard_size, workers):
+    shards = []
+    with ThreadPoolExecutor(workers) as pool:
+        for start in range(0, len(files), shard_size):
+            chunk = files[start:start + shard_size]
+            name = f"{split}-{len(shards):05d}.tfrecord"
+            with tf.io.TFRecordWriter(os.path.join(out_dir, name)) as writer:
+                for (_, label), pixels in zip(chunk, pool.map(lambda f: decode(f[0], img_size), chunk)):
+                    example = tf.train.Example(features=tf.train.Features(feature={
+                        "image": tf.train.Feature(bytes_list=tf.train.BytesList(value=[pixels.tobytes()])),
+                        "label": tf.train.Feature(int64_list=tf.train.Int64List(value=[class_index[label]])),
+                    }))
+                    writer.write(example.SerializeToString())
+            shards.append({"file": name, "count": len(chunk)})
+            print(f"  {name}: {start + len(chunk)}/{len(files)}")
+    return {"count": len(files), "shards": shards}
+
+
+def build_records(data_dir, out_dir, img_size, seed, shard_size=1024, workers=None):
+    """Write the shards and manifest.json to out_dir; returns the manifest"""
+    # Only needed here for TFRecordWriter; decoding is done with PIL
+    import tensorflow as tf
+
+    splits, class_names = split_files(data_dir, seed)
+    class_index = {name: i for i, name in enumerate(class_names)}
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(out_dir, exist_ok=True)
+    # make_record_datasets' default file cache holds pixels of the previous build
+    shutil.rmtree(os.path.join(out_dir, "cache"), ignore_errors=True)
+    manifest = {
+        "source": os.path.abspath(data_dir),
+        "class_names": class_names,
+        "img_size": list(img_size),
+        "seed": seed,
+        # Changes the manifest (and so the cache key) even when the same files are rebuilt
+        "built_at": time.time(),
+        "splits": {},
+    }
+    for split, files in splits.items():
+        manifest["splits"][split] = write_split(tf, files, class_index, out_dir, split, img_size, shard_size, workers)
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Decode disease images once into TFRecord shards")
+    ap.add_argument("--data-dir", default=None, help="image tree (default: config disease.data_dir)")
+    ap.add_argument("--out", default="data/processed/disease_records")
+    ap.add_argument("--shard-size", type=int, default=1024, help="images per shard (~150 MB at 224x224)")
+    ap.add_argument("--workers", type=int, default=None, help="decode threads (default: all cores)")
+    args = ap.parse_args()
+
+    cfg = load_config()
+    data_dir = args.data_dir or cfg["disease"]["data_dir"]
+    start = time.perf_counter()
+    manifest = build_records(data_dir, args.out, tuple(cfg["disease"]["img_size"]), cfg["seed"],
+                             args.shard_size, args.workers)
+    counts = {split: info["count"] for split, info in manifest["splits"].items()}
+    print(f"Wrote {counts} images of {len(manifest['class_names'])} classes to {args.out} "
+          f"in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""Compact the crop / fertilizer random forests for serving.
+
+Builds smaller candidates from a reference forest and reports accuracy
+against single-row latency, batch throughput and artifact size on the
+held-out split, marking the Pareto-optimal ones:
+
+  select   greedy forward selection of k trees from the reference forest,
+           scored on a validation split carved from the training data (the
+           default reference forest is fitted without it; a --teacher that
+           saw those rows makes the selection optimistic)
+  retrain  a new forest with fewer and/or shallower trees
+  distill  a small forest fitted to the reference forest's predictions on
+           the training rows plus jittered copies of them
+
+The fastest candidate within --max-accuracy-drop of the reference is written
+to --out under the serving file name (crop_model.joblib /
+fertilizer_model.joblib), next to copies of the other artifacts from
+--models-dir, so ``MODELS_DIR=<out>`` serves it through _lazy_crop/_lazy_fert.
+
+    python -m src.training.compact_forest --model crop
+    python -m src.training.compact_forest --model fertilizer --teacher "new model/fertilizer_model.joblib"
+
+Without the training CSV, --sample-from-teacher N labels N random points of
+the feature space that --teacher is confident about and compacts against
+those labels instead; accuracy then means agreement with the teacher.
+"""
+import argparse
+import copy
+import io
+import json
+import os
+import shutil
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+import yaml
+from joblib import dump, load
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import train_test_split
+
+CROP_FEATURES = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall"]
+# One-hot encoded by predict_fertilizer (and pd.get_dummies of the training CSV)
+FERT_CATEGORICAL = ["Soil Type", "Crop Type"]
+SERVING_FILES = {"crop": "crop_model.joblib", "fertilizer": "fertilizer_model.joblib"}
+
+# Value ranges of the public training data, used by --sample-from-teacher
+SAMPLE_RANGES = {
+    "crop": {"N": (0, 140), "P": (5, 145), "K": (5, 205), "temperature": (8, 44), "humidity": (14, 100),
+             "ph": (3.5, 10), "rainfall": (20, 300)},
+    "fertilizer": {"Temparature": (25, 38), "Humidity ": (50, 72), "Moisture": (25, 65), "Nitrogen": (4, 42),
+                   "Potassium": (0, 19), "Phosphorous": (0, 42)},
+}
+
+SELECT_SIZES = [5, 10, 20, 40]
+RETRAIN_GRID = [(20, 8), (20, 12), (50, 10), (50, None), (100, 12)]
+DISTILL_GRID = [(10, 10), (20, 12), (30, None)]
+DISTILL_COPIES = 5
+
+
+def load_config():
+    with open("config.yaml", "r") as f:
+        return yaml.safe_load(f)
+
+
+def serving_frame(model_name, df, target, columns=None):
+    """Training CSV -> the feature frame the API feeds the model, and the labels"""
+    y = df[target].astype(str)
+    if model_name == "crop":
+        return df[CROP_FEATURES], y
+    X = pd.get_dummies(df.drop(columns=[target]), columns=FERT_CATEGORICAL, dtype=int)
+    return (X.reindex(columns=columns, fill_value=0) if columns else X), y
+
+
+def _random_rows(model_name, columns, n, rng):
+    X = pd.DataFrame({col: rng.uniform(lo, hi, n).round(1) for col, (lo, hi) in SAMPLE_RANGES[model_name].items()})
+    if model_name == "fertilizer":
+        # One soil type and one crop type per row, as predict_fertilizer encodes them
+        for prefix in FERT_CATEGORICAL:
+            options = [c for c in columns if c.startswith(prefix + "_")]
+            picks = rng.integers(0, len(options), n)
+            for i, col in enumerate(options):
+                X[col] = (picks == i).astype(int)
+        X = X.reindex(columns=columns, fill_value=0)
+    return X
+
+
+def sample_from_teacher(model_name, teacher, columns, n, seed, min_confidence):
+    """About n random rows, balanced over the teacher's classes, that it labels with at least min_confidence.
+
+    Real soil samples sit in the regions the forest is sure about; uniform
+    points near class boundaries would make every compact model look bad.
+    """
+    rng = np.random.default_rng(seed)
+    per_class = max(2, n // len(teacher.classes_))
+    kept = {label: [] for label in teacher.classes_}
+    for _ in range(200):
+        X = _random_rows(model_name, columns, 4 * n, rng)
+        proba = teacher.predict_proba(X)
+        labels = teacher.classes_[proba.argmax(axis=1)]
+        confident = proba.max(axis=1) >= min_confidence
+        for label, rows in kept.items():
+            missing = per_class - sum(len(part) for part in rows)
+            if missing > 0:
+                rows.append(X[confident & (labels == label)].iloc[:missing])
+        if all(sum(len(part) for part in rows) >= per_class for rows in kept.values()):
+            break
+    X = pd.concat([part for rows in kept.values() for part in rows], ignore_index=True)
+    return X, pd.Series(teacher.predict(X).astype(str))
+
+
+def subforest(forest, indices):
+    sub = copy.copy(forest)
+    sub.estimators_ = [forest.estimators_[i] for i in indices]
+    sub.n_estimators = len(indices)
+    return sub
+
+
+def greedy_select(forest, X_val, y_val, sizes):
+    """Forward-select trees maximising validation accuracy of the averaged probabilities"""
+    classes = forest.classes_
+    target = np.searchsorted(classes, np.asarray(y_val))
+    X = np.asarray(X_val, dtype=np.float32)
+    probas = np.stack([tree.predict_proba(X) for tree in forest.estimators_])
+    chosen, total, out = [], np.zeros_like(probas[0]), {}
+    remaining = set(range(len(probas)))
+    for size in range(1, min(max(sizes), len(probas)) + 1):
+        best, best_key = None, None
+        for i in remaining:
+            combined = total + probas[i]
+            # Accuracy first, then the probability mass on the right class
+            key = ((combined.argmax(axis=1) == target).mean(), combined[np.arange(len(target)), target].sum())
+            if best_key is None or key > best_key:
+                best, best_key = i, key
+        chosen.append(best)
+        remaining.discard(best)
+        total += probas[best]
+        if size in sizes:
+            out[size] = list(chosen)
+    return out
+
+
+def distill(teacher, X_train, n_estimators, max_depth, seed):
+    rng = np.random.default_rng(seed)
+    numeric = [c for c in X_train.columns if X_train[c].nunique() > 2]
+    scale = X_train[numeric].std().values * 0.05
+    copies = [X_train]
+    for _ in range(DISTILL_COPIES):
+        jittered = X_train.copy()
+        jittered[numeric] = jittered[numeric].values + rng.normal(0, 1, (len(X_train), len(numeric))) * scale
+        copies.append(jittered)
+    X_aug = pd.concat(copies, ignore_index=True)
+    student = RandomForestClassifier(n_estimators=n_estimators, max_depth=max_depth, random_state=seed)
+    return student.fit(X_aug, teacher.predict(X_aug))
+
+
+def measure(model, X_test, y_test, teacher_pred, single_calls, batch_rows):
+    row = X_test.iloc[[0]]
+    single = []
+    for _ in range(single_calls):
+        # What predict_crop does per request: predict, then predict_proba
+        start = time.perf_counter()
+        model.predict(row)
+        model.predict_proba(row)
+        single.append(time.perf_counter() - start)
+    batch = pd.concat([X_test] * max(1, -(-batch_rows // len(X_test))), ignore_index=True).iloc[:batch_rows]
+    batch_s = min(_timed(model.predict_proba, batch) for _ in range(3))
+    buffer = io.BytesIO()
+    dump(model, buffer)
+    pred = model.predict(X_test)
+    return {
+        "accuracy": float((pred == np.asarray(y_test)).mean()),
+        "teacher_agreement": float((pred == teacher_pred).mean()),
+        "single_row_ms": statistics.median(single) * 1000,
+        "batch_rows_per_s": batch_rows / batch_s,
+        "size_kb": len(buffer.getvalue()) / 1024,
+        "trees": len(model.estimators_),
+        "nodes": int(sum(tree.tree_.node_count for tree in model.estimators_)),
+    }
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def pareto(rows):
+    """Mark rows no other row beats on accuracy, single-row latency and size at once"""
+    for row in rows:
+        row["pareto"] = not any(
+            other is not row
+            and other["accuracy"] >= row["accuracy"]
+            and other["single_row_ms"] <= row["single_row_ms"]
+            and other["size_kb"] <= row["size_kb"]
+            and (other["accuracy"], -other["single_row_ms"], -other["size_kb"])
+            != (row["accuracy"], -row["single_row_ms"], -row["size_kb"])
+            for other in rows
+        )
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Build and compare compact crop/fertilizer forests")
+    ap.add_argument("--model", choices=["crop", "fertilizer"], required=True)
+    ap.add_argument("--csv", help="training CSV (default: csv_path in config.yaml)")
+    ap.add_argument("--teacher", help="reference forest (default: fit one with rf_params from config.yaml)")
+    ap.add_argument("--sample-from-teacher", type=int, default=0, metavar="N",
+                    help="no CSV: label N random feature-space points with --teacher")
+    ap.add_argument("--min-confidence", type=float, default=0.6,
+                    help="with --sample-from-teacher: keep points the teacher is at least this sure about")
+    ap.add_argument("--models-dir", default=os.getenv("MODELS_DIR", "new model"),
+                    help="artifacts copied next to the compact model")
+    ap.add_argument("--out", default=None, help="output directory (default: <models_dir>/compact)")
+    ap.add_argument("--max-accuracy-drop", type=float, default=0.005)
+    ap.add_argument("--single-calls", type=int, default=200)
+    ap.add_argument("--batch-rows", type=int, default=10000)
+    args = ap.parse_args()
+
+    cfg = load_config()
+    section = cfg[args.model]
+    seed = cfg.get("seed", 42)
+    out_dir = args.out or os.path.join(cfg["models_dir"], "compact")
+    columns = None
+    if args.model == "fertilizer":
+        columns_path = os.path.join(args.models_dir, "fertilizer_model_columns.joblib")
+        columns = list(load(columns_path)) if os.path.exists(columns_path) else None
+
+    teacher = load(args.teacher) if args.teacher else None
+    if args.sample_from_teacher:
+        if teacher is None:
+            ap.error("--sample-from-teacher needs --teacher")
+        X, y = sample_from_teacher(args.model, teacher, columns, args.sample_from_teacher, seed, args.min_confidence)
+    else:
+        csv = args.csv or section["csv_path"]
+        if not os.path.exists(csv):
+            raise FileNotFoundError(f"Expected CSV at {csv}. Use --sample-from-teacher N with --teacher.")
+        X, y = serving_frame(args.model, pd.read_csv(csv), section["target"], columns)
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=section["test_size"], random_state=42,
+        stratify=y if y.nunique() > 1 and y.value_counts().min() > 1 else None)
+    # Tree selection is scored on X_val: rows the test split never sees and, for
+    # the default teacher, rows none of its trees were fitted on
+    X_fit, X_val, y_fit, y_val = train_test_split(X_train, y_train, test_size=0.25, random_state=seed)
+    if teacher is None:
+        params = dict(section["rf_params"], random_state=seed)
+        teacher = RandomForestClassifier(**params).fit(X_fit, y_fit)
+
+    candidates = [("reference", teacher)]
+    for size, indices in greedy_select(teacher, X_val, y_val, SELECT_SIZES).items():
+        candidates.append((f"select k={size}", subforest(teacher, indices)))
+    for n_estimators, max_depth in RETRAIN_GRID:
+        model = RandomForestClassifier(n_estimators=n_estimators, max_depth=max_depth, random_state=seed)
+        candidates.append((f"retrain n={n_estimators} depth={max_depth}", model.fit(X_train, y_train)))
+    for n_estimators, max_depth in DISTILL_GRID:
+        candidates.append((f"distill n={n_estimators} depth={max_depth}",
+                           distill(teacher, X_train, n_estimators, max_depth, seed)))
+
+    teacher_pred = teacher.predict(X_test)
+    rows = []
+    for name, model in candidates:
+        row = {"name": name, **measure(model, X_test, y_test, teacher_pred, args.single_calls, args.batch_rows)}
+        rows.append(row)
+        print(f"  measured {name}")
+    pareto(rows)
+
+    reference = rows[0]
+    eligible = [row for row in rows if row["accuracy"] >= reference["accuracy"] - args.max_accuracy_drop]
+    chosen = min(eligible, key=lambda row: (row["single_row_ms"], row["size_kb"]))
+
+    print(f"\n{args.model}: {len(X_train)} train / {len(X_test)} held-out rows")
+    print(f"{'candidate':30s} {'acc':>7s} {'agree':>7s} {'1-row ms':>9s} {'rows/s':>9s} {'size KB':>9s} "
+          f"{'nodes':>7s}  pareto")
+    for row in rows:
+        mark = "*" if row["pareto"] else ""
+        mark += "  <- chosen" if row is chosen else ""
+        print(f"{row['name']:30s} {row['accuracy']:7.4f} {row['teacher_agreement']:7.4f} "
+              f"{row['single_row_ms']:9.3f} {row['batch_rows_per_s']:9.0f} {row['size_kb']:9.0f} "
+              f"{row['nodes']:7d}  {mark}")
+
+    os.makedirs(out_dir, exist_ok=True)
+    if os.path.isdir(args.models_dir):
+        for name in os.listdir(args.models_dir):
+            src = os.path.join(args.models_dir, name)
+            if os.path.isfile(src) and not os.path.exists(os.path.join(out_dir, name)):
+                shutil.copy2(src, out_dir)
+    model = dict(candidates)[chosen["name"]]
+    dump(model, os.path.join(out_dir, SERVING_FILES[args.model]))
+    if args.model == "fertilizer":
+        dump(list(X.columns), os.path.join(out_dir, "fertilizer_model_columns.joblib"))
+    with open(os.path.join(out_dir, f"compaction_{args.model}.json"), "w") as f:
+        json.dump({"chosen": chosen["name"], "max_accuracy_drop": args.max_accuracy_drop,
+                   "sampled_from_teacher": bool(args.sample_from_teacher), "candidates": rows}, f, indent=2)
+    print(f"\n{chosen['name']} written to {os.path.join(out_dir, SERVING_FILES[args.model])}; "
+          f"serve it with MODELS_DIR={out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""Hyperparameter search for the crop / fertilizer random forests.
+
+train_crop / train_fertilizer fit the single forest in config.yaml. This
+driver searches PARAM_GRID instead, with successive halving on the number
+of trees: every candidate is cross-validated with a few trees, the best
+third survives to three times as many trees, and so on up to the config's
+n_estimators (rounded down to the first round's size times a power of
+three, e.g. 33 -> 99 -> 297 for 300). Trials run in parallel on all cores
+(--jobs).
+
+The preprocessing (build_tabular_preprocessor) is fitted once on the
+training split and its output cached in <models_dir>/search_cache, keyed by
+a hash of the data, so trials (and later runs on the same data) share it
+instead of re-encoding every fold. It is fitted on the whole training split
+rather than per fold; scaling and one-hot encoding do not change which
+splits a forest can make, so the scores are unaffected.
+
+Every trial (candidate x halving round) is logged with its fit time and
+fold accuracy to search_<model>.csv; the best forest is refitted on the
+training split and saved as the pipeline train_<model> would write.
+
+    python -m src.training.search_rf --model crop
+    python -m src.training.search_rf --model fertilizer --synthetic --compare-grid
+
+--compare-grid also runs the naive search (GridSearchCV over the full
+Pipeline, every candidate at full size, one trial at a time) on the same
+grid and reports end-to-end throughput of both.
+"""
+import argparse
+import hashlib
+import os
+import time
+
+import pandas as pd
+import yaml
+from joblib import dump, load
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import GridSearchCV, HalvingRandomSearchCV, ParameterGrid, StratifiedKFold
+from sklearn.pipeline import Pipeline
+
+from ..features.preprocess import build_tabular_preprocessor
+from ..pipelines.helpers import train_test_split_by_config
+from . import train_crop, train_fertilizer
+
+PARAM_GRID = {
+    "max_depth": [None, 10, 20],
+    "min_samples_leaf": [1, 2, 4],
+    "max_features": ["sqrt", "log2", None],
+    "class_weight": [None, "balanced"],
+}
+# Fewest trees per candidate in the first halving round
+MIN_TREES = 20
+HALVING_FACTOR = 3
+SAVED_FILES = {"crop": "crop_rf.joblib", "fertilizer": "fert_rf.joblib"}
+
+
+def load_config():
+    with open("config.yaml", "r") as f:
+        return yaml.safe_load(f)
+
+
+def load_data(model_name, cfg, synthetic, rows):
+    if synthetic:
+        module = train_crop if model_name == "crop" else train_fertilizer
+        df = module.make_synthetic(rows) if rows else module.make_synthetic()
+        # The synthetic label is the last column, not always named like the config target
+        return df.rename(columns={df.columns[-1]: cfg[model_name]["target"]})
+    csv = cfg[model_name]["csv_path"]
+    if not os.path.exists(csv):
+        raise FileNotFoundError(f"Expected CSV at {csv}. Use --synthetic to test.")
+    return pd.read_csv(csv)
+
+
+def preprocessed(df, target, test_size, cache_dir):
+    """Split df and fit the preprocessor on the training part, reusing a cached result for the same data"""
+    digest = hashlib.sha256(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    digest.update(f"{target}|{test_size}".encode())
+    path = os.path.join(cache_dir, f"prep_{digest.hexdigest()[:16]}.joblib")
+    if os.path.exists(path):
+        return load(path), True
+
+    X_train, X_test, y_train, y_test = train_test_split_by_config(df, target, test_size)
+    preproc = build_tabular_preprocessor(df, target)[0]
+    cached = {
+        "preproc": preproc.fit(X_train),
+        "X_train": preproc.transform(X_train),
+        "X_test": preproc.transform(X_test),
+        "y_train": y_train.to_numpy(),
+        "y_test": y_test.to_numpy(),
+        # Raw splits, for the naive search that preprocesses inside every fit
+        "raw": (X_train, X_test),
+    }
+    os.makedirs(cache_dir, exist_ok=True)
+    dump(cached, path)
+    return cached, False
+
+
+def trial_log(cv_results, n_splits):
+    """One row per trial (candidate x halving round) from a search's cv_results_"""
+    results = pd.DataFrame(cv_results)
+    log = pd.DataFrame({
+        "round": results.get("iter", 0),
+        "trees": results.get("n_resources", None),
+        # Summed over folds: the time the trial occupied a core
+        "fit_seconds": ((results["mean_fit_time"] + results["mean_score_time"]) * n_splits).round(3),
+        "cv_accuracy": results["mean_test_score"].round(4),
+    })
+    params = pd.DataFrame(list(results["params"]), dtype=object)
+    params.columns = [c.split("__")[-1] for c in params.columns]
+    params = params.drop(columns=["n_estimators"], errors="ignore")
+    return pd.concat([log, params], axis=1)
+
+
+def halving_resources(max_trees):
+    """(first, last) round tree counts: last = first * HALVING_FACTOR**k as close to max_trees as fits.
+
+    HalvingRandomSearchCV multiplies the first round's size by the factor
+    each round and stops below max_resources, so with MIN_TREES as the first
+    round the last one could end far short of max_trees (180 of 300).
+    """
+    rounds = 0
+    while MIN_TREES * HALVING_FACTOR ** (rounds + 1) <= max_trees:
+        rounds += 1
+    first = max(1, max_trees // HALVING_FACTOR ** rounds)
+    return first, first * HALVING_FACTOR ** rounds
+
+
+def halving_search(data, max_trees, folds, jobs, seed):
+    first, last = halving_resources(max_trees)
+    search = HalvingRandomSearchCV(
+        RandomForestClassifier(random_state=seed),
+        PARAM_GRID,
+        n_candidates=len(ParameterGrid(PARAM_GRID)),
+        resource="n_estimators",
+        min_resources=first,
+        max_resources=last,
+        factor=HALVING_FACTOR,
+        cv=StratifiedKFold(folds, shuffle=True, random_state=seed),
+        n_jobs=jobs,
+        random_state=seed,
+        refit=False,
+    )
+    search.fit(data["X_train"], data["y_train"])
+    return search
+
+
+def grid_search(data, target, df, max_trees, folds, seed):
+    """The naive baseline: full-size forests, preprocessing refitted inside every fit, one trial at a time"""
+    X_train, _ = data["raw"]
+    pipe = Pipeline([
+        ("prep", build_tabular_preprocessor(df, target)[0]),
+        ("clf", RandomForestClassifier(n_estimators=max_trees, random_state=seed)),
+    ])
+    search = GridSearchCV(
+        pipe,
+        {f"clf__{name}": values for name, values in PARAM_GRID.items()},
+        cv=StratifiedKFold(folds, shuffle=True, random_state=seed),
+        n_jobs=1,
+        refit=False,
+    )
+    search.fit(X_train, data["y_train"])
+    return search
+
+
+def best_params(search):
+    results = pd.DataFrame(search.cv_results_)
+    if "iter" in results:
+        # Only the last halving round ran with (close to) the full number of trees
+        results = results[results["iter"] == results["iter"].max()]
+    best = results["mean_test_score"].idxmax()
+    return {name.split("__")[-1]: value for name, value in results.loc[best, "params"].items()}
+
+
+def refit(data, params, max_trees, jobs, seed):
+    params = {name: value for name, value in params.items() if name != "n_estimators"}
+    rf = RandomForestClassifier(n_estimators=max_trees, n_jobs=jobs, random_state=seed, **params)
+    rf.fit(data["X_train"], data["y_train"])
+    return rf, rf.score(data["X_test"], data["y_test"])
+
+
+def report(name, search, elapsed, folds, test_acc):
+    log = trial_log(search.cv_results_, folds)
+    fits = len(log) * folds
+    # Halving trials grow round by round; say how, so they are not read as full-size ones
+    rounds = getattr(search, "n_resources_", None)
+    trees = f"  trees per round {'/'.join(map(str, rounds))}" if rounds else ""
+    print(f"{name:8s} {len(log):4d} trials {fits:5d} fits {elapsed:8.1f} s  "
+          f"{len(log) / elapsed:6.2f} trials/s  {log['fit_seconds'].sum():8.1f} core-s  "
+          f"test acc {test_acc:.4f}{trees}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Search random forest hyperparameters with successive halving")
+    ap.add_argument("--model", choices=["crop", "fertilizer"], required=True)
+    ap.add_argument("--synthetic", action="store_true", help="use synthetic data")
+    ap.add_argument("--rows", type=int, default=0, help="synthetic rows (default: the trainer's)")
+    ap.add_argument("--folds", type=int, default=3)
+    ap.add_argument("--jobs", type=int, default=-1, help="parallel trials (-1: all cores)")
+    ap.add_argument("--compare-grid", action="store_true", help="also time the naive grid search")
+    args = ap.parse_args()
+
+    cfg = load_config()
+    section = cfg[args.model]
+    seed = cfg.get("seed", 42)
+    max_trees = section["rf_params"].get("n_estimators", 100)
+    df = load_data(args.model, cfg, args.synthetic, args.rows)
+
+    start = time.perf_counter()
+    data, hit = preprocessed(df, section["target"], section["test_size"], os.path.join(cfg["models_dir"], "search_cache"))
+    print(f"preprocessing {'loaded from cache' if hit else 'fitted and cached'} in {time.perf_counter() - start:.2f} s; "
+          f"{data['X_train'].shape[0]} train rows x {data['X_train'].shape[1]} features")
+
+    search = halving_search(data, max_trees, args.folds, args.jobs, seed)
+    params = best_params(search)
+    rf, acc = refit(data, params, max_trees, args.jobs, seed)
+    elapsed = time.perf_counter() - start
+
+    log = trial_log(search.cv_results_, args.folds)
+    os.makedirs(cfg["models_dir"], exist_ok=True)
+    log_path = os.path.join(cfg["models_dir"], f"search_{args.model}.csv")
+    log.to_csv(log_path, index=False)
+    print(log.to_string(index=False))
+    print(f"\nbest {params}; test accuracy {acc:.4f}; trial log in {log_path}\n")
+
+    out = os.path.join(cfg["models_dir"], SAVED_FILES[args.model])
+    dump(Pipeline([("prep", data["preproc"]), ("clf", rf)]), out)
+    report("halving", search, elapsed, args.folds, acc)
+
+    if args.compare_grid:
+        start = time.perf_counter()
+        grid = grid_search(data, section["target"], df, max_trees, args.folds, seed)
+        grid_params = best_params(grid)
+        pipe = Pipeline([
+            ("prep", build_tabular_preprocessor(df, section["target"])[0]),
+            ("clf", RandomForestClassifier(n_estimators=max_trees, random_state=seed, **grid_params)),
+        ])
+        X_train, X_test = data["raw"]
+        grid_acc = pipe.fit(X_train, data["y_train"]).score(X_test, data["y_test"])
+        report("grid", grid, time.perf_counter() - start, args.folds, grid_acc)
+        print(f"grid best {grid_params}")
+    print(f"\nModel saved to {out}")
+
+
+if __name__ == "__main__":
+    main()
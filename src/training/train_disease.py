@@ -1,6 +1,6 @@
 import os, yaml, argparse
 import tensorflow as tf
-from ..pipelines.disease_pipeline import build_model
+from ..pipelines.disease_pipeline import build_model, make_record_datasets
 
 def load_config():
     with open("config.yaml","r") as f:
@@ -9,36 +9,41 @@ def load_config():
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--epochs", type=int, default=None)
+    ap.add_argument("--records", default=None,
+                    help="read TFRecord shards written by build_disease_records instead of the image folders")
     args = ap.parse_args()
 
     cfg = load_config()
-    base_dir = cfg["disease"]["data_dir"]   # should be "data/raw/plant_disease"
-    train_dir = os.path.join(base_dir, "Train")
-    val_dir = os.path.join(base_dir, "Validation")
-
-    if not (os.path.exists(train_dir) and os.path.exists(val_dir)):
-        raise FileNotFoundError(f"Expected Train/ and Validation/ folders under {base_dir}")
-
     img_size = tuple(cfg["disease"]["img_size"])
     batch_size = cfg["disease"]["batch_size"]
     seed = cfg["seed"]
 
-    # Load datasets
-    train_ds = tf.keras.utils.image_dataset_from_directory(
-        train_dir,
-        image_size=img_size,
-        batch_size=batch_size,
-        seed=seed
-    )
-
-    val_ds = tf.keras.utils.image_dataset_from_directory(
-        val_dir,
-        image_size=img_size,
-        batch_size=batch_size,
-        seed=seed
-    )
-
-    class_names = train_ds.class_names
+    if args.records:
+        train_ds, val_ds, class_names = make_record_datasets(args.records, batch_size, seed, expected_size=img_size)
+    else:
+        base_dir = cfg["disease"]["data_dir"]   # should be "data/raw/plant_disease"
+        train_dir = os.path.join(base_dir, "Train")
+        val_dir = os.path.join(base_dir, "Validation")
+
+        if not (os.path.exists(train_dir) and os.path.exists(val_dir)):
+            raise FileNotFoundError(f"Expected Train/ and Validation/ folders under {base_dir}")
+
+        # Load datasets
+        train_ds = tf.keras.utils.image_dataset_from_directory(
+            train_dir,
+            image_size=img_size,
+            batch_size=batch_size,
+            seed=seed
+        )
+
+        val_ds = tf.keras.utils.image_dataset_from_directory(
+            val_dir,
+            image_size=img_size,
+            batch_size=batch_size,
+            seed=seed
+        )
+
+        class_names = train_ds.class_names
     print(f"Detected classes: {class_names}")
 
     # Build and train model
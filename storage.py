@@ -0,0 +1,214 @@
+"""User storage backends behind one interface.
+
+The backend is chosen by STORAGE_BACKEND or `storage.backend` in config.yaml:
+``postgres`` (database.py), ``mongo`` (mongo_database.py) or ``memory``.
+
+Every backend returns the same shapes:
+    verify_user      -> (id, username, email, language) or None; id is an int or str
+    get_profile      -> dict with id, username, email, language, password_hash, or None
+    create_user      -> True, or False for a duplicate/failure
+    insert_users_bulk-> 'created' | 'duplicate' | 'error' per record
+    insert_events    -> None; raises when the events could not be stored
+"""
+import hashlib
+import hmac
+import itertools
+import os
+import threading
+import logging
+from abc import ABC, abstractmethod
+from collections import deque
+
+import yaml
+
+STORAGE_BACKENDS = ("postgres", "mongo", "memory")
+# Prediction events the in-memory store keeps; older ones are dropped
+MEMORY_STORE_MAX_EVENTS = int(os.getenv("MEMORY_STORE_MAX_EVENTS", "10000"))
+
+
+def hash_password(password):
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+def _credentials(profile, password):
+    """(id, username, email, language) if password matches the profile, else None"""
+    if profile is None or not hmac.compare_digest(profile['password_hash'], hash_password(password)):
+        return None
+    return (profile['id'], profile['username'], profile['email'], profile['language'])
+
+
+class UserStore(ABC):
+    """Interface shared by all user storage backends"""
+
+    def hash_password(self, password):
+        return hash_password(password)
+
+    @abstractmethod
+    def create_user(self, username, email, password, language='en'):
+        pass
+
+    @abstractmethod
+    def get_profile(self, username):
+        pass
+
+    def verify_user(self, username, password):
+        try:
+            return _credentials(self.get_profile(username), password)
+        except Exception as e:
+            logging.error(f"User verification failed: {e}")
+            return None
+
+    @abstractmethod
+    def update_language(self, username, language):
+        pass
+
+    @abstractmethod
+    def insert_users_bulk(self, records):
+        pass
+
+    @abstractmethod
+    def insert_events(self, events):
+        """Append prediction history events; raising makes event_log spool them to disk"""
+
+    def close(self):
+        pass
+
+
+class AsyncUserStore(ABC):
+    """Interface shared by the async user storage backends, same shapes as UserStore"""
+
+    def hash_password(self, password):
+        return hash_password(password)
+
+    async def connect(self):
+        return self
+
+    async def close(self):
+        pass
+
+    @abstractmethod
+    async def create_user(self, username, email, password, language='en'):
+        pass
+
+    @abstractmethod
+    async def get_profile(self, username):
+        pass
+
+    async def verify_user(self, username, password):
+        try:
+            return _credentials(await self.get_profile(username), password)
+        except Exception as e:
+            logging.error(f"User verification failed: {e}")
+            return None
+
+    @abstractmethod
+    async def update_language(self, username, language):
+        pass
+
+    @abstractmethod
+    async def insert_users_bulk(self, records):
+        pass
+
+
+class InMemoryUserStore(UserStore):
+    """Process-local store for tests and local development"""
+
+    def __init__(self):
+        self._users = {}
+        self._emails = set()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.events = deque(maxlen=MEMORY_STORE_MAX_EVENTS)
+
+    def _insert(self, username, email, password_hash, language):
+        if username in self._users or email in self._emails:
+            return False
+        self._users[username] = {
+            'id': next(self._ids),
+            'username': username,
+            'email': email,
+            'language': language,
+            'password_hash': password_hash
+        }
+        self._emails.add(email)
+        return True
+
+    def create_user(self, username, email, password, language='en'):
+        with self._lock:
+            return self._insert(username, email, self.hash_password(password), language)
+
+    def get_profile(self, username):
+        with self._lock:
+            profile = self._users.get(username)
+            return dict(profile) if profile else None
+
+    def update_language(self, username, language):
+        with self._lock:
+            if username in self._users:
+                self._users[username]['language'] = language
+
+    def insert_users_bulk(self, records):
+        with self._lock:
+            return ['created' if self._insert(*record) else 'duplicate' for record in records]
+
+    def insert_events(self, events):
+        with self._lock:
+            self.events.extend(events)
+
+
+def load_storage_config(path="config.yaml"):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return (yaml.safe_load(f) or {}).get("storage", {})
+
+
+def _backend_name(backend):
+    config = load_storage_config()
+    name = backend or os.getenv("STORAGE_BACKEND") or config.get("backend", "postgres")
+    if name not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown storage backend {name!r}, expected one of {STORAGE_BACKENDS}")
+    return name, config
+
+
+def get_user_store(backend=None):
+    """Create the configured synchronous user store"""
+    name, config = _backend_name(backend)
+    if name == "postgres":
+        from database import UserDatabase
+        return UserDatabase()
+    if name == "mongo":
+        from mongo_database import UserDatabase
+        return UserDatabase()
+    return InMemoryUserStore()
+
+
+def get_async_user_store(backend=None):
+    """Create the configured async user store; call ``await store.connect()`` before use"""
+    name, config = _backend_name(backend)
+    if name == "postgres":
+        from async_database import AsyncUserDatabase
+        return AsyncUserDatabase()
+    if name == "mongo":
+        from async_mongo_database import AsyncMongoUserDatabase
+        return AsyncMongoUserDatabase(config.get("mongo", {}))
+    return AsyncInMemoryUserStore()
+
+
+class AsyncInMemoryUserStore(AsyncUserStore):
+    """Async facade over InMemoryUserStore, matching the async backends' API"""
+
+    def __init__(self):
+        self.store = InMemoryUserStore()
+
+    async def create_user(self, username, email, password, language='en'):
+        return self.store.create_user(username, email, password, language)
+
+    async def get_profile(self, username):
+        return self.store.get_profile(username)
+
+    async def update_language(self, username, language):
+        self.store.update_language(username, language)
+
+    async def insert_users_bulk(self, records):
+        return self.store.insert_users_bulk(records)
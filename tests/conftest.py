@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Modules live at the repository root and under src/, as for the benchmarks
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
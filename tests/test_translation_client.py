@@ -0,0 +1,126 @@
+"""TranslationClient against the local translate_stub server (no network)."""
+import time
+
+import pytest
+
+import translate_stub
+from translation_client import BudgetExceededError, CircuitBreaker, TranslationClient
+
+ANSWER = "Water the field early. Add compost before sowing.\nCheck the leaves weekly."
+SEGMENTS = ["Water the field early.", "Add compost before sowing.", "Check the leaves weekly."]
+
+
+def _recording_handler(**faults):
+    """Stub handler that also keeps the path (with query) of every request"""
+    base = translate_stub.make_handler(**faults)
+
+    def do_GET(self):
+        with self.stats_lock:
+            self.stats.setdefault("paths", []).append(self.path)
+        base.do_GET(self)
+    return type("RecordingStubHandler", (base,), {"do_GET": do_GET})
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(**faults):
+        handler = _recording_handler(**faults)
+        server, url = translate_stub.serve(handler=handler)
+        servers.append(server)
+        return handler.stats, url
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def make_client():
+    clients = []
+
+    def make(url, **kwargs):
+        client = TranslationClient(base_url=url, timeout=2, budget=5, **kwargs)
+        clients.append(client)
+        return client
+    yield make
+    for client in clients:
+        client.close()
+
+
+def test_segments_are_batched_into_one_request_and_cached(stub, make_client):
+    stats, url = stub()
+    client = make_client(url)
+
+    translated = client.translate(ANSWER, "te")
+    assert translated == ("[te] Water the field early. [te] Add compost before sowing.\n"
+                          "[te] Check the leaves weekly.")
+    assert stats["requests"] == 1
+
+    # Every segment is cached now, including when it shows up in another answer
+    assert client.translate("Check the leaves weekly.", "te") == "[te] Check the leaves weekly."
+    assert stats["requests"] == 1
+
+
+def test_batches_are_split_to_stay_under_the_url_limit(stub, make_client):
+    stats, url = stub()
+    max_url_length = 200
+    client = make_client(url, max_url_length=max_url_length)
+    segments = [f"Apply {n} kg of urea per acre after the first irrigation." for n in range(12)]
+
+    translated = client.translate_segments(segments, "hi")
+    assert translated == {segment: f"[hi] {segment}" for segment in segments}
+    assert 1 < stats["requests"] < len(segments)
+    origin = url[:-len("/translate_a/single")]
+    assert all(len(origin) + len(path) <= max_url_length for path in stats["paths"])
+
+
+def test_merged_lines_fall_back_to_one_request_per_segment(stub, make_client, monkeypatch):
+    def merge_lines(text, target_lang):
+        # An upstream that does not keep the newlines between segments
+        return [[[f"[{target_lang}] " + text.replace("\n", " "), text, None, None, 10]], None, "en"]
+    monkeypatch.setattr(translate_stub, "fake_translate", merge_lines)
+    stats, url = stub()
+    client = make_client(url)
+
+    translated = client.translate_segments(SEGMENTS, "ta")
+    assert translated == {segment: f"[ta] {segment}" for segment in SEGMENTS}
+    # The batch, then each segment on its own
+    assert stats["requests"] == 1 + len(SEGMENTS)
+    assert all("%0A" not in path for path in stats["paths"][1:])
+
+
+def test_failed_segments_stay_in_the_source_language(stub, make_client):
+    stats, url = stub(error_rate=1.0)
+    client = make_client(url)
+
+    assert client.translate(ANSWER, "kn") == ANSWER
+    assert client.translate(ANSWER, "kn", partial=False) is None
+    assert stats["errors"] >= 1
+
+
+def test_half_open_probe_that_runs_out_of_time_reopens_the_circuit(stub, make_client):
+    _, url = stub(latency=1.0)
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    client = make_client(url, breaker=breaker)
+    breaker.record_failure()
+    time.sleep(0.06)
+
+    # The probe gets only what is left of a caller's budget, far less than the budget itself
+    with pytest.raises(BudgetExceededError):
+        client._call("Hello.", "te", "en", time.monotonic() + 0.1, budget=5)
+    assert breaker.state == CircuitBreaker.OPEN
+    time.sleep(0.06)
+    assert breaker.allow()
+
+
+def test_unanswered_half_open_probe_does_not_shut_the_circuit_for_good():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    # The first probe never reported back; another one may go after reset_timeout
+    assert breaker.allow()
@@ -0,0 +1,86 @@
+"""Shared UserStore contract, checked against every sync and async backend.
+
+The in-memory stores always run. Point DB_PASSWORD (Postgres) or MONGODB_URL
+at a scratch database to include the others; accounts are named
+"test_<backend>_contract_<hex>" and are left in place.
+"""
+import asyncio
+import os
+import uuid
+
+import pytest
+
+from storage import get_user_store, get_async_user_store
+
+PROFILE_KEYS = {"id", "username", "email", "language", "password_hash"}
+
+
+# Drivers each backend needs, for the sync and the async store
+DRIVERS = {"postgres": ("psycopg2", "asyncpg"), "mongo": ("pymongo", "motor")}
+DATABASE_ENV = {"postgres": "DB_PASSWORD", "mongo": "MONGODB_URL"}
+BACKENDS = ["memory"] + [
+    pytest.param(name, marks=pytest.mark.skipif(not os.getenv(env), reason=f"{env} not set"))
+    for name, env in DATABASE_ENV.items()
+]
+
+
+async def check_contract(call, prefix):
+    """`await call(method, *args)` runs one store method"""
+    name = f"{prefix}_contract_{uuid.uuid4().hex[:8]}"
+    assert await call("create_user", name, f"{name}@example.com", "secret", "hi") is True
+    assert await call("create_user", name, f"{name}@example.com", "secret") is False
+
+    row = await call("verify_user", name, "secret")
+    assert isinstance(row, tuple) and len(row) == 4
+    assert row[1:] == (name, f"{name}@example.com", "hi")
+    assert isinstance(row[0], (int, str))
+    assert await call("verify_user", name, "wrong") is None
+    assert await call("verify_user", f"{name}_missing", "secret") is None
+
+    profile = await call("get_profile", name)
+    assert set(profile) == PROFILE_KEYS
+    assert await call("get_profile", f"{name}_missing") is None
+
+    # Must be visible immediately, i.e. the profile cache is invalidated
+    await call("update_language", name, "ta")
+    assert (await call("verify_user", name, "secret"))[3] == "ta"
+
+    password_hash = profile["password_hash"]
+    statuses = await call("insert_users_bulk", [
+        (f"{name}_b1", f"{name}_b1@example.com", password_hash, "en"),
+        (name, f"{name}_other@example.com", password_hash, "en"),
+        (f"{name}_b2", f"{name}_b2@example.com", password_hash, "te"),
+        # Repeated within the batch: only the first one is created
+        (f"{name}_b1", f"{name}_b1_again@example.com", password_hash, "en"),
+    ])
+    assert list(statuses) == ["created", "duplicate", "created", "duplicate"]
+    assert (await call("verify_user", f"{name}_b2", "secret"))[3] == "te"
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_sync_store_contract(backend):
+    if backend in DRIVERS:
+        pytest.importorskip(DRIVERS[backend][0])
+    store = get_user_store(backend)
+    try:
+        async def call(method, *args):
+            return getattr(store, method)(*args)
+        asyncio.run(check_contract(call, f"test_{backend}"))
+    finally:
+        store.close()
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_async_store_contract(backend):
+    if backend in DRIVERS:
+        pytest.importorskip(DRIVERS[backend][1])
+
+    async def run():
+        store = await get_async_user_store(backend).connect()
+        try:
+            async def call(method, *args):
+                return await getattr(store, method)(*args)
+            await check_contract(call, f"test_async_{backend}")
+        finally:
+            await store.close()
+    asyncio.run(run())
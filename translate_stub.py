@@ -0,0 +1,118 @@
+"""Local stand-in for the Google translate_a/single endpoint.
+
+Translations are fake ("[te] Hello.") but the response shape matches the real
+API, including one entry per sentence, so clients can be exercised offline:
+
+    python translate_stub.py --port 8765
+    TRANSLATE_URL=http://127.0.0.1:8765/translate_a/single uvicorn src.api.main:app
+
+Faults can be injected to exercise timeouts, the circuit breaker and hedging:
+
+    python translate_stub.py --latency 0.05 --slow-rate 0.1 --slow-latency 2 --error-rate 0.2
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_SENTENCE = re.compile(r'[^.!?।\n]*(?:[.!?।]+[ \t]*|\n|$)')
+
+
+def fake_translate(text, target_lang):
+    """Build a Google-shaped response: [[[translated, original], ...], None, source]"""
+    sentences = [s for s in _SENTENCE.findall(text) if s]
+    parts = []
+    for sentence in sentences:
+        stripped = sentence.strip()
+        translated = f"[{target_lang}] {stripped}" if stripped else ""
+        # Keep the trailing whitespace/newline like the real service does
+        translated += sentence[len(sentence.rstrip()):]
+        parts.append([translated, sentence, None, None, 10])
+    return [parts, None, "en"]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; avoid 40ms delayed-ACK stalls
+    disable_nagle_algorithm = True
+    stats = {"requests": 0, "connections": set(), "errors": 0}
+    stats_lock = threading.Lock()
+    # Fault injection knobs (seconds / probabilities)
+    latency = 0.0
+    slow_rate = 0.0
+    slow_latency = 0.0
+    error_rate = 0.0
+
+    def do_GET(self):
+        parsed = urllib.parse.urlparse(self.path)
+        if parsed.path != "/translate_a/single":
+            self.send_error(404)
+            return
+        params = urllib.parse.parse_qs(parsed.query)
+        with self.stats_lock:
+            self.stats["requests"] += 1
+            self.stats["connections"].add(self.client_address)
+        delay = self.latency
+        if self.slow_rate and random.random() < self.slow_rate:
+            delay = self.slow_latency
+        if delay:
+            time.sleep(delay)
+        if self.error_rate and random.random() < self.error_rate:
+            with self.stats_lock:
+                self.stats["errors"] += 1
+            self.send_error(503)
+            return
+        body = json.dumps(
+            fake_translate(params.get("q", [""])[0], params.get("tl", ["hi"])[0]),
+            ensure_ascii=False
+        ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_handler(latency=0.0, slow_rate=0.0, slow_latency=0.0, error_rate=0.0):
+    """StubHandler subclass with its own fault settings and stats"""
+    return type("FaultyStubHandler", (StubHandler,), {
+        "latency": latency, "slow_rate": slow_rate, "slow_latency": slow_latency,
+        "error_rate": error_rate,
+        "stats": {"requests": 0, "connections": set(), "errors": 0},
+        "stats_lock": threading.Lock(),
+    })
+
+
+def serve(host="127.0.0.1", port=0, handler=StubHandler):
+    """Start the stub in a daemon thread; returns (server, base_url)"""
+    server = ThreadingHTTPServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://{host}:{server.server_address[1]}/translate_a/single"
+    return server, base_url
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Local fake translation server")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency", type=float, default=0.0, help="base delay per request (s)")
+    ap.add_argument("--slow-rate", type=float, default=0.0, help="fraction of requests that are slow")
+    ap.add_argument("--slow-latency", type=float, default=2.0, help="delay of slow requests (s)")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    args = ap.parse_args()
+    handler = make_handler(args.latency, args.slow_rate, args.slow_latency, args.error_rate)
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    print(f"Translation stub on http://{args.host}:{args.port}/translate_a/single")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
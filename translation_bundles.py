@@ -0,0 +1,121 @@
+import argparse
+import hashlib
+import json
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from languages import INDIAN_LANGUAGES
+from translator import BASE_TEXTS, get_translations, translation_store
+from translation_store import content_key
+
+BUNDLES_DIR = os.getenv("TRANSLATION_BUNDLES_DIR", "translation_bundles")
+# Offline build can afford to wait much longer than a live request
+BUILD_BUDGET = 30
+# Languages translated at once, so one slow language does not hold up the others
+BUILD_WORKERS = int(os.getenv("TRANSLATION_PREFETCH_WORKERS", "4"))
+
+# Prebuilt bundles change only on deploy, live translations may still improve
+BUNDLE_CACHE_CONTROL = "public, max-age=86400, stale-while-revalidate=604800"
+LIVE_CACHE_CONTROL = "public, max-age=300"
+
+# language -> (mtime, body bytes, etag)
+_loaded_bundles = {}
+_loaded_lock = threading.Lock()
+
+
+def encode_bundle(translations):
+    """Serialize a bundle deterministically so equal content gives equal ETags"""
+    body = json.dumps(translations, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    body = body.encode("utf-8")
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    return body, etag
+
+
+def bundle_path(language_code, bundles_dir=BUNDLES_DIR):
+    return os.path.join(bundles_dir, f"{language_code}.json")
+
+
+def load_bundle(language_code, bundles_dir=BUNDLES_DIR):
+    """Return (body, etag) for a prebuilt bundle, or None if it was never built"""
+    path = bundle_path(language_code, bundles_dir)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    with _loaded_lock:
+        cached = _loaded_bundles.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1], cached[2]
+
+    with open(path, "r", encoding="utf-8") as f:
+        translations = json.load(f)
+    body, etag = encode_bundle(translations)
+    with _loaded_lock:
+        _loaded_bundles[path] = (mtime, body, etag)
+    return body, etag
+
+
+def get_bundle(language_code):
+    """Return (body, etag, cache_control) for the /translations endpoint"""
+    prebuilt = load_bundle(language_code)
+    if prebuilt is not None:
+        body, etag = prebuilt
+        return body, etag, BUNDLE_CACHE_CONTROL
+    body, etag = encode_bundle(get_translations(language_code))
+    return body, etag, LIVE_CACHE_CONTROL
+
+
+def _build_bundle(code, bundles_dir):
+    """Write one language's bundle; False if its translation is incomplete"""
+    translations = get_translations(code, budget=BUILD_BUDGET)
+    # Only complete translations are persisted; anything else fell back to English
+    if code != 'en' and translation_store.get(content_key(code, list(BASE_TEXTS.values()))) is None:
+        logging.warning(f"Translation for {code} unavailable, bundle not built")
+        return False
+    path = bundle_path(code, bundles_dir)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(translations, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+    return True
+
+
+def build_bundles(bundles_dir=BUNDLES_DIR, languages=None, max_workers=BUILD_WORKERS):
+    """Pre-generate BASE_TEXTS bundles for every supported language, max_workers at a time"""
+    os.makedirs(bundles_dir, exist_ok=True)
+    codes = list(languages or INDIAN_LANGUAGES)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="translation-bundles") as pool:
+        done = list(pool.map(lambda code: _build_bundle(code, bundles_dir), codes))
+    built = [code for code, ok in zip(codes, done) if ok]
+    skipped = [code for code, ok in zip(codes, done) if not ok]
+    return built, skipped
+
+
+def start_build(languages=None, bundles_dir=BUNDLES_DIR, max_workers=BUILD_WORKERS):
+    """Run build_bundles in a daemon thread, e.g. on web startup where the bundles are served"""
+    thread = threading.Thread(
+        target=build_bundles,
+        args=(bundles_dir, languages, max_workers),
+        name="translation-bundles",
+        daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Pre-generate UI translation bundles")
+    ap.add_argument("--out", default=BUNDLES_DIR, help="output directory")
+    ap.add_argument("--languages", nargs="*", help="language codes (default: all)")
+    args = ap.parse_args()
+    built, skipped = build_bundles(args.out, args.languages)
+    print(f"Built {len(built)} bundles in {args.out}")
+    if skipped:
+        print(f"Skipped (translation unavailable): {', '.join(skipped)}")
+
+
+if __name__ == "__main__":
+    main()
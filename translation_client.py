@@ -0,0 +1,303 @@
+import json
+import os
+import re
+import threading
+import time
+import urllib.parse
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+TRANSLATE_URL = os.getenv("TRANSLATE_URL", "https://translate.googleapis.com/translate_a/single")
+TRANSLATE_TIMEOUT = float(os.getenv("TRANSLATE_TIMEOUT", "5"))
+TRANSLATE_POOL_SIZE = int(os.getenv("TRANSLATE_POOL_SIZE", "10"))
+TRANSLATE_SEGMENT_CACHE_SIZE = int(os.getenv("TRANSLATE_SEGMENT_CACHE_SIZE", "20000"))
+# Conservative limit that works for Google and common proxies/CDNs
+MAX_URL_LENGTH = int(os.getenv("TRANSLATE_MAX_URL_LENGTH", "2000"))
+# Total time one translate call may spend across all batches and retries
+TRANSLATE_BUDGET = float(os.getenv("TRANSLATE_BUDGET", "3"))
+# Send a duplicate request if the first has not answered after this long (unset = off)
+TRANSLATE_HEDGE_AFTER = float(os.getenv("TRANSLATE_HEDGE_AFTER", "0")) or None
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("TRANSLATE_BREAKER_FAILURES", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("TRANSLATE_BREAKER_RESET", "30"))
+
+request_outcomes = metrics.counter(
+    "translation_requests_total", "Translation HTTP requests by outcome", ["outcome"])
+request_latency = metrics.histogram(
+    "translation_request_seconds", "Latency of translation calls (including hedges)", ["outcome"])
+hedged_requests = metrics.counter(
+    "translation_hedged_requests_total", "Duplicate requests sent because the first was slow or failed")
+breaker_transitions = metrics.counter(
+    "translation_breaker_transitions_total", "Circuit breaker state changes", ["state"])
+segment_cache_entries = metrics.gauge(
+    "translation_segment_cache_entries", "Segments held in the shared client's LRU cache")
+
+# Separators are kept (capturing group) so the answer can be reassembled verbatim
+_SEGMENT_SPLIT = re.compile(r'((?<=[.!?।])[ \t]+|\s*\n\s*|\\n)')
+
+
+def split_segments(text):
+    """Split text into [segment, separator, segment, ...] on sentence/line boundaries"""
+    return _SEGMENT_SPLIT.split(text)
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class BudgetExceededError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """Open after N consecutive failures, allow one probe after reset_timeout"""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def _set_state(self, state):
+        if state != self.state:
+            self.state = state
+            breaker_transitions.inc(state=state)
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            # Also from HALF_OPEN: a probe that never reported back must not keep the circuit shut
+            if now - self._opened_at >= self.reset_timeout:
+                # Let exactly one probe through per reset_timeout; everyone else keeps failing fast
+                self._opened_at = now
+                self._set_state(self.HALF_OPEN)
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+
+
+class TranslationClient:
+    """Google-Translate-compatible client with a keep-alive pool and a per-segment cache.
+
+    Long answers are split into sentences; each distinct sentence is translated
+    once and cached, and uncached sentences are sent several per request as
+    newline-joined batches that stay under ``max_url_length``.
+
+    Every call runs under a latency budget. Repeated failures open a circuit
+    breaker so callers fail fast (and fall back to cached or English text)
+    instead of waiting on a dead upstream; slow requests can be hedged.
+    """
+
+    def __init__(self, base_url=TRANSLATE_URL, timeout=TRANSLATE_TIMEOUT,
+                 pool_size=TRANSLATE_POOL_SIZE, cache_size=TRANSLATE_SEGMENT_CACHE_SIZE,
+                 max_url_length=MAX_URL_LENGTH, budget=TRANSLATE_BUDGET,
+                 hedge_after=TRANSLATE_HEDGE_AFTER, breaker=None):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_url_length = max_url_length
+        self.cache_size = cache_size
+        self.budget = budget
+        self.hedge_after = hedge_after
+        self.breaker = breaker or CircuitBreaker()
+        self._executor = ThreadPoolExecutor(max_workers=pool_size * 2, thread_name_prefix="translate")
+        self.session = requests.Session()
+        # Hedging can put two requests in flight per call, so size for both
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size * 2)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def translate(self, text, target_lang, source_lang='en', budget=None, partial=True):
+        """Translate a (possibly multi-sentence) text, reusing cached segments.
+
+        Segments that could not be translated stay in the source language, or
+        with partial=False the whole call returns None.
+        """
+        if not text or source_lang == target_lang:
+            return text
+
+        parts = split_segments(text)
+        # Even indexes are segments, odd indexes are the separators between them
+        segments = [part for part in parts[0::2] if part.strip()]
+        translated = self.translate_segments(segments, target_lang, source_lang, budget)
+        if not partial and any(segment not in translated for segment in segments):
+            return None
+
+        return "".join(
+            translated.get(part, part) if i % 2 == 0 else part
+            for i, part in enumerate(parts)
+        )
+
+    def translate_segments(self, segments, target_lang, source_lang='en', budget=None):
+        """Return {segment: translation}; segments that could not be translated are omitted"""
+        budget = budget if budget is not None else self.budget
+        deadline = time.monotonic() + budget
+        result = {}
+        missing = []
+        with self._lock:
+            for segment in dict.fromkeys(segments):
+                key = (source_lang, target_lang, segment)
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    result[segment] = self._cache[key]
+                else:
+                    missing.append(segment)
+
+        for batch in self._batches(missing, target_lang, source_lang):
+            if time.monotonic() >= deadline:
+                # Out of time: the rest stay untranslated rather than costing the upstream a request each
+                break
+            for segment, translation in self._translate_batch(batch, target_lang, source_lang, deadline, budget).items():
+                result[segment] = translation
+                self._remember((source_lang, target_lang, segment), translation)
+        return result
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _url_length(self, segments, target_lang, source_lang):
+        query = urllib.parse.urlencode({
+            'client': 'gtx', 'sl': source_lang, 'tl': target_lang, 'dt': 't',
+            'q': "\n".join(segments)
+        })
+        return len(self.base_url) + 1 + len(query)
+
+    def _batches(self, segments, target_lang, source_lang):
+        """Group segments into newline-joined batches that fit in one URL"""
+        batch = []
+        for segment in segments:
+            if batch and self._url_length(batch + [segment], target_lang, source_lang) > self.max_url_length:
+                yield batch
+                batch = []
+            # An oversized single segment is still sent on its own
+            batch.append(segment)
+        if batch:
+            yield batch
+
+    def _request(self, text, target_lang, source_lang, timeout):
+        params = {'client': 'gtx', 'sl': source_lang, 'tl': target_lang, 'dt': 't', 'q': text}
+        response = self.session.get(self.base_url, params=params, timeout=timeout)
+        response.raise_for_status()
+        result = json.loads(response.content.decode("utf-8"))
+        # One entry per sentence of the input; the first element is the translation
+        return "".join(part[0] for part in result[0] if part and part[0])
+
+    def _send(self, text, target_lang, source_lang, deadline):
+        # Capped at the time left, so abandoned requests do not pile up in the executor
+        timeout = min(self.timeout, max(0.001, deadline - time.monotonic()))
+        return self._executor.submit(self._request, text, target_lang, source_lang, timeout)
+
+    def _call(self, text, target_lang, source_lang, deadline, budget):
+        """One logical request: deadline and breaker check, optional hedge"""
+        if time.monotonic() >= deadline:
+            request_outcomes.inc(outcome="budget_exhausted")
+            raise BudgetExceededError("translation budget already spent")
+        if not self.breaker.allow():
+            request_outcomes.inc(outcome="short_circuit")
+            raise CircuitOpenError("translation circuit is open")
+
+        start = time.monotonic()
+        pending = {self._send(text, target_lang, source_lang, deadline)}
+        hedged = self.hedge_after is None
+        error = None
+        while pending:
+            now = time.monotonic()
+            remaining = deadline - now
+            if remaining <= 0:
+                break
+            wait_for = remaining if hedged else min(remaining, max(0.0, start + self.hedge_after - now))
+            done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    elapsed = time.monotonic() - start
+                    self.breaker.record_success()
+                    request_outcomes.inc(outcome="ok")
+                    request_latency.observe(elapsed, outcome="ok")
+                    return future.result()
+                error = future.exception()
+            if not hedged and (not pending or time.monotonic() - start >= self.hedge_after):
+                # First attempt is slow or already failed: race a second one
+                hedged = True
+                hedged_requests.inc()
+                pending.add(self._send(text, target_lang, source_lang, deadline))
+
+        # Abandoned requests finish in the background, bounded by the time that was left
+        elapsed = time.monotonic() - start
+        out_of_time = time.monotonic() >= deadline or isinstance(error, requests.Timeout)
+        outcome = "error" if error is not None and not pending and not out_of_time else "timeout"
+        # Running out of the caller's budget is not an upstream failure, unless
+        # this request had the whole budget to itself and still got no answer.
+        # A half-open probe has to report either way, or the circuit stays shut.
+        if outcome == "error" or elapsed >= budget or self.breaker.state == self.breaker.HALF_OPEN:
+            self.breaker.record_failure()
+        request_outcomes.inc(outcome=outcome)
+        request_latency.observe(elapsed, outcome=outcome)
+        if outcome == "error":
+            raise error
+        raise BudgetExceededError(f"translation exceeded its {elapsed:.2f}s budget")
+
+    def _translate_batch(self, batch, target_lang, source_lang, deadline, budget):
+        try:
+            translated = self._call("\n".join(batch), target_lang, source_lang, deadline, budget)
+            lines = translated.rstrip("\n").split("\n")
+            if len(lines) == len(batch):
+                return {segment: line.strip() for segment, line in zip(batch, lines)}
+            if len(batch) == 1:
+                return {batch[0]: translated.strip()}
+        except Exception as e:
+            logging.warning(f"Translation request failed: {e}")
+            return {}
+        # Line structure was not preserved; fall back to one request per segment
+        out = {}
+        for segment in batch:
+            try:
+                out[segment] = self._call(segment, target_lang, source_lang, deadline, budget).strip()
+            except Exception as e:
+                logging.warning(f"Translation request failed: {e}")
+                break
+        return out
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+
+_default_client = None
+_default_lock = threading.Lock()
+
+
+def get_client():
+    """Process-wide shared client so all callers reuse one connection pool"""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = TranslationClient()
+            segment_cache_entries.set_function(lambda: len(_default_client._cache))
+        return _default_client
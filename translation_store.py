@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+
+TRANSLATION_DB_PATH = os.getenv("TRANSLATION_DB_PATH", "translations.db")
+TRANSLATION_DB_MAX_ENTRIES = int(os.getenv("TRANSLATION_DB_MAX_ENTRIES", "50000"))
+TRANSLATION_DB_TTL = int(os.getenv("TRANSLATION_DB_TTL", str(30 * 24 * 3600)))
+
+# Refresh accessed_at at most this often so hot reads don't turn into writes
+_TOUCH_INTERVAL = 60
+# Run eviction every N writes instead of on every insert
+_PRUNE_EVERY = 200
+
+
+def content_key(language, texts):
+    """Stable key for a list of texts in a target language (same across processes)"""
+    h = hashlib.sha256()
+    h.update(language.encode("utf-8"))
+    for text in texts:
+        h.update(b"\x00")
+        h.update(text.encode("utf-8"))
+    return h.hexdigest()
+
+
+class TranslationStore:
+    """SQLite-backed translation cache shared by all workers on a host.
+
+    Entries expire after ``ttl_seconds`` and the table is trimmed back to
+    ``max_entries`` (least recently used first).
+    """
+
+    def __init__(self, path=TRANSLATION_DB_PATH, max_entries=TRANSLATION_DB_MAX_ENTRIES,
+                 ttl_seconds=TRANSLATION_DB_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS translations (
+                key TEXT PRIMARY KEY,
+                language TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        ''')
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_translations_accessed ON translations (accessed_at)"
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        now = time.time()
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT value, created_at, accessed_at FROM translations WHERE key = ?",
+                    (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                value, created_at, accessed_at = row
+                if now - created_at > self.ttl_seconds:
+                    self._conn.execute("DELETE FROM translations WHERE key = ?", (key,))
+                    self._conn.commit()
+                    return None
+                if now - accessed_at > _TOUCH_INTERVAL:
+                    self._conn.execute(
+                        "UPDATE translations SET accessed_at = ? WHERE key = ?", (now, key)
+                    )
+                    self._conn.commit()
+            return json.loads(value)
+        except sqlite3.Error as e:
+            logging.warning(f"Translation store read failed: {e}")
+            return None
+
+    def set(self, key, language, value):
+        now = time.time()
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO translations (key, language, value, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, language, json.dumps(value, ensure_ascii=False), now, now)
+                )
+                self._writes += 1
+                if self._writes % _PRUNE_EVERY == 0:
+                    self._prune(now)
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logging.warning(f"Translation store write failed: {e}")
+
+    def prune(self):
+        with self._lock:
+            self._prune(time.time())
+            self._conn.commit()
+
+    def _prune(self, now):
+        self._conn.execute(
+            "DELETE FROM translations WHERE created_at < ?", (now - self.ttl_seconds,)
+        )
+        count = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM translations WHERE key IN "
+                "(SELECT key FROM translations ORDER BY accessed_at ASC LIMIT ?)",
+                (excess,)
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
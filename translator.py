@@ -1,11 +1,66 @@
-import requests
-import urllib.parse
-import json
-from concurrent.futures import ThreadPoolExecutor
 import threading
+import os
+import logging
+import metrics
+from translation_store import TranslationStore, content_key
+from translation_client import get_client
 
-# Cache for translations
-translation_cache = {}
+# Persistent cache for translations (shared across workers and restarts)
+translation_store = TranslationStore()
+
+# Time a /translations request may spend on the upstream before answering in English
+REQUEST_BUDGET = float(os.getenv("TRANSLATION_REQUEST_BUDGET", "1.0"))
+
+outbound_calls = metrics.counter(
+    "translation_outbound_calls_total", "Outbound translation API calls", ["language", "outcome"])
+coalesced_waits = metrics.counter(
+    "translation_coalesced_waits_total", "Cache misses served by another in-flight fetch", ["language"])
+cache_lookups = metrics.counter(
+    "translation_cache_lookups_total", "Translation store lookups", ["result"])
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one execution"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """Run fn() once per key at a time; returns (result, was_shared)"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _InFlight()
+                self._calls[key] = call
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+
+_single_flight = SingleFlight()
 
 # Base English text to translate
 BASE_TEXTS = {
@@ -36,51 +91,52 @@ BASE_TEXTS = {
     'submit_data': 'Submit your data to get AI-powered recommendations'
 }
 
-def translate_batch(texts, target_language):
+def translate_batch(texts, target_language, budget=None):
     """Translate multiple texts in one API call"""
     if target_language == 'en':
         return texts
     
-    cache_key = f"{target_language}_{hash(tuple(texts))}"
-    if cache_key in translation_cache:
-        return translation_cache[cache_key]
+    cache_key = content_key(target_language, texts)
+    with metrics.stage_timer("translation.store_lookup"):
+        cached = translation_store.get(cache_key)
+    if cached is not None:
+        cache_lookups.inc(result="hit")
+        return cached
+    cache_lookups.inc(result="miss")
     
-    try:
-        combined_text = "\n".join(texts)
-        url = "https://translate.googleapis.com/translate_a/single"
-        params = {
-            'client': 'gtx',
-            'sl': 'en',
-            'tl': target_language,
-            'dt': 't',
-            'q': combined_text
-        }
-        response = requests.get(url, params=params, timeout=3)
-        if response.status_code == 200:
-            result = response.json()
-            translated = result[0][0][0]
-            translations = translated.split('\n')
-            translation_cache[cache_key] = translations
-            return translations
-        return texts
-    except:
-        return texts
+    translations, shared = _single_flight.do(
+        cache_key, lambda: _fetch_batch(texts, target_language, cache_key, budget or REQUEST_BUDGET))
+    if shared:
+        coalesced_waits.inc(language=target_language)
+    return translations
 
-def get_translations(language_code):
+def _fetch_batch(texts, target_language, cache_key, budget):
+    # A previous leader may have filled the store while we queued for the lock
+    cached = translation_store.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    # Fails fast (empty/partial result) when the budget runs out or the breaker is open
+    with metrics.stage_timer("translation.fetch"):
+        translated = get_client().translate_segments(texts, target_language, 'en', budget=budget)
+    if not all(text in translated for text in texts):
+        outbound_calls.inc(language=target_language, outcome="fallback")
+        # Keep whatever did translate; untranslated entries stay in English
+        return [translated.get(text, text) for text in texts]
+    
+    translations = [translated[text] for text in texts]
+    outbound_calls.inc(language=target_language, outcome="ok")
+    translation_store.set(cache_key, target_language, translations)
+    return translations
+
+def get_translations(language_code, budget=None):
     """Get all translations for a language using batch translation"""
     if language_code == 'en':
         return BASE_TEXTS
     
-    cache_key = f"full_{language_code}"
-    if cache_key in translation_cache:
-        return translation_cache[cache_key]
-    
     keys = list(BASE_TEXTS.keys())
     texts = list(BASE_TEXTS.values())
     
-    translated_texts = translate_batch(texts, language_code)
-    
-    translations = dict(zip(keys, translated_texts))
-    translation_cache[cache_key] = translations
+    translated_texts = translate_batch(texts, language_code, budget)
     
-    return translations
\ No newline at end of file
+    return dict(zip(keys, translated_texts))
@@ -0,0 +1,157 @@
+import json
+import os
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+import metrics
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "300"))
+# Shared backend so every worker sees the same entries and invalidations
+USER_CACHE_REDIS_URL = os.getenv("USER_CACHE_REDIS_URL")
+# Profile fields never written to a shared backend; they are cached in this process only
+SECRET_FIELDS = ("password_hash",)
+
+cache_requests = metrics.counter(
+    "user_cache_requests_total", "User profile cache lookups", ["backend", "result"])
+cache_invalidations = metrics.counter(
+    "user_cache_invalidations_total", "User profile cache invalidations", ["backend"])
+cache_entries = metrics.gauge(
+    "user_cache_entries", "Profiles held in the in-process user cache", ["namespace"])
+
+
+class LocalBackend:
+    """In-process LRU with per-entry expiry"""
+
+    name = "local"
+
+    def __init__(self, max_entries=USER_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisBackend:
+    """Redis-backed entries; size is bounded by the server's maxmemory policy"""
+
+    name = "redis"
+
+    def __init__(self, url=USER_CACHE_REDIS_URL):
+        if redis is None:
+            raise ImportError("redis package is required for USER_CACHE_REDIS_URL")
+        self.client = redis.Redis.from_url(url, socket_timeout=0.2, socket_connect_timeout=0.5)
+
+    def get(self, key):
+        raw = self.client.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(key, json.dumps(value, default=str), ex=max(1, int(ttl)))
+
+    def delete(self, key):
+        self.client.delete(key)
+
+
+class UserProfileCache:
+    """Read-through cache of user profiles keyed by username.
+
+    Backend errors are logged and treated as misses so a cache outage only
+    costs database round-trips, never failed logins. With a shared backend
+    the SECRET_FIELDS are kept in a per-process LRU instead; an entry is a
+    hit only when both halves are present.
+    """
+
+    def __init__(self, namespace, backend=None, ttl=USER_CACHE_TTL):
+        self.namespace = namespace
+        self.ttl = ttl
+        if backend is None:
+            backend = RedisBackend() if USER_CACHE_REDIS_URL else LocalBackend()
+        self.backend = backend
+        self._secrets = None
+        if isinstance(backend, LocalBackend):
+            cache_entries.set_function(backend.__len__, namespace=namespace)
+        else:
+            self._secrets = LocalBackend()
+
+    def _key(self, username):
+        return f"krishisaathi:user:{self.namespace}:{username}"
+
+    def get(self, username):
+        key = self._key(username)
+        try:
+            profile = self.backend.get(key)
+            if profile is not None and self._secrets is not None:
+                secrets = self._secrets.get(key)
+                profile = dict(profile, **secrets) if secrets is not None else None
+        except Exception as e:
+            logging.warning(f"User cache read failed: {e}")
+            profile = None
+        cache_requests.inc(backend=self.backend.name, result="hit" if profile is not None else "miss")
+        return profile
+
+    def set(self, username, profile):
+        key = self._key(username)
+        if self._secrets is not None:
+            self._secrets.set(key, {f: profile[f] for f in SECRET_FIELDS if f in profile}, self.ttl)
+            profile = {k: v for k, v in profile.items() if k not in SECRET_FIELDS}
+        try:
+            self.backend.set(key, profile, self.ttl)
+        except Exception as e:
+            logging.warning(f"User cache write failed: {e}")
+
+    def invalidate(self, username):
+        cache_invalidations.inc(backend=self.backend.name)
+        key = self._key(username)
+        if self._secrets is not None:
+            self._secrets.delete(key)
+        try:
+            self.backend.delete(key)
+        except Exception as e:
+            logging.warning(f"User cache invalidation failed: {e}")
+
+    def stats(self):
+        """Hit rate and database round-trips saved (every hit is one query avoided)"""
+        hits = cache_requests.value(backend=self.backend.name, result="hit")
+        misses = cache_requests.value(backend=self.backend.name, result="miss")
+        total = hits + misses
+        return {
+            "backend": self.backend.name,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+            "db_round_trips_saved": hits,
+            "invalidations": cache_invalidations.value(backend=self.backend.name),
+        }
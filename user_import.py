@@ -0,0 +1,122 @@
+import csv
+import io
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from storage import hash_password
+
+BULK_BATCH_SIZE = int(os.getenv("BULK_IMPORT_BATCH_SIZE", "5000"))
+# SHA-256 is ~0.5us per password, so pickling to a process pool only pays off
+# for very large batches (or if hash_password moves to a slow KDF)
+PARALLEL_HASH_MIN = int(os.getenv("BULK_IMPORT_PARALLEL_HASH_MIN", "20000"))
+HASH_WORKERS = int(os.getenv("BULK_IMPORT_HASH_WORKERS", str(os.cpu_count() or 1)))
+
+REQUIRED_COLUMNS = ("username", "email", "password")
+# Column limits from the users table
+MAX_LENGTHS = {"username": 50, "email": 100, "language": 10}
+
+_hash_pool = None
+_hash_pool_lock = threading.Lock()
+
+
+def _hash_chunk(passwords):
+    return [hash_password(password) for password in passwords]
+
+
+def _get_hash_pool():
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is None:
+            # spawn: forking a threaded server process is not safe
+            _hash_pool = ProcessPoolExecutor(
+                max_workers=HASH_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _hash_pool
+
+
+def hash_passwords(passwords, workers=HASH_WORKERS):
+    """storage.hash_password for each password, in parallel for big batches"""
+    if workers <= 1 or len(passwords) < PARALLEL_HASH_MIN:
+        return _hash_chunk(passwords)
+    chunk = (len(passwords) + workers - 1) // workers
+    chunks = [passwords[i:i + chunk] for i in range(0, len(passwords), chunk)]
+    hashed = []
+    for part in _get_hash_pool().map(_hash_chunk, chunks):
+        hashed.extend(part)
+    return hashed
+
+
+def validate_row(row, languages):
+    """Return an error message for a bad CSV row, or None"""
+    for column in REQUIRED_COLUMNS:
+        if not (row.get(column) or "").strip():
+            return f"missing {column}"
+    for column, limit in MAX_LENGTHS.items():
+        if len(row.get(column) or "") > limit:
+            return f"{column} longer than {limit} characters"
+    if row.get("language") and row["language"] not in languages:
+        return "invalid language"
+    return None
+
+
+def import_users(db, fileobj, languages, batch_size=BULK_BATCH_SIZE):
+    """Stream a users CSV into db in batches, yielding NDJSON result lines.
+
+    Expects a header with username,email,password[,language]. Only rows that
+    were not created get their own line; the last line is a summary.
+    """
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    reader = csv.DictReader(text)
+    totals = {"created": 0, "duplicate": 0, "invalid": 0, "error": 0}
+    start = time.perf_counter()
+
+    missing = [c for c in REQUIRED_COLUMNS if c not in (reader.fieldnames or [])]
+    if missing:
+        yield json.dumps({"error": f"CSV is missing columns: {', '.join(missing)}"}) + "\n"
+        return
+
+    def flush(batch):
+        hashes = hash_passwords([row["password"] for _, row in batch])
+        records = [
+            (row["username"].strip(), row["email"].strip(), password_hash, row.get("language") or "en")
+            for (_, row), password_hash in zip(batch, hashes)
+        ]
+        try:
+            statuses = db.insert_users_bulk(records)
+        except Exception as e:
+            for line, row in batch:
+                yield {"row": line, "username": row["username"], "status": "error", "error": str(e)}
+            totals["error"] += len(records)
+            return
+        for (line, row), status in zip(batch, statuses):
+            totals[status] += 1
+            if status != "created":
+                yield {"row": line, "username": row["username"], "status": status}
+
+    batch = []
+    # Data rows start on line 2, after the header
+    for line, row in enumerate(reader, start=2):
+        error = validate_row(row, languages)
+        if error:
+            totals["invalid"] += 1
+            yield json.dumps({"row": line, "username": row.get("username"), "status": "invalid",
+                              "error": error}, ensure_ascii=False) + "\n"
+            continue
+        batch.append((line, row))
+        if len(batch) >= batch_size:
+            for result in flush(batch):
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+            batch = []
+    if batch:
+        for result in flush(batch):
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+
+    elapsed = time.perf_counter() - start
+    processed = sum(totals.values())
+    summary = dict(totals, rows=processed, seconds=round(elapsed, 3),
+                   rows_per_second=round(processed / elapsed, 1) if elapsed else None)
+    yield json.dumps({"summary": summary}) + "\n"